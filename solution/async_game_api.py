@@ -0,0 +1,666 @@
+import asyncio
+import json
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from codec import get_codec
+from framing import FRAMING_AUTO, FRAMINGS, MessageDecoder, encode_frame
+from game_api import GameAPI, GameAPIError
+from group_move import GroupMoveTracker
+from metrics import DEFAULT_METRICS
+from resilience import RetryPolicy, get_circuit_breaker
+from models import *
+
+
+class _AsyncPipeline:
+    '''asyncio 版流水线连接：一条长连接上多个请求同时在途，读任务按 requestId 分发响应
+
+    每条连接有自己的 MessageDecoder 和读任务；旧连接的读任务出错时只影响它自己的连接，
+    不会关闭重连后的新连接。'''
+
+    def __init__(self, address: Tuple[str, int], framing: str = FRAMING_AUTO, loads=json.loads):
+        self.address = address
+        self.framing = framing
+        self.loads = loads
+        self.decoder = MessageDecoder(framing, loads=loads)  # 当前连接的解码器
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._read_task: Optional[asyncio.Task] = None
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._connect_lock = asyncio.Lock()
+
+    async def request(self, request_id: str, payload: bytes, on_size=None) -> Any:
+        '''发出一个请求并等待对应的响应，on_size 以响应报文的字节数调用'''
+        async with self._connect_lock:
+            if self._writer is None:
+                await self._connect()
+            writer, decoder = self._writer, self.decoder
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            writer.write(encode_frame(payload, decoder.framing))
+            await writer.drain()
+            message, size = await future
+            if on_size is not None:
+                on_size(size)
+            return message
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def close(self) -> None:
+        writer, task = self._writer, self._read_task
+        self._read_task = None
+        self._fail_all(writer, ConnectionError("流水线连接已关闭"))
+        if task is not None:
+            task.cancel()
+        if writer is not None:
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+    async def _connect(self) -> None:
+        reader, writer = await asyncio.open_connection(*self.address)
+        decoder = MessageDecoder(self.framing, loads=self.loads)
+        self._reader, self._writer, self.decoder = reader, writer, decoder
+        self._read_task = asyncio.ensure_future(self._read_loop(reader, writer, decoder))
+
+    async def _read_loop(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                         decoder: MessageDecoder) -> None:
+        try:
+            while True:
+                message = decoder.next_message()
+                if message is None:
+                    data = await reader.read(65536)
+                    if not data:
+                        raise ConnectionError("连接已被服务器关闭")
+                    decoder.feed(data)
+                    continue
+                request_id = message.get("requestId") if isinstance(message, dict) else None
+                future = self._pending.pop(request_id, None)
+                if future is not None and not future.done():
+                    future.set_result((message, decoder.last_message_size))
+        except (OSError, ValueError) as e:
+            self._fail_all(writer, ConnectionError("读取响应失败: {0}".format(str(e))))
+
+    def _fail_all(self, writer: Optional[asyncio.StreamWriter], error: Exception) -> None:
+        '''关闭出错的连接，并让其上所有在途请求失败；连接已经不是当前连接时什么也不做'''
+        if writer is None or self._writer is not writer:
+            return
+        writer.close()
+        self._reader = self._writer = None
+        pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(error)
+
+
+class AsyncGameAPI:
+    '''GameAPI 的 asyncio 版本，方法与 GameAPI 一一对应，全部需要 await
+
+    请求基于 asyncio streams 发送，多个协程可以同时发出请求；
+    wait、deploy_mcv_and_wait 等需要等待的接口使用 asyncio.sleep，不会阻塞事件循环。'''
+
+    MAX_RETRIES = GameAPI.MAX_RETRIES
+    RETRY_DELAY = GameAPI.RETRY_DELAY
+    REQUEST_TIMEOUT = 10.0
+    QUEUE_TYPES = GameAPI.QUEUE_TYPES
+    BUILDING_DEPENDENCIES = GameAPI.BUILDING_DEPENDENCIES
+    UNIT_DEPENDENCIES = GameAPI.UNIT_DEPENDENCIES
+
+    # 与 GameAPI 共用报文构造、校验和数据解析逻辑
+    _generate_request_id = GameAPI._generate_request_id
+    _build_request = GameAPI._build_request
+    _check_response = GameAPI._check_response
+    _check_circuit = GameAPI._check_circuit
+    _handle_response = GameAPI._handle_response
+    _apply_actor_data = staticmethod(GameAPI._apply_actor_data)
+    _parse_actors = staticmethod(GameAPI._parse_actors)
+    _parse_actor_batch = staticmethod(GameAPI._parse_actor_batch)
+    _parse_map_query = staticmethod(GameAPI._parse_map_query)
+    _parse_player_base_info = staticmethod(GameAPI._parse_player_base_info)
+    _parse_screen_info = staticmethod(GameAPI._parse_screen_info)
+    get_unexplored_nearby_positions = GameAPI.get_unexplored_nearby_positions
+
+    @staticmethod
+    async def is_server_running(host="localhost", port=7445, timeout=2.0) -> bool:
+        '''检查游戏服务器是否已启动并可访问
+
+        Args:
+            host (str): 游戏服务器地址，默认为"localhost"。
+            port (int): 游戏服务器端口，默认为 7445。
+            timeout (float): 超时时间（秒），默认为 2.0 秒。
+
+        Returns:
+            bool: 服务器是否已启动并可访问
+        '''
+        api = AsyncGameAPI(host, port, max_connections=1)
+        api.REQUEST_TIMEOUT = timeout
+        try:
+            request_id, payload = api._build_request("ping", {})
+            response = await asyncio.wait_for(api._exchange(request_id, payload), timeout)
+            return isinstance(response, dict) and response.get("status", 0) > 0 and "data" in response
+        except (asyncio.TimeoutError, OSError, ValueError):
+            return False
+        finally:
+            await api.close()
+
+    def __init__(self, host, port=7445, language="zh", pipelined=False, max_connections=8,
+                 framing=FRAMING_AUTO, codec="json", retry_policy=None, circuit_breaker=None,
+                 metrics=None):
+        '''初始化 AsyncGameAPI 类
+
+        Args:
+            host (str): 游戏服务器地址，本地就填"localhost"。
+            port (int): 游戏服务器端口，默认为 7445。
+            language (str): 接口返回语言，默认为 "zh"，支持 "zh" 和 "en"。
+            pipelined (bool): 是否在一条长连接上流水线发送所有请求（需要服务器支持），
+                默认每个请求单独建立连接。
+            max_connections (int): 非流水线模式下同时打开的连接数上限，默认为 8。
+            framing (str): 响应报文分帧方式，见 framing.FRAMINGS。
+            codec (str): 报文编解码器，见 codec.get_codec。
+            retry_policy (RetryPolicy, optional): 重试策略，见 GameAPI。
+            circuit_breaker (CircuitBreaker, optional): 熔断器，默认与同一服务器地址的 GameAPI 共享。
+            metrics (CommandMetrics, optional): 按命令的传输指标，默认与 GameAPI 共用 metrics.DEFAULT_METRICS。
+        '''
+        if framing not in FRAMINGS:
+            raise GameAPIError("INVALID_FRAMING",
+                             "framing必须是以下值之一: {0}".format(", ".join(FRAMINGS)))
+        try:
+            self.codec = get_codec(codec)
+        except ValueError as e:
+            raise GameAPIError("INVALID_CODEC", str(e))
+        self.server_address = (host, port)
+        self.language = language
+        self.framing = framing
+        self.retry_policy = retry_policy or RetryPolicy(max_attempts=self.MAX_RETRIES,
+                                                        base_delay=self.RETRY_DELAY,
+                                                        default_timeout=self.REQUEST_TIMEOUT)
+        self.circuit_breaker = circuit_breaker or get_circuit_breaker(self.server_address)
+        self.metrics = metrics or DEFAULT_METRICS
+        self._pipeline = (_AsyncPipeline(self.server_address, framing, self.codec.loads)
+                          if pipelined else None)
+        self._max_connections = max_connections
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def close(self) -> None:
+        '''关闭持有的长连接'''
+        if self._pipeline is not None:
+            await self._pipeline.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def _send_request(self, command: str, params: dict) -> dict:
+        '''通过 asyncio stream 和Game交互，发送信息并接收响应
+
+        Args:
+            command (str): 要执行的命令
+            params (dict): 命令相关的数据参数
+
+        Returns:
+            dict: 服务器返回的JSON响应数据
+
+        Raises:
+            GameAPIError: 当API调用出现错误时
+        '''
+        request_id, json_data = self._build_request(command, params)
+        timeout = self.retry_policy.timeout_for(command)
+
+        with self.metrics.measure(command, len(json_data)) as sample:
+            attempt = 0
+            while True:
+                probe = self._check_circuit()
+                try:
+                    response = await asyncio.wait_for(
+                        self._exchange(request_id, json_data, sample.add_response_bytes), timeout)
+
+                except (asyncio.TimeoutError, OSError) as e:
+                    # 连接失败、超时、地址无法解析等：计入熔断器，按策略决定是否重试
+                    self.circuit_breaker.record_failure()
+                    attempt += 1
+                    if not self.retry_policy.should_retry(command, e, attempt):
+                        raise GameAPIError("CONNECTION_ERROR",
+                                         "连接服务器失败: {0}".format(str(e) or type(e).__name__))
+                    sample.retries = attempt
+                    await asyncio.sleep(self.retry_policy.backoff(attempt))
+                    continue
+
+                except GameAPIError:
+                    raise
+
+                except ValueError:
+                    self.circuit_breaker.record_success()
+                    raise GameAPIError("INVALID_JSON",
+                                     "服务器返回的不是有效的JSON格式")
+
+                except Exception as e:
+                    raise GameAPIError("UNEXPECTED_ERROR",
+                                     "发生未预期的错误: {0}".format(str(e)))
+
+                else:
+                    self.circuit_breaker.record_success()
+
+                finally:
+                    # 半开状态下的探测请求无论以什么方式结束（包括被取消）都要放行下一次探测
+                    if probe:
+                        self.circuit_breaker.release_probe()
+
+                return self._check_response(response, request_id)
+
+    async def _exchange(self, request_id: str, payload: bytes, on_size=None) -> Any:
+        '''发送一条请求报文并读取解码后的响应，on_size 以响应报文的字节数调用'''
+        if self._pipeline is not None:
+            return await self._pipeline.request(request_id, payload, on_size)
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self._max_connections)
+        async with self._slots:
+            reader, writer = await asyncio.open_connection(*self.server_address)
+            try:
+                writer.write(encode_frame(payload, self.framing))
+                await writer.drain()
+                decoder = MessageDecoder(self.framing, loads=self.codec.loads)
+                while True:
+                    message = decoder.next_message()
+                    if message is None:
+                        data = await reader.read(65536)
+                        if data:
+                            decoder.feed(data)
+                            continue
+                        message = decoder.finish()
+                        if message is None:
+                            raise ConnectionError("连接已被服务器关闭")
+                    if on_size is not None:
+                        on_size(decoder.last_message_size)
+                    return message
+            finally:
+                writer.close()
+
+    async def _call(self, command: str, params: dict, error_msg: str, error_code: str,
+                    error_desc: str) -> Any:
+        '''发送请求并提取 data，非 GameAPIError 的异常统一包装为 error_code'''
+        try:
+            response = await self._send_request(command, params)
+            return self._handle_response(response, error_msg)
+        except GameAPIError:
+            raise
+        except Exception as e:
+            raise GameAPIError(error_code, "{0}时发生错误: {1}".format(error_desc, str(e)))
+
+    async def move_camera_by_location(self, location: Location) -> None:
+        '''根据给定的位置移动相机，见 GameAPI.move_camera_by_location'''
+        await self._call('camera_move', {"location": location.to_dict()},
+                         "移动相机失败", "CAMERA_MOVE_ERROR", "移动相机")
+
+    async def move_camera_by_direction(self, direction: str, distance: int) -> None:
+        '''向某个方向移动相机，见 GameAPI.move_camera_by_direction'''
+        await self._call('camera_move', {"direction": direction, "distance": distance},
+                         "移动相机失败", "CAMERA_MOVE_ERROR", "移动相机")
+
+    async def can_produce(self, unit_type: str) -> bool:
+        '''检查是否可以生产指定类型的Actor，见 GameAPI.can_produce'''
+        result = await self._call('query_can_produce', {"units": [{"unit_type": unit_type}]},
+                                  "查询生产能力失败", "PRODUCE_QUERY_ERROR", "查询生产能力")
+        return result.get("canProduce", False)
+
+    async def produce(self, unit_type: str, quantity: int, auto_place_building: bool = False) -> Optional[int]:
+        '''生产指定数量的Actor，返回 waitId，见 GameAPI.produce'''
+        try:
+            result = await self._call('start_production', {
+                "units": [{"unit_type": unit_type, "quantity": quantity}],
+                "autoPlaceBuilding": auto_place_building
+            }, "生产命令执行失败", "PRODUCTION_ERROR", "执行生产命令")
+            return result.get("waitId")
+        except GameAPIError as e:
+            if e.code == "COMMAND_EXECUTION_ERROR":
+                return None
+            raise
+
+    async def produce_wait(self, unit_type: str, quantity: int, auto_place_building: bool = True) -> None:
+        '''生产指定数量的Actor并等待生产完成，见 GameAPI.produce_wait'''
+        wait_id = await self.produce(unit_type, quantity, auto_place_building)
+        if wait_id is None:
+            raise GameAPIError("PRODUCTION_FAILED", "生产任务创建失败")
+        await self.wait(wait_id, 20 * quantity)
+
+    async def is_ready(self, wait_id: int) -> bool:
+        '''检查生产任务是否完成，见 GameAPI.is_ready'''
+        result = await self._call('query_wait_info', {"waitId": wait_id},
+                                  "查询任务状态失败", "WAIT_STATUS_ERROR", "查询任务状态")
+        return result.get("status", False)
+
+    async def wait(self, wait_id: int, max_wait_time: float = 20.0) -> bool:
+        '''等待生产任务完成，等待期间不阻塞事件循环，见 GameAPI.wait'''
+        try:
+            wait_time = 0.0
+            step_time = 0.1
+            while True:
+                result = await self._call('query_wait_info', {"waitId": wait_id},
+                                          "等待任务完成失败", "WAIT_ERROR", "等待任务完成")
+                if result.get("waitStatus") == "success":
+                    return True
+
+                await asyncio.sleep(step_time)
+                wait_time += step_time
+                if wait_time > max_wait_time:
+                    return False
+
+        except GameAPIError as e:
+            if e.code == "COMMAND_EXECUTION_ERROR":
+                return True  # 特殊情况：如果命令执行错误，可能是任务已完成
+            raise
+
+    async def move_units_by_location(self, actors: List[Actor], location: Location, attack_move: bool = False) -> None:
+        '''移动单位到指定位置，见 GameAPI.move_units_by_location'''
+        await self._call('move_actor', {
+            "targets": {"actorId": [actor.actor_id for actor in actors]},
+            "location": location.to_dict(),
+            "isAttackMove": 1 if attack_move else 0
+        }, "移动单位失败", "MOVE_UNITS_ERROR", "移动单位")
+
+    async def move_units_by_direction(self, actors: List[Actor], direction: str, distance: int) -> None:
+        '''向指定方向移动单位，见 GameAPI.move_units_by_direction'''
+        await self._call('move_actor', {
+            "targets": {"actorId": [actor.actor_id for actor in actors]},
+            "direction": direction,
+            "distance": distance
+        }, "移动单位失败", "MOVE_UNITS_ERROR", "移动单位")
+
+    async def move_units_by_path(self, actors: List[Actor], path: List[Location]) -> None:
+        '''沿路径移动单位，见 GameAPI.move_units_by_path'''
+        if not path:
+            return
+        await self._call('move_actor', {
+            "targets": {"actorId": [actor.actor_id for actor in actors]},
+            "path": [point.to_dict() for point in path]
+        }, "移动单位失败", "MOVE_UNITS_ERROR", "移动单位")
+
+    async def select_units(self, query_params: TargetsQueryParam) -> None:
+        '''选中符合条件的Actor，见 GameAPI.select_units'''
+        await self._call('select_unit', {"targets": query_params.to_dict()},
+                         "选择单位失败", "SELECT_UNITS_ERROR", "选择单位")
+
+    async def form_group(self, actors: List[Actor], group_id: int) -> None:
+        '''将Actor编成编组，见 GameAPI.form_group'''
+        await self._call('form_group', {
+            "targets": {"actorId": [actor.actor_id for actor in actors]},
+            "groupId": group_id
+        }, "编组失败", "FORM_GROUP_ERROR", "编组")
+
+    async def query_actor(self, query_params: TargetsQueryParam) -> List[Actor]:
+        '''查询符合条件的Actor，见 GameAPI.query_actor'''
+        result = await self._call('query_actor', {"targets": query_params.to_dict()},
+                                  "查询Actor失败", "QUERY_ACTOR_ERROR", "查询Actor")
+        return self._parse_actors(result)
+
+    async def query_actor_batch(self, query_params: TargetsQueryParam) -> ActorBatch:
+        '''查询符合条件的Actor并以 ActorBatch 返回，见 GameAPI.query_actor_batch'''
+        result = await self._call('query_actor', {"targets": query_params.to_dict()},
+                                  "查询Actor失败", "QUERY_ACTOR_ERROR", "查询Actor")
+        return self._parse_actor_batch(result)
+
+    async def query_actors_by_ids(self, actor_ids: List[int]) -> List[Actor]:
+        '''用一次查询获取多个指定 ID 的Actor，见 GameAPI.query_actors_by_ids'''
+        if not actor_ids:
+            return []
+        result = await self._call('query_actor', {"targets": {"actorId": list(actor_ids)}},
+                                  "查询Actor失败", "QUERY_ACTOR_ERROR", "查询Actor")
+        return self._parse_actors(result)
+
+    async def find_path(self, actors: List[Actor], destination: Location, method: str) -> List[Location]:
+        '''为Actor找到到目标的路径，见 GameAPI.find_path'''
+        result = await self._call('query_path', {
+            "targets": {"actorId": [actor.actor_id for actor in actors]},
+            "destination": destination.to_dict(),
+            "method": method
+        }, "寻路失败", "FIND_PATH_ERROR", "寻路")
+        try:
+            return [Location(step["x"], step["y"]) for step in result["path"]]
+        except (KeyError, TypeError) as e:
+            raise GameAPIError("INVALID_PATH_DATA", "路径数据格式无效: {0}".format(str(e)))
+
+    async def get_actor_by_id(self, actor_id: int) -> Optional[Actor]:
+        '''获取指定 ID 的Actor，见 GameAPI.get_actor_by_id'''
+        actor = Actor(actor_id)
+        if await self.update_actor(actor):
+            return actor
+        return None
+
+    async def update_actor(self, actor: Actor) -> bool:
+        '''更新Actor信息，Actor已死时返回false，见 GameAPI.update_actor'''
+        result = await self._call('query_actor', {"targets": {"actorId": [actor.actor_id]}},
+                                  "更新Actor信息失败", "UPDATE_ACTOR_ERROR", "更新Actor信息")
+        return self._apply_actor_data(actor, result)
+
+    async def update_actors(self, actors: List[Actor]) -> List[bool]:
+        '''并发更新多个Actor的信息，见 GameAPI.update_actors'''
+        return list(await asyncio.gather(*(self.update_actor(actor) for actor in actors)))
+
+    async def deploy_units(self, actors: List[Actor]) -> None:
+        '''部署/展开 Actor，见 GameAPI.deploy_units'''
+        await self._call('deploy', {"targets": {"actorId": [actor.actor_id for actor in actors]}},
+                         "部署单位失败", "DEPLOY_UNITS_ERROR", "部署单位")
+
+    async def move_camera_to(self, actor: Actor) -> None:
+        '''将相机移动到指定Actor位置，见 GameAPI.move_camera_to'''
+        await self._call('view', {"actorId": actor.actor_id},
+                         "移动相机失败", "CAMERA_MOVE_ERROR", "移动相机")
+
+    async def occupy_units(self, occupiers: List[Actor], targets: List[Actor]) -> None:
+        '''占领目标，见 GameAPI.occupy_units'''
+        await self._call('occupy', {
+            "occupiers": {"actorId": [actor.actor_id for actor in occupiers]},
+            "targets": {"actorId": [target.actor_id for target in targets]}
+        }, "占领行动失败", "OCCUPY_ERROR", "占领行动")
+
+    async def attack_target(self, attacker: Actor, target: Actor) -> bool:
+        '''攻击指定目标，见 GameAPI.attack_target'''
+        try:
+            result = await self._call('attack', {
+                "attackers": {"actorId": [attacker.actor_id]},
+                "targets": {"actorId": [target.actor_id]}
+            }, "攻击命令执行失败", "ATTACK_ERROR", "攻击命令执行")
+            return result.get("status", 0) > 0
+        except GameAPIError as e:
+            if e.code == "COMMAND_EXECUTION_ERROR":
+                return False
+            raise
+
+    async def can_attack_target(self, attacker: Actor, target: Actor) -> bool:
+        '''检查是否可以攻击目标，见 GameAPI.can_attack_target'''
+        try:
+            result = await self._call('query_actor', {
+                "targets": {
+                    "actorId": [target.actor_id],
+                    "restrain": [{"visible": True}]
+                }
+            }, "检查攻击能力失败", "CHECK_ATTACK_ERROR", "检查攻击能力")
+            return len(result.get("actors", [])) > 0
+        except GameAPIError:
+            return False
+
+    async def repair_units(self, actors: List[Actor]) -> None:
+        '''修复Actor，见 GameAPI.repair_units'''
+        await self._call('repair', {"targets": {"actorId": [actor.actor_id for actor in actors]}},
+                         "修复命令执行失败", "REPAIR_ERROR", "修复命令执行")
+
+    async def stop(self, actors: List[Actor]) -> None:
+        '''停止Actor当前行动，见 GameAPI.stop'''
+        await self._call('stop', {"targets": {"actorId": [actor.actor_id for actor in actors]}},
+                         "停止命令执行失败", "STOP_ERROR", "停止命令执行")
+
+    async def visible_query(self, location: Location) -> bool:
+        '''查询位置是否可见，见 GameAPI.visible_query'''
+        try:
+            result = await self._call('fog_query', {"pos": location.to_dict()},
+                                      "查询可见性失败", "VISIBILITY_QUERY_ERROR", "查询可见性")
+            return result.get('IsVisible', False)
+        except GameAPIError:
+            return False
+
+    async def explorer_query(self, location: Location) -> bool:
+        '''查询位置是否已探索，见 GameAPI.explorer_query'''
+        try:
+            result = await self._call('fog_query', {"pos": location.to_dict()},
+                                      "查询探索状态失败", "EXPLORER_QUERY_ERROR", "查询探索状态")
+            return result.get('IsExplored', False)
+        except GameAPIError:
+            return False
+
+    async def query_production_queue(self, queue_type: str) -> dict:
+        '''查询指定类型的生产队列，见 GameAPI.query_production_queue'''
+        if queue_type not in self.QUEUE_TYPES:
+            raise GameAPIError(
+                "INVALID_QUEUE_TYPE",
+                "队列类型必须是以下值之一: 'Building', 'Defense', 'Infantry', 'Vehicle', 'Aircraft', 'Naval'")
+        return await self._call('query_production_queue', {"queueType": queue_type},
+                                "查询生产队列失败", "PRODUCTION_QUEUE_QUERY_ERROR", "查询生产队列")
+
+    async def query_production_queues(self, queue_types: Optional[List[str]] = None) -> Dict[str, Optional[dict]]:
+        '''并发查询多个生产队列，不存在的队列为 None，见 GameAPI.query_production_queues'''
+        queue_types = list(queue_types or self.QUEUE_TYPES)
+        results = await asyncio.gather(*(self.query_production_queue(queue_type) for queue_type in queue_types),
+                                       return_exceptions=True)
+        queues = {}
+        for queue_type, result in zip(queue_types, results):
+            if isinstance(result, GameAPIError) and result.code == "COMMAND_EXECUTION_ERROR":
+                queues[queue_type] = None
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                queues[queue_type] = result
+        return queues
+
+    async def place_building(self, queue_type: str, location: Location = None) -> None:
+        '''放置建造队列顶端已就绪的建筑，见 GameAPI.place_building'''
+        params = {"queueType": queue_type}
+        if location:
+            params["location"] = location.to_dict()
+        await self._call('place_building', params, "放置建筑失败", "PLACE_BUILDING_ERROR", "放置建筑")
+
+    async def manage_production(self, queue_type: str, action: str) -> None:
+        '''管理生产队列中的项目（暂停/取消/继续），见 GameAPI.manage_production'''
+        if action not in ['pause', 'cancel', 'resume']:
+            raise GameAPIError("INVALID_ACTION", "action参数必须是 'pause', 'cancel', 或 'resume'")
+        await self._call('manage_production', {"queueType": queue_type, "action": action},
+                         "管理生产队列失败", "MANAGE_PRODUCTION_ERROR", "管理生产队列")
+
+    async def deploy_mcv_and_wait(self, wait_time: float = 1.0) -> None:
+        '''展开自己的基地车并等待一小会，见 GameAPI.deploy_mcv_and_wait'''
+        mcv = await self.query_actor(TargetsQueryParam(type=['mcv'], faction='自己'))
+        if not mcv:
+            return
+        await self.deploy_units(mcv)
+        await asyncio.sleep(wait_time)
+
+    async def ensure_can_build_wait(self, building_name: str) -> bool:
+        '''确保能生产某个建筑，必要时生产所有前置建筑并等待完成，见 GameAPI.ensure_can_build_wait'''
+        building_exists = await self.query_actor(
+            TargetsQueryParam(type=[building_name], faction="自己"))
+        if building_exists:
+            return True
+
+        for dep in self.BUILDING_DEPENDENCIES.get(building_name, []):
+            if not await self.ensure_building_wait_buildself(dep):
+                return False
+
+        return await self.ensure_building_wait_buildself(building_name)
+
+    async def ensure_building_wait_buildself(self, building_name: str) -> bool:
+        '''
+        非外部接口
+        '''
+        building_exists = await self.query_actor(
+            TargetsQueryParam(type=[building_name], faction="自己"))
+        if building_exists:
+            return True
+
+        for dep in self.BUILDING_DEPENDENCIES.get(building_name, []):
+            await self.ensure_building_wait_buildself(dep)
+
+        if await self.can_produce(building_name):
+            wait_id = await self.produce(building_name, 1, True)
+            if wait_id:
+                await self.wait(wait_id)
+                return True
+        return False
+
+    async def ensure_can_produce_unit(self, unit_name: str) -> bool:
+        '''确保能生产某个Actor(会自动生产其所需建筑并等待完成)，见 GameAPI.ensure_can_produce_unit'''
+        if await self.can_produce(unit_name):
+            return True
+        for b in self.UNIT_DEPENDENCIES.get(unit_name, []):
+            await self.ensure_building_wait_buildself(b)
+        # 如果依赖全部OK还是生产不出来，可能是什么东西没修好，稍微等一下
+        if not await self.can_produce(unit_name):
+            await asyncio.sleep(1)
+        return await self.can_produce(unit_name)
+
+    async def move_units_by_location_and_wait(self, actors: List[Actor], location: Location,
+                                              max_wait_time: float = 10.0, tolerance_dis: int = 1,
+                                              stuck_ticks: int = 5,
+                                              on_arrival: Optional[Callable[[Actor], None]] = None) -> bool:
+        '''移动一批Actor到指定位置，并等待(或直到超时)，见 GameAPI.move_units_by_location_and_wait'''
+        await self.move_units_by_location(actors, location)
+        tracker = GroupMoveTracker(actors, location, tolerance_dis, stuck_ticks=stuck_ticks, on_arrival=on_arrival)
+        start_time = time.time()
+        while time.time() - start_time < max_wait_time:
+            tracker.apply(await self.query_actors_by_ids(tracker.actor_ids))
+            if tracker.formation_arrived():
+                return True
+            if tracker.blocked():
+                return False
+            await asyncio.sleep(0.3)
+        return False
+
+    async def unit_attribute_query(self, actors: List[Actor]) -> dict:
+        '''查询Actor的属性和攻击范围内目标，见 GameAPI.unit_attribute_query'''
+        return await self._call('unit_attribute_query', {
+            "targets": {"actorId": [actor.actor_id for actor in actors]}
+        }, "查询Actor属性失败", "ATTRIBUTE_QUERY_ERROR", "查询Actor属性")
+
+    async def unit_range_query(self, actors: List[Actor]) -> List[int]:
+        '''获取这些传入Actor攻击范围内的所有Target (已弃用，请使用unit_attribute_query)'''
+        try:
+            result = await self.unit_attribute_query(actors)
+            targets = []
+            for attr in result.get("attributes", []):
+                targets.extend(attr.get("targets", []))
+            return targets
+        except Exception:
+            return []
+
+    async def map_query(self) -> MapQueryResult:
+        '''查询地图信息，见 GameAPI.map_query'''
+        result = await self._call('map_query', {}, "查询地图信息失败", "MAP_QUERY_ERROR", "查询地图信息")
+        return self._parse_map_query(result)
+
+    async def map_query_grids(self) -> MapGrids:
+        '''查询地图信息并以 MapGrids 返回，见 GameAPI.map_query_grids'''
+        return (await self.map_query()).to_grids()
+
+    async def player_base_info_query(self) -> PlayerBaseInfo:
+        '''查询玩家基地信息，见 GameAPI.player_base_info_query'''
+        result = await self._call('player_baseinfo_query', {},
+                                  "查询玩家基地信息失败", "BASE_INFO_QUERY_ERROR", "查询玩家基地信息")
+        return self._parse_player_base_info(result)
+
+    async def screen_info_query(self) -> ScreenInfoResult:
+        '''查询当前玩家看到的屏幕信息，见 GameAPI.screen_info_query'''
+        result = await self._call('screen_info_query', {},
+                                  "查询屏幕信息失败", "SCREEN_INFO_QUERY_ERROR", "查询屏幕信息")
+        try:
+            return self._parse_screen_info(result)
+        except (KeyError, TypeError) as e:
+            raise GameAPIError("SCREEN_INFO_QUERY_ERROR", "查询屏幕信息时发生错误: {0}".format(str(e)))
+
+    async def set_rally_point(self, actors: List[Actor], target_location: Location) -> None:
+        '''设置建筑的集结点，见 GameAPI.set_rally_point'''
+        await self._call('set_rally_point', {
+            "targets": {"actorId": [actor.actor_id for actor in actors]},
+            "location": target_location.to_dict()
+        }, "设置集结点失败", "SET_RALLY_POINT_ERROR", "设置集结点")
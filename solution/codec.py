@@ -0,0 +1,129 @@
+import json
+from typing import Any, Dict, Optional, Type
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+class JsonCodec:
+    '''标准库 json 编解码器，GameAPI 的默认编解码器'''
+
+    name = "json"
+
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(obj).encode('utf-8')
+
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data)
+
+    def typed_loads(self, data_type: Optional[Type]):
+        '''返回一个把响应报文解码为 data 字段已是 data_type 实例的解码函数
+
+        不支持类型化解码的编解码器返回普通的 loads，由调用方再把 data 转换为模型。'''
+        return self.loads
+
+
+class OrjsonCodec(JsonCodec):
+    '''基于 orjson 的编解码器'''
+
+    name = "orjson"
+
+    def dumps(self, obj: Any) -> bytes:
+        return orjson.dumps(obj)
+
+    def loads(self, data: bytes) -> Any:
+        return orjson.loads(data)
+
+
+class MsgspecCodec(JsonCodec):
+    '''基于 msgspec 的编解码器，支持把响应的 data 直接解码为 models 中的数据类'''
+
+    name = "msgspec"
+
+    def __init__(self):
+        self._encoder = msgspec.json.Encoder()
+        self._decoder = msgspec.json.Decoder()
+        self._typed_decoders: Dict[Type, Any] = {}
+
+    def dumps(self, obj: Any) -> bytes:
+        return self._encoder.encode(obj)
+
+    def loads(self, data: bytes) -> Any:
+        try:
+            return self._decoder.decode(data)
+        except msgspec.DecodeError as e:
+            # 分帧解码器依靠 ValueError 判断报文是否完整
+            raise ValueError(str(e))
+
+    def typed_loads(self, data_type: Optional[Type]):
+        if data_type is None:
+            return self.loads
+        decoder = self._typed_decoders.get(data_type)
+        if decoder is None:
+            envelope = msgspec.defstruct("{0}Response".format(data_type.__name__), [
+                ("status", int, 0),
+                ("requestId", Optional[str], None),
+                ("response", Any, None),
+                ("data", Optional[data_type], None),
+                ("error", Optional[dict], None),
+            ])
+            decoder = self._typed_decoders[data_type] = msgspec.json.Decoder(envelope)
+
+        def loads(data: bytes) -> Any:
+            try:
+                message = decoder.decode(data)
+            except msgspec.ValidationError:
+                # 报文结构和模型不一致（例如错误响应缺字段），退回普通解码
+                return self.loads(data)
+            except msgspec.DecodeError as e:
+                raise ValueError(str(e))
+            response = {"status": message.status, "requestId": message.requestId}
+            if message.response is not None:
+                response["response"] = message.response
+            if message.data is not None:
+                response["data"] = message.data
+            if message.error is not None:
+                response["error"] = message.error
+            return response
+        return loads
+
+
+CODECS: Dict[str, Type[JsonCodec]] = {"json": JsonCodec}
+if orjson is not None:
+    CODECS["orjson"] = OrjsonCodec
+if msgspec is not None:
+    CODECS["msgspec"] = MsgspecCodec
+
+
+def available_codecs() -> list:
+    '''当前环境中可用的编解码器名称，按解码速度从快到慢排列'''
+    return [name for name in ("msgspec", "orjson", "json") if name in CODECS]
+
+
+def get_codec(codec: Any = "json") -> JsonCodec:
+    '''按名称获取编解码器实例
+
+    Args:
+        codec: 编解码器名称（"json"、"orjson"、"msgspec"），"auto" 表示选择可用的最快实现，
+            也可以直接传入编解码器实例。
+
+    Returns:
+        JsonCodec: 编解码器实例
+
+    Raises:
+        ValueError: 指定的编解码器不可用（对应的库没有安装）
+    '''
+    if isinstance(codec, JsonCodec):
+        return codec
+    if codec == "auto":
+        codec = available_codecs()[0]
+    if codec not in CODECS:
+        raise ValueError("编解码器 '{0}' 不可用，可用的有: {1}".format(codec, ", ".join(available_codecs())))
+    return CODECS[codec]()
@@ -0,0 +1,134 @@
+"""编解码器基准测试
+
+对 map_query 和 query_actor 两类最大的响应报文，比较各个可用编解码器的编码、解码
+以及类型化解码（直接得到 models 中的数据类）耗时。
+
+用法:
+    python codec_benchmark.py                      # 使用合成的报文
+    python codec_benchmark.py --record localhost 7445  # 先从运行中的游戏录制真实报文
+"""
+import argparse
+import json
+import random
+import socket
+import time
+import uuid
+
+from codec import available_codecs, get_codec
+from framing import MessageDecoder, recv_message
+from game_api import API_VERSION, GameAPI
+from models import MapQueryResult
+
+
+def synthesize_map_query(width: int = 128, height: int = 128) -> dict:
+    '''合成一个与 map_query 响应结构相同的报文（数组按 [x][y] 排列）'''
+    terrains = ["Clear", "Rock", "Water", "Rough", "Road"]
+
+    def grid(cell):
+        return [[cell(x, y) for y in range(height)] for x in range(width)]
+
+    return {
+        "status": 1,
+        "requestId": str(uuid.uuid4()),
+        "response": "查询地图信息成功",
+        "data": {
+            "MapWidth": width,
+            "MapHeight": height,
+            "Height": grid(lambda x, y: (x * y) % 4),
+            "IsVisible": grid(lambda x, y: (x + y) % 5 == 0),
+            "IsExplored": grid(lambda x, y: (x + y) % 3 == 0),
+            "Terrain": grid(lambda x, y: terrains[(x // 8 + y // 8) % len(terrains)]),
+            "ResourcesType": grid(lambda x, y: "Ore" if (x * 7 + y) % 11 == 0 else ""),
+            "Resources": grid(lambda x, y: (x * 7 + y) % 11),
+        },
+    }
+
+
+def synthesize_query_actor(count: int = 300) -> dict:
+    '''合成一个包含 count 个单位的 query_actor 响应报文'''
+    types = ["步兵", "防空车", "雅克战机", "重坦克", "矿车"]
+    actors = [{
+        "id": i,
+        "type": random.choice(types),
+        "faction": random.choice(["己方", "敌方", "中立"]),
+        "position": {"x": random.randint(0, 127), "y": random.randint(0, 127)},
+        "hp": random.randint(1, 500),
+        "maxHp": 500,
+    } for i in range(1, count + 1)]
+    return {
+        "status": 1,
+        "requestId": str(uuid.uuid4()),
+        "response": "查询单位成功",
+        "data": {"actors": actors},
+    }
+
+
+def record(host: str, port: int, command: str) -> dict:
+    '''向运行中的游戏发送一条命令，返回原始响应报文'''
+    request = json.dumps({
+        "apiVersion": API_VERSION,
+        "requestId": str(uuid.uuid4()),
+        "command": command,
+        "params": {"targets": {}} if command == "query_actor" else {},
+        "language": "zh",
+    }).encode('utf-8')
+    with socket.create_connection((host, port), timeout=10) as sock:
+        sock.sendall(request)
+        return recv_message(sock, MessageDecoder())
+
+
+def measure(func, data, repeat: int) -> float:
+    '''返回 func(data) 的平均耗时（毫秒），取 3 轮中最快的一轮'''
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func(data)
+        best = min(best, (time.perf_counter() - start) / repeat)
+    return best * 1000
+
+
+def run(payloads: dict, repeat: int) -> None:
+    print("可用的编解码器: {0}".format(", ".join(available_codecs())))
+    print("{0:<14}{1:<10}{2:>10}{3:>12}{4:>12}{5:>14}".format(
+        "报文", "编解码器", "大小(KB)", "编码(ms)", "解码(ms)", "解码+模型(ms)"))
+    for name, (message, data_type, parse) in payloads.items():
+        for codec_name in available_codecs():
+            codec = get_codec(codec_name)
+            raw = codec.dumps(message)
+            typed_loads = codec.typed_loads(data_type) if data_type is not None else codec.loads
+
+            def decode_to_model(data):
+                result = typed_loads(data)["data"]
+                return result if isinstance(result, MapQueryResult) else parse(result)
+
+            print("{0:<14}{1:<10}{2:>10.1f}{3:>12.3f}{4:>12.3f}{5:>14.3f}".format(
+                name, codec_name, len(raw) / 1024,
+                measure(codec.dumps, message, repeat),
+                measure(codec.loads, raw, repeat),
+                measure(decode_to_model, raw, repeat)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比较各编解码器处理大响应报文的耗时")
+    parser.add_argument("--record", nargs=2, metavar=("HOST", "PORT"),
+                        help="从运行中的游戏录制 map_query / query_actor 响应")
+    parser.add_argument("--repeat", type=int, default=20, help="每轮重复次数")
+    args = parser.parse_args()
+
+    if args.record:
+        host, port = args.record[0], int(args.record[1])
+        map_message = record(host, port, "map_query")
+        actor_message = record(host, port, "query_actor")
+    else:
+        map_message = synthesize_map_query()
+        actor_message = synthesize_query_actor()
+
+    run({
+        "map_query": (map_message, MapQueryResult, GameAPI._parse_map_query),
+        "query_actor": (actor_message, None, GameAPI._parse_actors),
+    }, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
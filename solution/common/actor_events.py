@@ -0,0 +1,188 @@
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional
+
+from game_api import GameAPI
+from models import Actor, Location, TargetsQueryParam
+
+# 事件类型
+SPAWNED = "spawned"                # 己方新单位出现
+DESTROYED = "destroyed"            # 单位被摧毁（血量归零、变成残骸，或在可见区域内消失）
+MOVED = "moved"                    # 位置变化
+DAMAGED = "damaged"                # 血量下降
+REPAIRED = "repaired"              # 血量上升
+BECAME_VISIBLE = "became_visible"  # 非己方单位第一次被看到，或丢失视野后重新出现
+LOST_FROM_SIGHT = "lost_from_sight"  # 非己方单位从快照中消失，但不能确定已被摧毁
+
+EVENT_KINDS = (SPAWNED, DESTROYED, MOVED, DAMAGED, REPAIRED, BECAME_VISIBLE, LOST_FROM_SIGHT)
+
+# 服务器对己方阵营可能使用的名称
+OWN_FACTIONS = ("己方", "自己", "friend")
+
+
+@dataclass
+class ActorEvent:
+    """两次快照之间一个单位发生的变化。"""
+    kind: str  # 事件类型，见 EVENT_KINDS
+    actor: Actor  # 单位的最新状态（消失类事件为最后一次看到的状态）
+    previous: Optional[Actor] = None  # 上一次快照中的状态，新出现的单位为 None
+
+    def __str__(self) -> str:
+        actor = self.actor
+        text = f"[{self.kind}] {actor.type} (ID: {actor.actor_id}, 阵营: {actor.faction})"
+        if self.kind == MOVED and self.previous is not None:
+            text += f" {self.previous.position} -> {actor.position}"
+        elif self.kind in (DAMAGED, REPAIRED) and self.previous is not None:
+            text += f" HP {self.previous.hppercent} -> {actor.hppercent}"
+        return text
+
+
+def is_wreck(actor: Actor) -> bool:
+    """单位是否已经是残骸或血量归零。"""
+    return bool(actor.type and actor.type.endswith(".husk")) or actor.hppercent == 0
+
+
+class ActorDiffer:
+    """
+    比较连续的单位快照，生成 ActorEvent。
+
+    单位从快照中消失时，己方单位视为被摧毁；非己方单位如果最后所在的格子当前可见
+    （由 is_visible 判断）也视为被摧毁，否则只是丢失视野，之后再次出现会产生 BECAME_VISIBLE。
+    """
+
+    def __init__(self, own_factions: Iterable[str] = OWN_FACTIONS,
+                 is_visible: Optional[Callable[[Location], bool]] = None, move_threshold: int = 1):
+        """
+        Args:
+            own_factions (Iterable[str]): 视为己方的阵营名称。
+            is_visible (Callable[[Location], bool], optional): 判断格子当前是否可见，
+                例如 lambda loc: map_state.grids.is_visible(loc.x, loc.y)。
+            move_threshold (int): 位置变化（曼哈顿距离）达到多少格才产生 MOVED 事件。
+        """
+        self.own_factions = frozenset(own_factions)
+        self.is_visible = is_visible
+        self.move_threshold = move_threshold
+        self.current: Dict[int, Actor] = {}  # 最新快照中的单位
+        self.lost: Dict[int, Actor] = {}  # 丢失视野的非己方单位（最后一次看到的状态）
+
+    def is_own(self, actor: Actor) -> bool:
+        return actor.faction in self.own_factions
+
+    def diff(self, actors: Iterable[Actor]) -> List[ActorEvent]:
+        """用新的快照更新状态，返回与上一次快照相比的事件列表。"""
+        events: List[ActorEvent] = []
+        snapshot: Dict[int, Actor] = {}
+        wrecked = set()
+        for actor in actors:
+            if is_wreck(actor):
+                previous = self.current.get(actor.actor_id) or self.lost.pop(actor.actor_id, None)
+                if previous is not None:
+                    wrecked.add(actor.actor_id)
+                    events.append(ActorEvent(DESTROYED, actor, previous))
+                continue
+            snapshot[actor.actor_id] = actor
+            previous = self.current.get(actor.actor_id)
+            if previous is None:
+                reappeared = self.lost.pop(actor.actor_id, None)
+                if reappeared is not None or not self.is_own(actor):
+                    events.append(ActorEvent(BECAME_VISIBLE, actor, reappeared))
+                else:
+                    events.append(ActorEvent(SPAWNED, actor))
+                continue
+            if previous.position is not None and actor.position is not None and \
+                    previous.position.manhattan_distance(actor.position) >= self.move_threshold:
+                events.append(ActorEvent(MOVED, actor, previous))
+            if previous.hppercent is not None and actor.hppercent is not None:
+                if actor.hppercent < previous.hppercent:
+                    events.append(ActorEvent(DAMAGED, actor, previous))
+                elif actor.hppercent > previous.hppercent:
+                    events.append(ActorEvent(REPAIRED, actor, previous))
+
+        for actor_id, previous in self.current.items():
+            if actor_id in snapshot or actor_id in wrecked:
+                continue
+            if self.is_own(previous) or self._last_seen_visible(previous):
+                events.append(ActorEvent(DESTROYED, previous, previous))
+            else:
+                self.lost[actor_id] = previous
+                events.append(ActorEvent(LOST_FROM_SIGHT, previous, previous))
+        self.current = snapshot
+        return events
+
+    def _last_seen_visible(self, actor: Actor) -> bool:
+        if self.is_visible is None or actor.position is None:
+            return False
+        try:
+            return bool(self.is_visible(actor.position))
+        except (IndexError, ValueError):
+            return False
+
+
+class ActorEventStream:
+    """
+    轮询 query_actor 并把快照差异分发给订阅者。
+
+    示例::
+
+        stream = ActorEventStream(api)
+        stream.subscribe(DESTROYED, lambda event: print(event))
+        while True:
+            stream.poll()
+            time.sleep(1)
+    """
+
+    def __init__(self, api: GameAPI, query: Optional[TargetsQueryParam] = None,
+                 differ: Optional[ActorDiffer] = None):
+        self.api = api
+        self.query = query or TargetsQueryParam()
+        self.differ = differ or ActorDiffer()
+        self._handlers: Dict[Optional[str], List[Callable[[ActorEvent], None]]] = {}
+
+    @property
+    def actors(self) -> List[Actor]:
+        """最近一次快照中的单位。"""
+        return list(self.differ.current.values())
+
+    def subscribe(self, kind: Optional[str], handler: Callable[[ActorEvent], None]) -> None:
+        """订阅一种事件，kind 为 None 时订阅全部事件。"""
+        if kind is not None and kind not in EVENT_KINDS:
+            raise ValueError(f"未知的事件类型: {kind}")
+        self._handlers.setdefault(kind, []).append(handler)
+
+    def unsubscribe(self, kind: Optional[str], handler: Callable[[ActorEvent], None]) -> None:
+        handlers = self._handlers.get(kind, [])
+        if handler in handlers:
+            handlers.remove(handler)
+
+    def on(self, kind: Optional[str]):
+        """subscribe 的装饰器形式。"""
+        def decorator(handler: Callable[[ActorEvent], None]):
+            self.subscribe(kind, handler)
+            return handler
+        return decorator
+
+    def poll(self) -> List[ActorEvent]:
+        """查询一次快照，分发并返回事件。"""
+        events = self.differ.diff(self.api.query_actor(self.query))
+        for event in events:
+            for handler in self._handlers.get(event.kind, ()):
+                handler(event)
+            for handler in self._handlers.get(None, ()):
+                handler(event)
+        return events
+
+    def run(self, interval: float, until: Callable[[], bool], timeout: Optional[float] = None) -> bool:
+        """
+        每 interval 秒轮询一次，直到 until() 返回 True。
+
+        Returns:
+            bool: until() 是否在 timeout 秒内成立（timeout 为 None 时一直等待）。
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            self.poll()
+            if until():
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(interval)
@@ -0,0 +1,291 @@
+import json
+import struct
+import sys
+import threading
+import time
+from array import array
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+
+from game_api import GameAPI
+from models import ACTOR_FACTION_CODES, ACTOR_TYPE_CODES, Actor, ActorBatch, Location
+
+# 二进制导出文件：文件头之后依次是类型/阵营名称表（JSON）和各列的原始数据（小端序）
+_MAGIC = b"AHST"
+_VERSION = 1
+_HEADER = struct.Struct("<4sHI")  # 魔数、版本、行数
+_COLUMNS = (("ticks", "I"), ("times", "d"), ("ids", "q"), ("xs", "i"), ("ys", "i"),
+            ("hppercents", "h"), ("faction_codes", "B"), ("type_codes", "H"))
+
+
+class ActorTrack:
+    """单个单位在历史窗口内的时间序列，各列按时间先后排列。"""
+
+    __slots__ = ("actor_id", "ticks", "times", "xs", "ys", "hppercents")
+
+    def __init__(self, actor_id: int):
+        self.actor_id = actor_id
+        self.ticks: List[int] = []
+        self.times: List[float] = []
+        self.xs: List[int] = []
+        self.ys: List[int] = []
+        self.hppercents: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self.ticks)
+
+    def positions(self) -> List[Location]:
+        return [Location(x, y) for x, y in zip(self.xs, self.ys)]
+
+
+class ActorHistory:
+    """
+    固定容量的单位历史环形缓冲区。
+
+    每次 query_actor 的结果按行追加到列式数组（采样序号、时间、id、x、y、血量、阵营编码、类型编码）中，
+    写满后覆盖最旧的行，内存占用固定。每个单位维护自己的行号队列，按单位取时间序列不需要扫描整个缓冲区。
+
+    attach 到 GameAPI 后，所有成功的 query_actor 响应都会被自动记录，不会产生额外的查询。
+    """
+
+    def __init__(self, capacity: int = 65536, api: Optional[GameAPI] = None):
+        """
+        Args:
+            capacity (int): 最多保存的行数（一行是一个单位的一次采样）。
+            api (GameAPI, optional): 给出时立即 attach 到该 GameAPI。
+        """
+        if capacity <= 0:
+            raise ValueError("capacity 必须大于 0")
+        self.capacity = capacity
+        self.ticks = array("I", bytes(4 * capacity))  # 采样序号，每记录一次快照加 1
+        self.times = array("d", bytes(8 * capacity))  # time.monotonic() 时间
+        self.ids = array("q", bytes(8 * capacity))
+        self.xs = array("i", bytes(4 * capacity))
+        self.ys = array("i", bytes(4 * capacity))
+        self.hppercents = array("h", bytes(2 * capacity))
+        self.faction_codes = array("B", bytes(capacity))  # 见 ACTOR_FACTION_CODES
+        self.type_codes = array("H", bytes(2 * capacity))  # 见 ACTOR_TYPE_CODES
+        self.tick = 0
+        self._head = 0  # 下一行写入的位置
+        self._size = 0
+        self._rows: Dict[int, Deque[int]] = {}  # 单位 id -> 按时间排列的行号
+        self._lock = threading.Lock()
+        self._api: Optional[GameAPI] = None
+        if api is not None:
+            self.attach(api)
+
+    def __len__(self) -> int:
+        return self._size
+
+    # ===== 采样来源 =====
+
+    def attach(self, api: GameAPI) -> None:
+        """记录该 GameAPI 之后所有成功的 query_actor 响应。"""
+        self.detach()
+        api.add_command_listener(self._on_command)
+        self._api = api
+
+    def detach(self) -> None:
+        if self._api is not None:
+            self._api.remove_command_listener(self._on_command)
+            self._api = None
+
+    def _on_command(self, command: str, params: dict, response: dict) -> None:
+        if command != "query_actor":
+            return
+        data = response.get("data") if isinstance(response, dict) else None
+        if isinstance(data, dict) and isinstance(data.get("actors"), list):
+            try:
+                self.record(data["actors"])
+            except (KeyError, TypeError):
+                # 数据格式异常时由 query_actor 本身报告错误，这里不重复处理
+                pass
+
+    # ===== 记录 =====
+
+    def record(self, actors_data: List[dict], timestamp: Optional[float] = None) -> int:
+        """记录一次 query_actor 响应中的 actors 数组，返回采样序号。"""
+        rows = []
+        encode_type = ACTOR_TYPE_CODES.encode
+        encode_faction = ACTOR_FACTION_CODES.encode
+        for data in actors_data:
+            position = data["position"]
+            max_hp = data["maxHp"]
+            rows.append((data["id"], position["x"], position["y"],
+                         data["hp"] * 100 // max_hp if max_hp > 0 else -1,
+                         encode_faction(data["faction"]), encode_type(data["type"])))
+        return self._append(rows, timestamp)
+
+    def record_actors(self, actors: Iterable[Actor], timestamp: Optional[float] = None) -> int:
+        """记录一组 Actor，没有位置的单位会被跳过。"""
+        rows = [(actor.actor_id, actor.position.x, actor.position.y,
+                 actor.hppercent if actor.hppercent is not None else -1,
+                 actor.faction_code, actor.type_code)
+                for actor in actors if actor.position is not None]
+        return self._append(rows, timestamp)
+
+    def record_batch(self, batch: ActorBatch, timestamp: Optional[float] = None) -> int:
+        """记录一个 ActorBatch。"""
+        rows = list(zip(batch.ids, batch.xs, batch.ys, batch.hppercents, batch.faction_codes, batch.type_codes))
+        return self._append(rows, timestamp)
+
+    def _append(self, rows: List[tuple], timestamp: Optional[float]) -> int:
+        now = time.monotonic() if timestamp is None else timestamp
+        with self._lock:
+            self.tick += 1
+            tick = self.tick
+            capacity = self.capacity
+            for actor_id, x, y, hp, faction_code, type_code in rows:
+                row = self._head
+                if self._size == capacity:
+                    # 覆盖最旧的一行，它一定是所属单位行号队列的队首
+                    old_id = self.ids[row]
+                    old_rows = self._rows[old_id]
+                    old_rows.popleft()
+                    if not old_rows:
+                        del self._rows[old_id]
+                else:
+                    self._size += 1
+                self.ticks[row] = tick
+                self.times[row] = now
+                self.ids[row] = actor_id
+                self.xs[row] = x
+                self.ys[row] = y
+                self.hppercents[row] = hp
+                self.faction_codes[row] = faction_code
+                self.type_codes[row] = type_code
+                self._rows.setdefault(actor_id, deque()).append(row)
+                self._head = (row + 1) % capacity
+        return tick
+
+    # ===== 查询 =====
+
+    def actor_ids(self) -> List[int]:
+        with self._lock:
+            return list(self._rows)
+
+    def samples(self, actor_id: int) -> int:
+        with self._lock:
+            rows = self._rows.get(actor_id)
+            return len(rows) if rows else 0
+
+    def track(self, actor_id: int, since: Optional[float] = None) -> ActorTrack:
+        """单位的时间序列，since 给出时只包含该时间之后的采样。"""
+        track = ActorTrack(actor_id)
+        with self._lock:
+            for row in self._rows.get(actor_id, ()):
+                if since is not None and self.times[row] < since:
+                    continue
+                track.ticks.append(self.ticks[row])
+                track.times.append(self.times[row])
+                track.xs.append(self.xs[row])
+                track.ys.append(self.ys[row])
+                track.hppercents.append(self.hppercents[row])
+        return track
+
+    def last_seen(self, actor_id: int) -> Optional[Actor]:
+        """单位最后一次被记录时的状态。"""
+        with self._lock:
+            rows = self._rows.get(actor_id)
+            if not rows:
+                return None
+            row = rows[-1]
+            return Actor(actor_id, ACTOR_TYPE_CODES.decode(self.type_codes[row]),
+                         ACTOR_FACTION_CODES.decode(self.faction_codes[row]),
+                         Location(self.xs[row], self.ys[row]), self.hppercents[row])
+
+    def velocity(self, actor_id: int, window: float = 2.0) -> Optional[Tuple[float, float]]:
+        """
+        用最近 window 秒内的采样做最小二乘拟合，估计单位的速度（格/秒）。
+
+        Returns:
+            Optional[Tuple[float, float]]: (vx, vy)；采样不足两次或时间没有变化时为 None。
+        """
+        with self._lock:
+            rows = self._rows.get(actor_id)
+            if not rows or len(rows) < 2:
+                return None
+            end = self.times[rows[-1]]
+            samples = []
+            for row in reversed(rows):
+                t = self.times[row]
+                if end - t > window and len(samples) >= 2:
+                    break
+                samples.append((t, self.xs[row], self.ys[row]))
+        n = len(samples)
+        mean_t = sum(s[0] for s in samples) / n
+        mean_x = sum(s[1] for s in samples) / n
+        mean_y = sum(s[2] for s in samples) / n
+        var_t = sum((s[0] - mean_t) ** 2 for s in samples)
+        if var_t == 0:
+            return None
+        vx = sum((s[0] - mean_t) * (s[1] - mean_x) for s in samples) / var_t
+        vy = sum((s[0] - mean_t) * (s[2] - mean_y) for s in samples) / var_t
+        return vx, vy
+
+    def hp_lost(self, actor_id: int, window: Optional[float] = None) -> int:
+        """最近 window 秒（None 表示整个历史窗口）内单位损失的血量百分比，只计算下降的部分。"""
+        track = self.track(actor_id, None if window is None else time.monotonic() - window)
+        hps = [hp for hp in track.hppercents if hp >= 0]
+        return sum(max(0, a - b) for a, b in zip(hps, hps[1:]))
+
+    # ===== 导出 =====
+
+    def save(self, path: str) -> None:
+        """按时间顺序把全部行导出为紧凑的二进制文件。"""
+        with self._lock:
+            order = self._chronological()
+            columns = []
+            for name, typecode in _COLUMNS:
+                source = getattr(self, name)
+                column = array(typecode, (source[row] for row in order))
+                if sys.byteorder == "big":
+                    column.byteswap()
+                columns.append(column)
+            tables = json.dumps({"types": ACTOR_TYPE_CODES.names, "factions": ACTOR_FACTION_CODES.names},
+                                ensure_ascii=False).encode("utf-8")
+            with open(path, "wb") as f:
+                f.write(_HEADER.pack(_MAGIC, _VERSION, len(order)))
+                f.write(struct.pack("<I", len(tables)))
+                f.write(tables)
+                for column in columns:
+                    column.tofile(f)
+
+    @classmethod
+    def load(cls, path: str, capacity: Optional[int] = None) -> 'ActorHistory':
+        """读取 save 导出的文件，类型和阵营名称会重新映射到当前进程的编码表。"""
+        with open(path, "rb") as f:
+            magic, version, count = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != _MAGIC or version != _VERSION:
+                raise ValueError(f"不是有效的单位历史文件: {path}")
+            (table_size,) = struct.unpack("<I", f.read(4))
+            tables = json.loads(f.read(table_size).decode("utf-8"))
+            columns = {}
+            for name, typecode in _COLUMNS:
+                column = array(typecode)
+                column.fromfile(f, count)
+                if sys.byteorder == "big":
+                    column.byteswap()
+                columns[name] = column
+        type_map = [ACTOR_TYPE_CODES.encode(name) for name in tables["types"]]
+        faction_map = [ACTOR_FACTION_CODES.encode(name) for name in tables["factions"]]
+        history = cls(capacity or max(count, 1))
+        start = 0
+        while start < count:
+            tick = columns["ticks"][start]
+            end = start
+            while end < count and columns["ticks"][end] == tick:
+                end += 1
+            rows = [(columns["ids"][i], columns["xs"][i], columns["ys"][i], columns["hppercents"][i],
+                     faction_map[columns["faction_codes"][i]], type_map[columns["type_codes"][i]])
+                    for i in range(start, end)]
+            history.tick = tick - 1
+            history._append(rows, columns["times"][start])
+            start = end
+        return history
+
+    def _chronological(self) -> List[int]:
+        # 调用方已持有 self._lock
+        if self._size < self.capacity:
+            return list(range(self._size))
+        return list(range(self._head, self.capacity)) + list(range(self._head))
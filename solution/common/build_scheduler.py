@@ -0,0 +1,325 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, Future
+from concurrent.futures import wait as wait_futures
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from common.build_system import BUILDING_DEPENDENCIES, UNIT_DEPENDENCIES, BuildSystem, production_queue
+
+# 还没有从生产队列观测到生产时间时，各队列每件建筑/单位的估计生产时间（秒）
+DEFAULT_BUILD_TIMES = {
+    "Building": 10.0,
+    "Defense": 8.0,
+    "Infantry": 3.0,
+    "Vehicle": 8.0,
+    "Aircraft": 10.0,
+    "Naval": 10.0,
+}
+
+# 任务状态
+PENDING = "pending"  # 等待依赖完成或队列空闲
+QUEUED = "queued"    # 已下单，等待生产完成
+DONE = "done"
+FAILED = "failed"
+
+
+@dataclass
+class BuildTask:
+    """依赖图中的一个节点：在某个队列中生产 quantity 个同类建筑/单位。"""
+    name: str
+    quantity: int
+    is_building: bool
+    queue_type: str
+    deps: List[str] = field(default_factory=list)  # 必须先完成的任务
+    duration: float = 0.0  # 估计用时（秒，全部数量）
+    status: str = PENDING
+    wait_id: Optional[int] = None
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    future: Optional[Future] = field(default=None, repr=False)
+    key: str = ""  # 任务在依赖图中的名称，默认与 name 相同；同一建筑的额外任务（如补建的电厂）用不同的 key
+
+    def __post_init__(self):
+        self.key = self.key or self.name
+
+
+def estimate_build_time(unit_type: str, queue_type: str, build_times: Optional[Dict[str, float]] = None) -> float:
+    """单件建筑/单位的估计生产时间（秒），优先使用从生产队列观测到的时间。"""
+    return (build_times or {}).get(unit_type) or DEFAULT_BUILD_TIMES.get(queue_type, 10.0)
+
+
+def dependency_closure(steps) -> List[str]:
+    """steps 中全部目标直接或间接依赖的建筑。"""
+    seen: List[str] = []
+    stack = [(unit_type, is_building) for unit_type, _, is_building in steps]
+    while stack:
+        unit_type, is_building = stack.pop()
+        table = BUILDING_DEPENDENCIES if is_building else UNIT_DEPENDENCIES
+        for dep in table.get(unit_type, []):
+            if dep not in seen:
+                seen.append(dep)
+                stack.append((dep, True))
+    return seen
+
+
+def expand_steps(steps, have: Dict[str, int], build_times: Optional[Dict[str, float]] = None) -> Dict[str, BuildTask]:
+    """
+    把 (名称, 目标数量, 是否为建筑) 列表展开为依赖图，不访问游戏。
+
+    Args:
+        steps: mission_steps 列表。
+        have (Dict[str, int]): 已有的建筑/单位数量，已满足的目标和已存在的依赖不会生成任务。
+        build_times (Dict[str, float], optional): 观测到的单件生产时间，见 BuildSystem.build_times。
+
+    Returns:
+        Dict[str, BuildTask]: 任务 key 到任务的映射。
+    """
+    tasks: Dict[str, BuildTask] = {}
+
+    def add(unit_type: str, quantity: int, is_building: bool) -> None:
+        task = tasks.get(unit_type)
+        if task is not None:
+            task.quantity = max(task.quantity, quantity)
+            task.duration = estimate_build_time(unit_type, task.queue_type, build_times) * task.quantity
+            return
+        queue_type = production_queue(unit_type, is_building)
+        task = tasks[unit_type] = BuildTask(unit_type, quantity, is_building, queue_type,
+                                            duration=estimate_build_time(unit_type, queue_type, build_times) * quantity)
+        table = BUILDING_DEPENDENCIES if is_building else UNIT_DEPENDENCIES
+        for dep in table.get(unit_type, []):
+            if dep not in tasks and have.get(dep, 0) >= 1:
+                continue  # 依赖建筑已经存在
+            add(dep, 1, True)
+            task.deps.append(dep)
+
+    for unit_type, qty, is_building in steps:
+        need = qty - have.get(unit_type, 0)
+        if need > 0:
+            add(unit_type, need, is_building)
+    return tasks
+
+
+class BuildScheduler:
+    """
+    基于依赖图的生产调度器。
+
+    把 mission_steps 和 BUILDING_DEPENDENCIES / UNIT_DEPENDENCIES 展开为有向无环图，
+    每个生产队列（Building、Infantry、Vehicle 等）各自独立：依赖一完成就在空闲的队列上下单，
+    同一队列中有多个可下单的任务时优先下单到终点剩余路径最长的任务。
+    生产完成通过 GameAPI.wait_scheduler 集中等待，不逐个轮询。
+    """
+
+    def __init__(self, builder: BuildSystem, can_produce_timeout: float = 30.0, poll_interval: float = 1.0):
+        """
+        Args:
+            builder (BuildSystem): 提供 GameAPI、WorldState、生产监视器和已有数量。
+            can_produce_timeout (float): 依赖已完成但一直不能生产时，多久之后放弃该任务（秒）。
+            poll_interval (float): 等待生产完成时检查生产队列的间隔（秒）。
+        """
+        self.builder = builder
+        self.api = builder.api
+        self.can_produce_timeout = can_produce_timeout
+        self.poll_interval = poll_interval
+        self.tasks: Dict[str, BuildTask] = {}
+        self.order: List[str] = []
+        # 同一队列上的优先级（越大越先下单），为 None 时按到终点的剩余路径长度
+        self.priority: Optional[Dict[str, float]] = None
+        # 其他队列正在生产时，返回 False 的任务暂不下单（例如等待资金），见 EconomyPlanner
+        self.can_start: Optional[Callable[[BuildTask], bool]] = None
+        self._blocked_since: Dict[str, float] = {}
+
+    def log(self, msg: str):
+        self.builder.log(msg)
+
+    # ===== 建图 =====
+
+    def plan(self, steps) -> List[BuildTask]:
+        """根据 (名称, 目标数量, 是否为建筑) 列表建立依赖图，返回按拓扑顺序排列的任务。"""
+        # 目标和它们的全部依赖一起查询已有数量
+        targets = {unit_type for unit_type, _, _ in steps}
+        extra = [(dep, 1, True) for dep in dependency_closure(steps) if dep not in targets]
+        self.builder.init_current_assets(list(steps) + extra)
+        have = self.builder.current_have
+
+        for unit_type, qty, _ in steps:
+            if have.get(unit_type, 0) >= qty:
+                self.log(f"✅ {unit_type} 已满足 (已有 {have.get(unit_type, 0)}, 目标 {qty})")
+        self.tasks = expand_steps(steps, have, self.builder.build_times)
+        self.order = self.topological_order()
+        return [self.tasks[key] for key in self.order]
+
+    def estimate_time(self, unit_type: str, queue_type: str) -> float:
+        """单件建筑/单位的估计生产时间（秒），优先使用从生产队列观测到的时间。"""
+        return estimate_build_time(unit_type, queue_type, self.builder.build_times)
+
+    def topological_order(self) -> List[str]:
+        """依赖在前的任务顺序，存在环时抛出 ValueError。"""
+        indegree = {name: len(task.deps) for name, task in self.tasks.items()}
+        dependents = self._dependents()
+        ready = [name for name, degree in indegree.items() if degree == 0]
+        order = []
+        while ready:
+            name = ready.pop(0)
+            order.append(name)
+            for child in dependents[name]:
+                indegree[child] -= 1
+                if indegree[child] == 0:
+                    ready.append(child)
+        if len(order) != len(self.tasks):
+            cycle = sorted(name for name, degree in indegree.items() if degree > 0)
+            raise ValueError(f"依赖关系存在环: {cycle}")
+        return order
+
+    def _dependents(self) -> Dict[str, List[str]]:
+        dependents: Dict[str, List[str]] = {name: [] for name in self.tasks}
+        for name, task in self.tasks.items():
+            for dep in task.deps:
+                dependents[dep].append(name)
+        return dependents
+
+    # ===== 关键路径 =====
+
+    def critical_path(self) -> Tuple[List[str], float]:
+        """
+        依赖链上估计用时最长的一条路径。
+
+        Returns:
+            Tuple[List[str], float]: (从起点到终点的任务名称, 估计用时（秒）)。
+            不考虑同一队列上的排队，是完成全部任务所需时间的下限。
+        """
+        if not self.tasks:
+            return [], 0.0
+        order = self.order or self.topological_order()
+        finish: Dict[str, float] = {}
+        previous: Dict[str, Optional[str]] = {}
+        for name in order:
+            task = self.tasks[name]
+            before = max(task.deps, key=lambda dep: finish[dep], default=None)
+            previous[name] = before
+            finish[name] = (finish[before] if before else 0.0) + task.duration
+        end: Optional[str] = max(finish, key=finish.get)
+        length = finish[end]
+        path = []
+        while end is not None:
+            path.append(end)
+            end = previous[end]
+        return path[::-1], length
+
+    def _remaining(self) -> Dict[str, float]:
+        # 从每个任务开始到终点的最长估计用时，用作同一队列上的优先级
+        dependents = self._dependents()
+        remaining: Dict[str, float] = {}
+        for name in reversed(self.order or self.topological_order()):
+            remaining[name] = self.tasks[name].duration + max(
+                (remaining[child] for child in dependents[name]), default=0.0)
+        return remaining
+
+    # ===== 执行 =====
+
+    def run(self, timeout: Optional[float] = None) -> bool:
+        """执行 plan 建立的全部任务，返回是否全部完成。"""
+        if not self.tasks:
+            return True
+        if any(task.is_building for task in self.tasks.values()) and not self.builder.ensure_base_deployed():
+            return False
+
+        path, length = self.critical_path()
+        self.log(f"🧭 关键路径: {' → '.join(path)} (估计 {length:.0f} 秒)")
+        remaining = self.priority or self._remaining()
+        start = time.monotonic()
+        running: Dict[str, BuildTask] = {}  # 队列类型 -> 正在生产的任务
+        # 等待调度器直接使用每轮 poll 的生产队列估计剩余时间，不再自己查询队列
+        waits = self.api.wait_scheduler
+        previous_production, waits.production = waits.production, self.builder.production
+        try:
+            while True:
+                if timeout is not None and time.monotonic() - start >= timeout:
+                    self.log("⌛ 生产调度超时")
+                    break
+                self._dispatch(running, remaining)
+                if not running:
+                    if not self._ready_tasks():
+                        break
+                    time.sleep(self.poll_interval)  # 依赖已完成但暂时不能生产
+                    continue
+                done, _ = wait_futures([task.future for task in running.values()],
+                                       timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                self.builder.production.poll()
+                for queue_type, task in list(running.items()):
+                    if task.future in done:
+                        del running[queue_type]
+                        self._finish(task)
+        finally:
+            waits.production = previous_production
+
+        elapsed = time.monotonic() - start
+        ok = all(task.status == DONE for task in self.tasks.values())
+        self.log(f"⏱️ 实际用时 {elapsed:.0f} 秒，关键路径估计 {length:.0f} 秒")
+        for queue_type, busy in sorted(self.queue_busy_time().items()):
+            self.log(f"   {queue_type} 队列忙碌 {busy:.0f} 秒")
+        return ok
+
+    def queue_busy_time(self) -> Dict[str, float]:
+        """各队列实际用于生产的时间（秒）。"""
+        busy: Dict[str, float] = {}
+        for task in self.tasks.values():
+            if task.started_at is not None and task.finished_at is not None:
+                busy[task.queue_type] = busy.get(task.queue_type, 0.0) + task.finished_at - task.started_at
+        return busy
+
+    def _ready_tasks(self) -> List[BuildTask]:
+        ready = []
+        for task in self.tasks.values():
+            if task.status != PENDING:
+                continue
+            statuses = [self.tasks[dep].status for dep in task.deps]
+            if FAILED in statuses:
+                task.status = FAILED
+                self.log(f"❌ {task.name} 的依赖未能完成")
+            elif all(status == DONE for status in statuses):
+                ready.append(task)
+        return ready
+
+    def _dispatch(self, running: Dict[str, BuildTask], remaining: Dict[str, float]) -> None:
+        now = time.monotonic()
+        for task in sorted(self._ready_tasks(), key=lambda t: remaining.get(t.key, 0.0), reverse=True):
+            if task.queue_type in running:
+                continue
+            if running and self.can_start is not None and not self.can_start(task):
+                continue
+            wait_id = None
+            if self.builder.world.can_produce(task.name):
+                wait_id = self.api.produce(task.name, task.quantity, auto_place_building=task.is_building)
+            if wait_id is None:
+                first = self._blocked_since.setdefault(task.key, now)
+                if now - first >= self.can_produce_timeout:
+                    task.status = FAILED
+                    self.log(f"❌ {task.name} 超时未能进入队列")
+                continue
+            task.wait_id = wait_id
+            task.started_at = now
+            task.status = QUEUED
+            task.future = self.api.wait_scheduler.add(
+                wait_id, max(20.0 * task.quantity, 3 * task.duration), task.name)
+            running[task.queue_type] = task
+            self.log(f"⏳ {task.name} x{task.quantity} 已加入 {task.queue_type} 队列")
+
+    def _finish(self, task: BuildTask) -> None:
+        task.finished_at = time.monotonic()
+        error = task.future.exception()
+        if error is not None and getattr(error, "code", None) != "COMMAND_EXECUTION_ERROR":
+            task.status = FAILED
+            self.log(f"❌ {task.name} 生产失败: {error}")
+            return
+        if error is None and not task.future.result():
+            task.status = FAILED
+            self.log(f"❌ {task.name} 等待生产完成超时")
+            return
+        task.status = DONE
+        have = self.builder.current_have
+        have[task.name] = have.get(task.name, 0) + task.quantity
+        self.builder.world.invalidate("actors")
+        if task.is_building:
+            # 新建筑可能带来新的生产队列（兵营、战车工厂等）
+            self.builder.production.forget_missing()
+        self.log(f"✅ {task.name} x{task.quantity} 完成")
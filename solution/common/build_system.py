@@ -1,6 +1,8 @@
 import time
-from game_api import GameAPI, GameAPIError
+from game_api import GameAPI
 from models import TargetsQueryParam
+from common.production_monitor import ITEM_READY, ITEM_STARTED, ProductionMonitor
+from common.world_state import WorldState
 
 # 建筑依赖表 (Building Dependencies)
 # 描述了建造一个新建筑需要预先拥有哪些建筑。
@@ -53,15 +55,52 @@ UNIT_DEPENDENCIES = {
     "潜艇": ["船坞", "雷达站"]  # Submarine: 新增，需要雷达站（声纳）技术支持
 }
 
+# 生产队列表 (Production Queues)
+# 描述了建筑/单位在哪个生产队列中生产，不同队列可以同时生产。
+# 未列出的建筑在 Building 队列，未列出的单位在 Vehicle 队列。
+PRODUCTION_QUEUES = {
+    "防御塔": "Defense", "防空塔": "Defense", "高级防御塔": "Defense",
+    "步兵": "Infantry", "工程师": "Infantry", "警犬": "Infantry", "火箭兵": "Infantry",
+    "采矿车": "Vehicle", "矿车": "Vehicle", "轻型坦克": "Vehicle", "重型坦克": "Vehicle",
+    "防空车": "Vehicle", "移动防空车": "Vehicle", "自行火炮": "Vehicle", "基地车": "Vehicle",
+    "战斗机": "Aircraft", "轰炸机": "Aircraft",
+    "驱逐舰": "Naval", "潜艇": "Naval",
+}
+
+
+def production_queue(unit_type: str, is_building: bool) -> str:
+    """建筑/单位所在的生产队列"""
+    return PRODUCTION_QUEUES.get(unit_type, "Building" if is_building else "Vehicle")
+
+
 class BuildSystem:
-    def __init__(self, api: GameAPI):
+    def __init__(self, api: GameAPI, world: WorldState = None):
         self.api = api
+        # 依赖检查会反复查询同样的建筑，查询结果通过 WorldState 短时间缓存
+        self.world = world or api.world_state or WorldState(api)
+        # 所有生产队列共用一个监视器：一次批量查询全部队列，不存在的队列只报告一次
+        self.production = ProductionMonitor(api)
+        self.production.subscribe(ITEM_READY, lambda event: self.log(f"🏁 {event.item.chinese_name or event.item.name} 已完成"))
+        # 从生产队列观测到的每件建筑/单位的生产时间（秒）和花费，用于估计调度时长和资金需求
+        self.build_times = {}  # type: dict[str, float]
+        self.build_costs = {}  # type: dict[str, int]
+        self.production.subscribe(ITEM_STARTED, self._record_build_time)
         self.base_deployed = False
         self.current_have = {}  # type: dict[str, int]
 
     def log(self, msg: str):
         print(f"[BuildSystem] {msg}")
 
+    def _record_build_time(self, event):
+        item = event.item
+        for name in (item.name, item.chinese_name):
+            if not name:
+                continue
+            if item.total_time > 0:
+                self.build_times[name] = item.total_time
+            if item.total_cost > 0:
+                self.build_costs[name] = item.total_cost
+
     def wait_until_can_produce(self, unit_type: str, timeout: float = 30.0) -> bool:
         elapsed = 0
         while elapsed < timeout:
@@ -82,48 +121,29 @@ class BuildSystem:
 
     def wait_for_completion(self):
         """等待生产队列清空（建筑 + 单位）"""
-        while True:
-            # 建筑队列
-            building_queue = self.api.query_production_queue("Building")
-
-            # 尝试查询所有单位队列，如果失败则视为空列表
-            unit_queues = []
-            for unit_type in ["Infantry", "Vehicle", "Aircraft", "Naval"]:
-                try:
-                    queue = self.api.query_production_queue(unit_type)
-                    if queue:
-                        unit_queues.append(queue)
-                except GameAPIError as e:
-                    if e.code == "COMMAND_EXECUTION_ERROR":
-                        self.log(f"⚠️ {unit_type} 生产队列查询失败，可能不存在。")
-                        # 忽略此错误并继续
-                        continue
-                    else:
-                        # 重新抛出其他类型的错误
-                        raise e
-
-            # 检查所有队列是否都已清空
-            if not building_queue and not unit_queues:
-                break
-            time.sleep(1.0)
+        missing = set(self.production.missing_queues)
+        self.production.wait_until_idle()
+        for queue_type in sorted(self.production.missing_queues - missing):
+            self.log(f"⚠️ {queue_type} 生产队列暂不存在，稍后重新查询。")
         self.log(f"✅ 本轮生产全部完成")
 
     def ensure_base_deployed(self):
         if self.base_deployed:
             return True
 
-        base_exist = self.api.query_actor(TargetsQueryParam(type=["基地"], faction="己方"))
+        base_exist = self.world.query_actor(TargetsQueryParam(type=["基地"], faction="己方"))
         if base_exist:
             self.base_deployed = True
             return True
 
-        mcv_list = self.api.query_actor(TargetsQueryParam(type=["基地车"], faction="己方"))
+        mcv_list = self.world.query_actor(TargetsQueryParam(type=["基地车"], faction="己方"))
         if not mcv_list:
             self.log("❌ 没有基地车，先造一个")
             if not self.queue_build_order("基地车", 1, is_building=False):
                 return False
             self.wait_for_completion()
-            mcv_list = self.api.query_actor(TargetsQueryParam(type=["基地车"], faction="己方"))
+            self.world.invalidate("actors")
+            mcv_list = self.world.query_actor(TargetsQueryParam(type=["基地车"], faction="己方"))
 
         self.log("🚚 部署基地车")
         self.api.deploy_units(mcv_list)
@@ -154,34 +174,30 @@ class BuildSystem:
         return True
 
     def init_current_assets(self, steps):
-        """查询现有数量"""
-        for unit_type, _, _ in steps:
-            exist = self.api.query_actor(TargetsQueryParam(type=[unit_type], faction="己方"))
+        """查询现有数量（所有查询合并为一批发送）"""
+        with self.api.batch() as batch:
+            queries = [batch.query_actor(TargetsQueryParam(type=[unit_type], faction="己方"))
+                       for unit_type, _, _ in steps]
+        for (unit_type, _, _), query in zip(steps, queries):
+            exist = query.result()
             count = len(exist) if exist else 0
             self.current_have[unit_type] = count
             self.log(f"ℹ️ 已有 {unit_type} x {count}")
 
-    def run_mission(self, steps):
-        """并行执行建筑和单位生产"""
-        self.init_current_assets(steps)
-
-        for unit_type, qty, is_building in steps:
-            have_qty = self.current_have.get(unit_type, 0)
-            if have_qty >= qty:
-                self.log(f"✅ {unit_type} 已满足 (已有 {have_qty}, 目标 {qty})")
-                continue
-
-            if not self.check_and_prepare_deps(unit_type, is_building):
-                self.log(f"❌ 依赖准备失败：{unit_type}")
-                return False
-
-            need_qty = qty - have_qty
-            if self.queue_build_order(unit_type, need_qty, is_building):
-                self.current_have[unit_type] = qty  # 预占数量，防止重复下单
-            else:
-                return False
-
-        # 一次性等待所有建筑与单位完成
-        self.wait_for_completion()
+    def run_mission(self, steps, economy: bool = True):
+        """按依赖关系图调度生产，不同生产队列同时工作（见 BuildScheduler）
+
+        economy 为 True 时先根据资金和电力调整下单顺序、补建电厂（见 EconomyPlanner）
+        """
+        # 这两个模块依赖本模块的依赖表
+        from common.build_scheduler import BuildScheduler
+        from common.economy_planner import EconomyPlanner
+        scheduler = BuildScheduler(self)
+        scheduler.plan(steps)
+        if economy and scheduler.tasks:
+            EconomyPlanner(self).optimize(scheduler)
+        if not scheduler.run():
+            self.log("❌ 部分目标未能完成")
+            return False
         self.log("🎯 所有目标已生产完成")
-        return True
\ No newline at end of file
+        return True
@@ -0,0 +1,340 @@
+import copy
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+from common.build_scheduler import DONE, PENDING, QUEUED, BuildScheduler, BuildTask, expand_steps
+from common.build_system import BuildSystem
+
+# 建筑/单位的花费和电力（正数为供电，负数为耗电），是红警 mod 的近似值；
+# 观测到生产队列的 total_cost 之后以实际花费为准（见 BuildSystem.build_costs）
+ITEM_STATS = {
+    # 名称: (花费, 电力)
+    "电厂": (300, 100),
+    "核电厂": (500, 200),
+    "兵营": (400, -20),
+    "矿场": (1400, -30),
+    "防御塔": (600, -40),
+    "战车工厂": (2000, -30),
+    "雷达站": (1800, -40),
+    "船坞": (1000, -30),
+    "维修中心": (1200, -30),
+    "科技中心": (1500, -100),
+    "机场": (500, -20),
+    "防空塔": (750, -40),
+    "高级防御塔": (1500, -100),
+    "超级武器": (2500, -200),
+    "基地车": (2000, 0),
+    "步兵": (100, 0),
+    "工程师": (500, 0),
+    "警犬": (200, 0),
+    "火箭兵": (300, 0),
+    "采矿车": (1100, 0),
+    "矿车": (1100, 0),
+    "轻型坦克": (700, 0),
+    "重型坦克": (1150, 0),
+    "防空车": (600, 0),
+    "移动防空车": (600, 0),
+    "自行火炮": (800, 0),
+    "战斗机": (1200, 0),
+    "轰炸机": (2000, 0),
+    "驱逐舰": (1000, 0),
+    "潜艇": (950, 0),
+}
+DEFAULT_COST = 500  # 表中没有的建筑/单位的估计花费
+
+POWER_PLANT = "电厂"
+REFINERY = "矿场"
+INCOME_PER_REFINERY = 10.0  # 每个矿场（带一辆采矿车）每秒带来的资金，估计值
+LOW_POWER_TIME_FACTOR = 3.0  # 电力不足时生产时间变为原来的倍数，估计值
+
+
+@dataclass
+class EconomyState:
+    """模拟用的经济状态。不连接游戏时使用默认值（常见的开局资金、没有电力）。"""
+    cash: float = 5000.0  # Cash + Resources，两者都可以用于生产
+    power_provided: int = 0
+    power_drained: int = 0
+    refineries: int = 0
+
+    @property
+    def power(self) -> int:
+        return self.power_provided - self.power_drained
+
+
+@dataclass
+class SimulationResult:
+    total_time: float  # 全部任务完成的估计时间（秒），未能完成时为模拟的时长
+    completed: bool
+    finish_times: Dict[str, float] = field(default_factory=dict)  # 任务 key -> 完成时间
+    start_times: Dict[str, float] = field(default_factory=dict)
+    low_power_time: float = 0.0  # 电力不足的时长
+    cash_stall_time: float = 0.0  # 因资金不足而停工的时长（任一队列）
+    min_cash: float = 0.0
+    final_state: Optional[EconomyState] = None
+
+
+@dataclass
+class EconomyPlan:
+    priority: Dict[str, float]  # 任务 key -> 同一队列上的优先级
+    hold: Set[str]  # 其他队列在生产时需要等资金足够才下单的任务
+    extra_tasks: List[BuildTask]  # 额外补建的电厂
+    result: SimulationResult
+    baseline: SimulationResult  # 按关键路径优先级、不做调整时的估计
+    strategy: str = ""
+
+
+class EconomyPlanner:
+    """
+    考虑资金和电力的生产计划。
+
+    用 PlayerBaseInfo 的资金（Cash + Resources）、电力和每件建筑/单位的花费与生产时间
+    对依赖图做离散时间模拟：生产按进度逐步扣钱，资金不足时停工；电力不足时所有队列变慢；
+    矿场完成后收入增加。在若干候选方案（优先级、是否为关键路径让出资金、补建 0~N 座电厂）中
+    选择模拟完成时间最短的一个。
+
+    不给出 builder 时只能做模拟（simulate），不会访问游戏。
+    """
+
+    def __init__(self, builder: Optional[BuildSystem] = None, item_stats: Optional[Dict[str, Tuple[int, int]]] = None,
+                 income_per_refinery: float = INCOME_PER_REFINERY,
+                 low_power_time_factor: float = LOW_POWER_TIME_FACTOR, step: float = 0.5):
+        """
+        Args:
+            builder (BuildSystem, optional): 提供当前的经济状态和观测到的生产时间/花费。
+            item_stats (Dict[str, Tuple[int, int]], optional): 覆盖 ITEM_STATS 中的 (花费, 电力)。
+            income_per_refinery (float): 每个矿场每秒的收入。
+            low_power_time_factor (float): 电力不足时生产时间的倍数。
+            step (float): 模拟的时间步长（秒）。
+        """
+        self.builder = builder
+        self.item_stats = dict(ITEM_STATS)
+        self.item_stats.update(item_stats or {})
+        self.income_per_refinery = income_per_refinery
+        self.low_power_time_factor = low_power_time_factor
+        self.step = step
+
+    def log(self, msg: str):
+        if self.builder is not None:
+            self.builder.log(msg)
+
+    # ===== 花费与状态 =====
+
+    def item_cost(self, name: str) -> int:
+        """单件建筑/单位的花费，优先使用观测到的实际花费。"""
+        if self.builder is not None and self.builder.build_costs.get(name):
+            return self.builder.build_costs[name]
+        return self.item_stats.get(name, (DEFAULT_COST, 0))[0]
+
+    def item_power(self, name: str) -> int:
+        return self.item_stats.get(name, (0, 0))[1]
+
+    def current_state(self) -> EconomyState:
+        """从游戏读取当前的经济状态，需要 builder。"""
+        info = self.builder.world.player_base_info()
+        return EconomyState(cash=info.Cash + info.Resources, power_provided=info.PowerProvided,
+                            power_drained=info.PowerDrained,
+                            refineries=self.builder.current_have.get(REFINERY, 0))
+
+    # ===== 模拟 =====
+
+    def simulate(self, steps_or_tasks, state: Optional[EconomyState] = None, have: Optional[Dict[str, int]] = None,
+                 priority: Optional[Dict[str, float]] = None, hold: Set[str] = frozenset(),
+                 max_time: float = 3600.0) -> SimulationResult:
+        """
+        估计完成全部任务所需的时间，不访问游戏。
+
+        Args:
+            steps_or_tasks: mission_steps 列表 [(名称, 目标数量, 是否为建筑), ...]，
+                或 BuildScheduler.tasks 形式的 {key: BuildTask}。
+            state (EconomyState, optional): 初始经济状态，默认为 EconomyState()。
+            have (Dict[str, int], optional): 展开 mission_steps 时已有的建筑/单位数量，默认为空。
+            priority (Dict[str, float], optional): 同一队列上的优先级，默认按到终点的剩余路径长度。
+            hold (Set[str]): 其他队列在生产时需要资金足够才开始的任务。
+            max_time (float): 最长模拟时间（秒）。
+        """
+        if isinstance(steps_or_tasks, dict):
+            tasks = steps_or_tasks
+        else:
+            build_times = self.builder.build_times if self.builder is not None else None
+            tasks = expand_steps(steps_or_tasks, have or {}, build_times)
+        state = copy.copy(state or EconomyState())
+        priority = priority or self._remaining(tasks)
+        result = SimulationResult(0.0, False, min_cash=state.cash)
+
+        status = {key: DONE if task.status == DONE else PENDING for key, task in tasks.items()}
+        running: Dict[str, List] = {}  # 队列类型 -> [任务, 已完成的件数（可以是小数）, 已完成的整件数]
+        now = 0.0
+        while now < max_time:
+            # 下单：与 BuildScheduler._dispatch 相同的规则
+            ready = [task for key, task in tasks.items() if status[key] == PENDING
+                     and all(status[dep] == DONE for dep in task.deps)]
+            for task in sorted(ready, key=lambda t: priority.get(t.key, 0.0), reverse=True):
+                if task.queue_type in running:
+                    continue
+                if running and task.key in hold and state.cash < self.item_cost(task.name):
+                    continue
+                status[task.key] = QUEUED
+                running[task.queue_type] = [task, 0.0, 0]
+                result.start_times[task.key] = now
+            if not running:
+                result.completed = all(value == DONE for value in status.values())
+                break
+
+            # 推进一个时间步：收入先到账，资金按优先级分配给正在生产的任务
+            step = self.step
+            low_power = state.power < 0
+            if low_power:
+                result.low_power_time += step
+            state.cash += state.refineries * self.income_per_refinery * step
+            stalled = False
+            for queue_type, entry in sorted(running.items(), key=lambda item: priority.get(item[1][0].key, 0.0),
+                                            reverse=True):
+                task, progress, finished = entry
+                item_time = max(task.duration / task.quantity, 1e-6)
+                if low_power:
+                    item_time *= self.low_power_time_factor
+                delta = step / item_time
+                cost = delta * self.item_cost(task.name)
+                if cost > state.cash:
+                    delta *= state.cash / cost
+                    cost = state.cash
+                    stalled = True
+                state.cash -= cost
+                progress = min(task.quantity, progress + delta)
+                while finished < task.quantity and progress >= finished + 1 - 1e-9:
+                    finished += 1
+                    self._apply_completion(task, state)
+                entry[1], entry[2] = progress, finished
+                if finished >= task.quantity:
+                    status[task.key] = DONE
+                    result.finish_times[task.key] = now + step
+                    del running[queue_type]
+            if stalled:
+                result.cash_stall_time += step
+            result.min_cash = min(result.min_cash, state.cash)
+            now += step
+
+        result.total_time = max(result.finish_times.values(), default=0.0) if result.completed else now
+        result.final_state = state
+        return result
+
+    def _apply_completion(self, task: BuildTask, state: EconomyState) -> None:
+        if not task.is_building:
+            return
+        power = self.item_power(task.name)
+        if power >= 0:
+            state.power_provided += power
+        else:
+            state.power_drained -= power
+        if task.name == REFINERY:
+            state.refineries += 1
+
+    @staticmethod
+    def _remaining(tasks: Dict[str, BuildTask]) -> Dict[str, float]:
+        # 与 BuildScheduler._remaining 相同：到终点的最长估计用时
+        remaining: Dict[str, float] = {}
+
+        def visit(key: str) -> float:
+            if key not in remaining:
+                children = [child for child, task in tasks.items() if key in task.deps]
+                remaining[key] = tasks[key].duration + max((visit(child) for child in children), default=0.0)
+            return remaining[key]
+
+        for key in tasks:
+            visit(key)
+        return remaining
+
+    # ===== 计划 =====
+
+    def plan(self, tasks: Dict[str, BuildTask], state: Optional[EconomyState] = None,
+             max_extra_power_plants: int = 3) -> EconomyPlan:
+        """
+        在候选方案中选出模拟完成时间最短的一个。
+
+        候选方案由三项组合而成：
+        - 优先级：按关键路径，或让供电建筑排在最前；
+        - 资金：不在关键路径上的任务是否在资金不足时让出资金（延后下单）；
+        - 电力：在 Building 队列补建 0~max_extra_power_plants 座电厂（只在电力会不足时尝试）。
+        """
+        state = state or EconomyState()
+        critical = self._remaining(tasks)
+        path = self._critical_keys(tasks, critical)
+        baseline = self.simulate(tasks, state, priority=critical)
+
+        final_power = state.power + sum(self.item_power(task.name) * task.quantity
+                                        for task in tasks.values() if task.is_building and task.status != DONE)
+        extra_counts = range(max_extra_power_plants + 1) if final_power < 0 or baseline.low_power_time > 0 else [0]
+
+        best: Optional[EconomyPlan] = None
+        for extra_count in extra_counts:
+            extra = [self._power_plant_task(index + 1) for index in range(extra_count)]
+            candidate_tasks = dict(tasks)
+            candidate_tasks.update({task.key: task for task in extra})
+            base_priority = self._remaining(candidate_tasks)
+            top = max(base_priority.values(), default=0.0)
+            power_first = {key: value + (top if self.item_power(candidate_tasks[key].name) > 0 else 0.0)
+                           for key, value in base_priority.items()}
+            for priority_name, priority in (("关键路径优先", base_priority), ("电力优先", power_first)):
+                for hold in (set(), {key for key in candidate_tasks if key not in path}):
+                    result = self.simulate(candidate_tasks, state, priority=priority, hold=hold)
+                    strategy = f"{priority_name}，补建电厂 {extra_count} 座" + ("，非关键任务等待资金" if hold else "")
+                    if best is None or self._better(result, best.result):
+                        best = EconomyPlan(priority, hold, extra, result, baseline, strategy)
+        return best
+
+    @staticmethod
+    def _better(result: SimulationResult, other: SimulationResult) -> bool:
+        if result.completed != other.completed:
+            return result.completed
+        # 模拟步长内的差别视为相同，保留先尝试的（补建电厂更少的）方案
+        return result.total_time < other.total_time - 1e-6
+
+    @staticmethod
+    def _critical_keys(tasks: Dict[str, BuildTask], remaining: Dict[str, float]) -> Set[str]:
+        # 从剩余路径最长的起点沿依赖链向后，每步选剩余路径最长的后继
+        roots = [key for key, task in tasks.items() if not task.deps]
+        if not roots:
+            return set()
+        key = max(roots, key=remaining.get)
+        path = {key}
+        while True:
+            children = [child for child, task in tasks.items() if key in task.deps]
+            if not children:
+                return path
+            key = max(children, key=remaining.get)
+            path.add(key)
+
+    def _power_plant_task(self, index: int) -> BuildTask:
+        build_times = self.builder.build_times if self.builder is not None else None
+        task = expand_steps([(POWER_PLANT, 1, True)], {}, build_times)[POWER_PLANT]
+        task.key = f"{POWER_PLANT}#补建{index}"
+        return task
+
+    # ===== 应用到调度器 =====
+
+    def optimize(self, scheduler: BuildScheduler, max_extra_power_plants: int = 3) -> EconomyPlan:
+        """读取当前经济状态，为 scheduler 中已建立的依赖图制定计划并应用。"""
+        plan = self.plan(scheduler.tasks, self.current_state(), max_extra_power_plants)
+        self.apply(plan, scheduler)
+        self.log(f"💰 生产计划: {plan.strategy}，估计 {plan.result.total_time:.0f} 秒"
+                 f"（不调整时 {plan.baseline.total_time:.0f} 秒）")
+        if plan.result.low_power_time > 0:
+            self.log(f"⚡ 预计电力不足 {plan.result.low_power_time:.0f} 秒")
+        if plan.result.cash_stall_time > 0:
+            self.log(f"💸 预计因资金不足停工 {plan.result.cash_stall_time:.0f} 秒")
+        return plan
+
+    def apply(self, plan: EconomyPlan, scheduler: BuildScheduler) -> None:
+        for task in plan.extra_tasks:
+            scheduler.tasks[task.key] = task
+        scheduler.order = scheduler.topological_order()
+        scheduler.priority = plan.priority
+        hold = plan.hold
+
+        def can_start(task: BuildTask) -> bool:
+            if task.key not in hold:
+                return True
+            info = self.builder.world.player_base_info()
+            return info.Cash + info.Resources >= self.item_cost(task.name)
+
+        scheduler.can_start = can_start
@@ -1,6 +1,8 @@
 import time
 from game_api import GameAPI, GameAPIError
 from models import Location, TargetsQueryParam, MapQueryResult, Actor
+from common.fog_tracker import FogTracker
+from common.map_state import MapDelta, MapState
 
 # 全局变量，用于存储扫描到的敌方单位
 discovered_enemy_units: list[Actor] = []
@@ -13,22 +15,27 @@ class FogExplorer:
     以及命令单位执行探索任务的逻辑。
     """
 
-    def __init__(self, host: str = "localhost"):
+    def __init__(self, host: str = "localhost", api: GameAPI = None):
         """
         初始化FogExplorer并连接到游戏服务器。
 
         Args:
             host (str): 游戏服务器的主机地址。
+            api (GameAPI, optional): 复用已有的 GameAPI 实例，默认新建一个使用连接池的实例。
 
         Raises:
             ConnectionError: 如果无法连接到游戏服务器。
         """
         print("正在初始化 FogExplorer...")
-        if not GameAPI.is_server_running():
+        self.api = api or GameAPI(host, transport="pooled")
+        # 健康监视器在已有连接上维护存活状态，不需要每次都新建连接探测
+        if not self.api.is_alive:
             raise ConnectionError("错误: 游戏服务器未运行。请启动游戏和任务。")
-        
-        self.api = GameAPI(host)
+
         self.instance_enemy_units: list[Actor] = []
+        # 地图静态图层只下载一次，之后的迷雾轮询只刷新可见/已探索图层
+        self.map_state = MapState(self.api)
+        self._fog: FogTracker = None
         print("成功连接到游戏服务器。")
 
     def get_enemy_units(self) -> list[Actor]:
@@ -102,14 +109,53 @@ class FogExplorer:
 
         # 2. 获取地图尺寸
         print("正在查询地图尺寸...")
-        map_info: MapQueryResult = self.api.map_query()
-        print(f"地图尺寸为 {map_info.MapWidth}x{map_info.MapHeight}。")
+        map_grids = self.map_state.load()
+        print(f"地图尺寸为 {map_grids.width}x{map_grids.height}。")
 
         # 3. 生成探索路径
-        path = self._generate_serpentine_path(map_info.MapWidth, map_info.MapHeight, padding, vertical_step)
+        path = self._generate_serpentine_path(map_grids.width, map_grids.height, padding, vertical_step)
 
         # 4. 命令单位移动
         print(f"向单位 {explorer_unit.actor_id} 发出移动指令...")
         # 使用正确的 API 函数 move_units_by_path，并传递一个包含 Actor 对象的列表
         self.api.move_units_by_path([explorer_unit], path)
-        print("指令已成功发出。单位现在将开始探索地图。")   
\ No newline at end of file
+        print("指令已成功发出。单位现在将开始探索地图。")   
+
+    def poll_fog(self, scouts: list[Actor] = None, radius: int = 8) -> MapDelta:
+        """
+        刷新战争迷雾状态，适合每秒调用一次。
+
+        Args:
+            scouts (list[Actor], optional): 侦察单位；给出时只查询它们周围 radius 内的格子，
+                否则刷新全图的可见/已探索图层。
+            radius (int, optional): 每个侦察单位周围需要刷新的半径。默认为 8。
+
+        Returns:
+            MapDelta: 自上次刷新以来发生变化的格子。
+        """
+        fog = self.fog
+        if scouts:
+            delta = self.map_state.refresh_around([unit.position for unit in scouts if unit.position], radius)
+        else:
+            delta = self.map_state.refresh_full()
+        if delta.full_refresh and (fog.width, fog.height) != (self.map_state.width, self.map_state.height):
+            # 地图换了，重新建立迷雾跟踪器
+            self._fog = FogTracker.from_grids(self.map_state.grids)
+        else:
+            fog.apply_delta(delta)
+        return delta
+
+    @property
+    def fog(self) -> FogTracker:
+        """
+        以位集维护的迷雾状态，随 poll_fog 增量更新。
+        """
+        if self._fog is None:
+            self._fog = FogTracker.from_grids(self.map_state.load())
+        return self._fog
+
+    def exploration_progress(self) -> float:
+        """
+        已探索格子占全图的比例（基于最近一次刷新的结果）。
+        """
+        return self.fog.coverage()
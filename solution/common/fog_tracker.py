@@ -0,0 +1,212 @@
+import time
+from collections import deque
+from itertools import chain
+from typing import Deque, Iterable, List, Optional, Tuple
+
+from models import Location, MapGrids, MapQueryResult
+from common.map_state import MapDelta
+
+# int.bit_count 从 Python 3.10 开始提供
+_popcount = int.bit_count if hasattr(int, "bit_count") else (lambda n: bin(n).count("1"))
+
+# 把 0/1 字节转换为 ASCII '0'/'1'，用于把位图一次性打包成整数
+_BITS_TABLE = bytes.maketrans(b"\x00\x01", b"01")
+
+
+def pack_bits(cells: bytes) -> int:
+    """把每格一个字节（0/1）的位图打包成整数位集，第 i 格对应第 i 位。"""
+    if not cells:
+        return 0
+    return int(bytes(cells).translate(_BITS_TABLE)[::-1], 2)
+
+
+def iter_bits(mask: int) -> Iterable[int]:
+    """按从低到高的顺序返回位集中为 1 的位的下标。"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class FogTracker:
+    """
+    以位集保存战争迷雾状态的跟踪器。
+
+    IsExplored / IsVisible 各是一个整数位集（第 x * height + y 位对应格子 (x, y)，与 MapGrids 相同）。
+    覆盖率、按区域的已探索格数都随更新增量维护，查询是 O(1)；每次更新只对新探索的格子
+    逐位处理，整图比较、计数都由整数位运算完成。
+
+    更新来源可以是完整的 map_query / MapGrids、MapState 刷新返回的 MapDelta，或单个格子的 fog_query 结果。
+    """
+
+    def __init__(self, width: int, height: int, region_size: int = 16, max_history: int = 256):
+        """
+        Args:
+            width (int): 地图宽度。
+            height (int): 地图高度。
+            region_size (int): 统计区域覆盖率时每个区域的边长（格）。
+            max_history (int): 为 newly_explored_since 保留的最近更新次数，更早的更新会合并到下一次中。
+        """
+        self.width = width
+        self.height = height
+        self.size = width * height
+        self.full_mask = (1 << self.size) - 1
+        self.region_size = region_size
+        self.regions_x = (width + region_size - 1) // region_size
+        self.regions_y = (height + region_size - 1) // region_size
+        self.explored = 0
+        self.visible = 0
+        self.explored_count = 0
+        self.visible_count = 0
+        self.updated_at = 0.0
+        self._region_explored = [0] * (self.regions_x * self.regions_y)
+        self._region_sizes = [
+            (min(width, (rx + 1) * region_size) - rx * region_size) *
+            (min(height, (ry + 1) * region_size) - ry * region_size)
+            for rx in range(self.regions_x) for ry in range(self.regions_y)
+        ]
+        self._history: Deque[Tuple[float, int]] = deque()  # (时间, 这次更新新探索的格子)
+        self.max_history = max_history
+
+    @classmethod
+    def from_grids(cls, grids: MapGrids, **kwargs) -> 'FogTracker':
+        tracker = cls(grids.width, grids.height, **kwargs)
+        tracker.update_from_grids(grids)
+        return tracker
+
+    # ===== 更新 =====
+
+    def update_from_grids(self, grids: MapGrids, timestamp: Optional[float] = None) -> int:
+        """用 MapGrids 的整图状态更新，返回新探索格子的位集。"""
+        self._check_size(grids.width, grids.height)
+        return self._set_masks(pack_bits(grids.explored), pack_bits(grids.visible), timestamp)
+
+    def update_from_map_query(self, result: MapQueryResult, timestamp: Optional[float] = None) -> int:
+        """用 map_query 的结果更新，返回新探索格子的位集。"""
+        self._check_size(result.MapWidth, result.MapHeight)
+        explored = pack_bits(bytes(chain.from_iterable(result.IsExplored)))
+        visible = pack_bits(bytes(chain.from_iterable(result.IsVisible)))
+        return self._set_masks(explored, visible, timestamp)
+
+    def apply_delta(self, delta: MapDelta, timestamp: Optional[float] = None) -> int:
+        """应用 MapState 刷新返回的变化，返回新探索格子的位集。"""
+        newly = 0
+        for cell in delta.newly_explored:
+            newly |= 1 << self._bit(cell.x, cell.y)
+        shown = 0
+        for cell in delta.became_visible:
+            shown |= 1 << self._bit(cell.x, cell.y)
+        hidden = 0
+        for cell in delta.became_hidden:
+            hidden |= 1 << self._bit(cell.x, cell.y)
+        visible = (self.visible | shown) & ~hidden
+        return self._set_masks(self.explored | newly, visible, timestamp)
+
+    def update_cell(self, x: int, y: int, explored: bool, visible: bool, timestamp: Optional[float] = None) -> bool:
+        """用单个格子的 fog_query 结果更新，返回这个格子是否是新探索的。"""
+        bit = 1 << self._bit(x, y)
+        visible_mask = self.visible | bit if visible else self.visible & ~bit
+        explored_mask = self.explored | bit if explored else self.explored
+        return bool(self._set_masks(explored_mask, visible_mask, timestamp))
+
+    # ===== 查询 =====
+
+    def coverage(self) -> float:
+        """已探索格子占全图的比例。"""
+        return self.explored_count / self.size if self.size else 0.0
+
+    def visible_coverage(self) -> float:
+        """当前可见格子占全图的比例。"""
+        return self.visible_count / self.size if self.size else 0.0
+
+    def is_fully_explored(self) -> bool:
+        return self.size > 0 and self.explored_count == self.size
+
+    def is_explored(self, x: int, y: int) -> bool:
+        return bool(self.explored >> self._bit(x, y) & 1)
+
+    def is_visible(self, x: int, y: int) -> bool:
+        return bool(self.visible >> self._bit(x, y) & 1)
+
+    def region_of(self, x: int, y: int) -> Tuple[int, int]:
+        return x // self.region_size, y // self.region_size
+
+    def region_explored(self, rx: int, ry: int) -> int:
+        """区域 (rx, ry) 中已探索的格子数。"""
+        return self._region_explored[rx * self.regions_y + ry]
+
+    def region_coverage(self, rx: int, ry: int) -> float:
+        """区域 (rx, ry) 的已探索比例。"""
+        index = rx * self.regions_y + ry
+        return self._region_explored[index] / self._region_sizes[index]
+
+    def region_counts(self) -> List[List[int]]:
+        """各区域已探索的格子数，按 [rx][ry] 排列。"""
+        ry_count = self.regions_y
+        return [self._region_explored[rx * ry_count:(rx + 1) * ry_count] for rx in range(self.regions_x)]
+
+    def least_explored_regions(self, n: int = 1) -> List[Tuple[int, int]]:
+        """已探索比例最低的 n 个区域 (rx, ry)，比例相同时按坐标排列。"""
+        order = sorted(range(len(self._region_explored)),
+                       key=lambda i: (self._region_explored[i] / self._region_sizes[i], i))
+        return [divmod(i, self.regions_y) for i in order[:n]]
+
+    def region_center(self, rx: int, ry: int) -> Location:
+        x0, y0 = rx * self.region_size, ry * self.region_size
+        return Location((x0 + min(self.width, x0 + self.region_size) - 1) // 2,
+                        (y0 + min(self.height, y0 + self.region_size) - 1) // 2)
+
+    def newly_explored_since(self, timestamp: float) -> int:
+        """time.monotonic() 时刻 timestamp 之后新探索的格子的位集。"""
+        mask = 0
+        for updated_at, newly in reversed(self._history):
+            if updated_at <= timestamp:
+                break
+            mask |= newly
+        return mask
+
+    def unexplored_mask(self) -> int:
+        return self.full_mask & ~self.explored
+
+    def mask_count(self, mask: int) -> int:
+        return _popcount(mask)
+
+    def mask_cells(self, mask: int) -> List[Location]:
+        """把位集转换为格子列表。"""
+        h = self.height
+        return [Location(bit // h, bit % h) for bit in iter_bits(mask)]
+
+    # ===== 内部实现 =====
+
+    def _bit(self, x: int, y: int) -> int:
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            raise IndexError(f"格子 ({x}, {y}) 超出地图范围")
+        return x * self.height + y
+
+    def _check_size(self, width: int, height: int) -> None:
+        if (width, height) != (self.width, self.height):
+            raise ValueError(f"地图尺寸 {width}x{height} 与跟踪器的 {self.width}x{self.height} 不一致")
+
+    def _set_masks(self, explored: int, visible: int, timestamp: Optional[float]) -> int:
+        # 已探索的格子不会变回未探索，新状态与旧状态取并集
+        explored |= self.explored
+        newly = explored & ~self.explored
+        if newly:
+            h, size, regions_y = self.height, self.region_size, self.regions_y
+            counts = self._region_explored
+            for bit in iter_bits(newly):
+                x, y = divmod(bit, h)
+                counts[(x // size) * regions_y + y // size] += 1
+            self.explored_count += _popcount(newly)
+            self.explored = explored
+        if visible != self.visible:
+            self.visible = visible
+            self.visible_count = _popcount(visible)
+        self.updated_at = time.monotonic() if timestamp is None else timestamp
+        if newly:
+            self._history.append((self.updated_at, newly))
+            if len(self._history) > self.max_history:
+                _, oldest = self._history.popleft()
+                updated_at, following = self._history[0]
+                self._history[0] = (updated_at, following | oldest)
+        return newly
@@ -0,0 +1,411 @@
+import hashlib
+import json
+import os
+import struct
+import sys
+from array import array
+from collections import deque
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from models import Location, MapGrids
+
+# 各移动类型可以通行的地形（小写）。不在表中的地形一律视为不可通行。
+# 步兵和车辆在各地形上只有速度不同，通行与否相同，因此合并为 ground。
+MOVEMENT_CLASSES: Dict[str, FrozenSet[str]] = {
+    "ground": frozenset({"clear", "rough", "road", "ore", "gems", "beach", "bridge", "dirt", "grass"}),
+    "naval": frozenset({"water"}),
+}
+
+# 默认的磁盘缓存目录，在当前用户自己的缓存目录下（不使用所有用户共享的临时目录）
+DEFAULT_CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+                                 "openra_map_layers")
+
+# 缓存文件格式版本，图层的计算方式或文件格式改变时递增，旧缓存自动失效
+_CACHE_VERSION = 3
+
+# 缓存文件：文件头之后依次是 JSON 描述和各图层的原始数据（小端序），不包含任何可执行的内容
+_MAGIC = b"MLYR"
+_HEADER = struct.Struct("<4sHI")  # 魔数、版本、JSON 描述的字节数
+_LAYER_COLUMNS = (("passable", "B"), ("clearance", "H"), ("regions", "i"), ("chokepoints", "B"))
+
+# 8 邻域
+_NEIGHBOURS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+
+
+def map_content_key(grids: MapGrids, movement_classes: Dict[str, FrozenSet[str]] = None,
+                    choke_width: int = 4, ore_radius: int = 3) -> str:
+    """
+    地图静态内容的缓存键：尺寸 + 地形、高度、资源类型、移动类型定义和构建参数的哈希。
+
+    资源数量会随采集变化，不参与哈希；矿石密度场可以用 MapLayers.update_ore 单独刷新。
+    """
+    digest = hashlib.sha1()
+    digest.update(f"{_CACHE_VERSION}:{grids.width}x{grids.height}".encode())
+    digest.update("\0".join(grids.terrain_names).encode("utf-8"))
+    digest.update(bytes(grids.terrain))
+    digest.update(grids.heights.tobytes())
+    digest.update("\0".join(grids.resource_type_names).encode("utf-8"))
+    digest.update(bytes(grids.resource_types))
+    for name, terrains in sorted((movement_classes or MOVEMENT_CLASSES).items()):
+        digest.update(f"{name}={','.join(sorted(terrains))};".encode("utf-8"))
+    digest.update(f"choke_width={choke_width};ore_radius={ore_radius}".encode())
+    return f"{grids.width}x{grids.height}-{digest.hexdigest()[:20]}"
+
+
+class MovementLayers:
+    """单个移动类型的派生图层，布局与 MapGrids 相同（下标为 x * height + y）。"""
+
+    __slots__ = ("passable", "clearance", "regions", "region_sizes", "chokepoints")
+
+    def __init__(self, passable: bytearray, clearance: array, regions: array, region_sizes: List[int],
+                 chokepoints: bytearray):
+        self.passable = passable  # 是否可通行（0/1）
+        self.clearance = clearance  # 到最近障碍物或地图边缘的切比雪夫距离，不可通行为 0
+        self.regions = regions  # 8 连通区域编号，不可通行为 -1
+        self.region_sizes = region_sizes  # 每个区域的格子数
+        self.chokepoints = chokepoints  # 是否是隘口格子（0/1）
+
+
+class MapLayers:
+    """
+    从 MapGrids 派生、每张地图只计算一次的图层：
+
+    - 按移动类型的通行掩码；
+    - 到障碍物的距离（clearance），可用于判断能否放下建筑或大部队；
+    - 连通区域，用于 O(1) 判断两点是否可达；
+    - 隘口：一个方向上两侧很快被障碍物夹住、另一个方向上仍然通畅的可通行格子；
+    - 平滑后的矿石密度场（以每个格子为中心的方形窗口内的资源总量）。
+
+    所有查询都是按下标读数组，O(1)。load_or_build 以地图尺寸和内容哈希为键把结果缓存到磁盘，
+    同一张地图再次加载时直接读取。
+    """
+
+    def __init__(self, width: int, height: int, key: str, movement: Dict[str, MovementLayers],
+                 ore_density: array, ore_radius: int):
+        self.width = width
+        self.height = height
+        self.key = key
+        self.movement = movement
+        self.ore_density = ore_density
+        self.ore_radius = ore_radius
+
+    # ===== 构建与缓存 =====
+
+    @classmethod
+    def build(cls, grids: MapGrids, movement_classes: Dict[str, FrozenSet[str]] = None,
+              choke_width: int = 4, ore_radius: int = 3) -> 'MapLayers':
+        """
+        从 MapGrids 计算全部图层。
+
+        Args:
+            grids (MapGrids): 地图网格。
+            movement_classes (Dict[str, FrozenSet[str]], optional): 移动类型到可通行地形的映射，默认 MOVEMENT_CLASSES。
+            choke_width (int): 通道宽度不超过多少格时视为隘口。
+            ore_radius (int): 矿石密度窗口的半径（窗口边长为 2 * ore_radius + 1）。
+        """
+        movement_classes = movement_classes or MOVEMENT_CLASSES
+        movement = {}
+        for name, terrains in movement_classes.items():
+            passable = _passable_mask(grids, terrains)
+            regions, sizes = _connected_regions(passable, grids.width, grids.height)
+            movement[name] = MovementLayers(passable, _clearance(passable, grids.width, grids.height),
+                                            regions, sizes,
+                                            _chokepoints(passable, grids.width, grids.height, choke_width))
+        return cls(grids.width, grids.height, map_content_key(grids, movement_classes, choke_width, ore_radius),
+                   movement,
+                   _box_sum(grids.resources, grids.width, grids.height, ore_radius), ore_radius)
+
+    @classmethod
+    def load_or_build(cls, grids: MapGrids, cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+                      movement_classes: Dict[str, FrozenSet[str]] = None,
+                      choke_width: int = 4, ore_radius: int = 3) -> 'MapLayers':
+        """
+        优先从磁盘缓存读取图层，没有缓存时计算并写入缓存。cache_dir 为 None 时不使用缓存。
+
+        缓存键包含全部构建参数，参数不同的图层不会互相复用。
+
+        读取缓存后会用当前的资源数量刷新矿石密度场。
+        """
+        if cache_dir is None:
+            return cls.build(grids, movement_classes, choke_width, ore_radius)
+        key = map_content_key(grids, movement_classes, choke_width, ore_radius)
+        path = os.path.join(cache_dir, key + ".layers")
+        layers = cls._load(path)
+        if layers is not None and (layers.key, layers.width, layers.height) == (key, grids.width, grids.height):
+            layers.update_ore(grids)
+            return layers
+        layers = cls.build(grids, movement_classes, choke_width, ore_radius)
+        try:
+            os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            layers.save(tmp_path)
+            os.replace(tmp_path, path)
+        except OSError:
+            # 缓存只是加速手段，写不进去不影响使用
+            pass
+        return layers
+
+    def save(self, path: str) -> None:
+        """把全部图层写成紧凑的二进制文件：JSON 描述 + 各数组的原始字节。"""
+        header = json.dumps({
+            "width": self.width,
+            "height": self.height,
+            "key": self.key,
+            "ore_radius": self.ore_radius,
+            "movement": [{"name": name, "region_sizes": layer.region_sizes}
+                         for name, layer in self.movement.items()],
+        }, ensure_ascii=False).encode("utf-8")
+        columns = []
+        for layer in self.movement.values():
+            for name, typecode in _LAYER_COLUMNS:
+                columns.append(array(typecode, getattr(layer, name)))
+        columns.append(array("i", self.ore_density))
+        if sys.byteorder == "big":
+            for column in columns:
+                column.byteswap()
+        with open(path, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, _CACHE_VERSION, len(header)))
+            f.write(header)
+            for column in columns:
+                column.tofile(f)
+
+    @classmethod
+    def load(cls, path: str) -> 'MapLayers':
+        """读取 save 写出的文件，格式不对或数据不完整时抛出 ValueError。"""
+        with open(path, "rb") as f:
+            head = f.read(_HEADER.size)
+            if len(head) != _HEADER.size:
+                raise ValueError(f"不是有效的图层缓存文件: {path}")
+            magic, version, header_size = _HEADER.unpack(head)
+            if magic != _MAGIC or version != _CACHE_VERSION:
+                raise ValueError(f"不是有效的图层缓存文件: {path}")
+            header = json.loads(f.read(header_size).decode("utf-8"))
+            width, height = int(header["width"]), int(header["height"])
+            size = width * height
+
+            def read_column(typecode: str) -> array:
+                column = array(typecode)
+                column.fromfile(f, size)  # 数据不足时抛出 EOFError
+                if sys.byteorder == "big":
+                    column.byteswap()
+                return column
+
+            movement = {}
+            for entry in header["movement"]:
+                passable, clearance, regions, chokepoints = (read_column(typecode) for _, typecode in _LAYER_COLUMNS)
+                region_sizes = [int(count) for count in entry["region_sizes"]]
+                if any(region >= len(region_sizes) for region in regions):
+                    raise ValueError(f"图层缓存中的区域编号无效: {path}")
+                movement[str(entry["name"])] = MovementLayers(bytearray(passable), clearance, regions, region_sizes,
+                                                              bytearray(chokepoints))
+            ore_density = read_column("i")
+            if f.read(1):
+                raise ValueError(f"图层缓存文件末尾有多余的数据: {path}")
+        return cls(width, height, str(header["key"]), movement, ore_density, int(header["ore_radius"]))
+
+    @classmethod
+    def _load(cls, path: str) -> Optional['MapLayers']:
+        try:
+            return cls.load(path)
+        except (OSError, EOFError, ValueError, KeyError, TypeError, struct.error):
+            # 缓存文件不存在、被截断或内容不对，都当作没有缓存，重新计算
+            return None
+
+    def update_ore(self, grids: MapGrids) -> None:
+        """用当前的资源数量重新计算矿石密度场。"""
+        self.ore_density = _box_sum(grids.resources, self.width, self.height, self.ore_radius)
+
+    # ===== 查询 =====
+
+    def layer(self, movement_class: str) -> MovementLayers:
+        layer = self.movement.get(movement_class)
+        if layer is None:
+            raise KeyError(f"未知的移动类型: {movement_class}")
+        return layer
+
+    def in_bounds(self, x: int, y: int) -> bool:
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def is_passable(self, x: int, y: int, movement_class: str = "ground") -> bool:
+        return self.in_bounds(x, y) and self.layer(movement_class).passable[x * self.height + y] == 1
+
+    def clearance(self, x: int, y: int, movement_class: str = "ground") -> int:
+        """到最近障碍物的距离，clearance >= k 表示以该格为中心的 (2k-1)×(2k-1) 方块全部可通行。"""
+        if not self.in_bounds(x, y):
+            return 0
+        return self.layer(movement_class).clearance[x * self.height + y]
+
+    def region_id(self, x: int, y: int, movement_class: str = "ground") -> int:
+        if not self.in_bounds(x, y):
+            return -1
+        return self.layer(movement_class).regions[x * self.height + y]
+
+    def region_size(self, x: int, y: int, movement_class: str = "ground") -> int:
+        region = self.region_id(x, y, movement_class)
+        return self.layer(movement_class).region_sizes[region] if region >= 0 else 0
+
+    def is_reachable(self, start: Location, goal: Location, movement_class: str = "ground") -> bool:
+        """两个格子是否在同一连通区域内。"""
+        region = self.region_id(start.x, start.y, movement_class)
+        return region >= 0 and region == self.region_id(goal.x, goal.y, movement_class)
+
+    def is_chokepoint(self, x: int, y: int, movement_class: str = "ground") -> bool:
+        return self.in_bounds(x, y) and self.layer(movement_class).chokepoints[x * self.height + y] == 1
+
+    def chokepoint_cells(self, movement_class: str = "ground") -> List[Location]:
+        return self._cells(self.layer(movement_class).chokepoints)
+
+    def ore_at(self, x: int, y: int) -> int:
+        """以 (x, y) 为中心的窗口内的资源总量。"""
+        return self.ore_density[x * self.height + y] if self.in_bounds(x, y) else 0
+
+    def richest_ore_fields(self, n: int = 3, min_spacing: Optional[int] = None) -> List[Tuple[Location, int]]:
+        """
+        矿石密度最高的 n 个位置及其密度，彼此的切比雪夫距离至少为 min_spacing（默认为窗口边长）。
+        """
+        spacing = 2 * self.ore_radius + 1 if min_spacing is None else min_spacing
+        h = self.height
+        order = sorted((i for i, value in enumerate(self.ore_density) if value > 0),
+                       key=lambda i: (-self.ore_density[i], i))
+        picked: List[Tuple[Location, int]] = []
+        for index in order:
+            x, y = divmod(index, h)
+            if all(max(abs(x - loc.x), abs(y - loc.y)) >= spacing for loc, _ in picked):
+                picked.append((Location(x, y), self.ore_density[index]))
+                if len(picked) == n:
+                    break
+        return picked
+
+    def _cells(self, mask: bytearray) -> List[Location]:
+        h = self.height
+        cells = []
+        pos = mask.find(1)
+        while pos >= 0:
+            cells.append(Location(pos // h, pos % h))
+            pos = mask.find(1, pos + 1)
+        return cells
+
+
+def _passable_mask(grids: MapGrids, terrains: FrozenSet[str]) -> bytearray:
+    # 先按地形编码建一张 0/1 翻译表，再用 bytes.translate 一次转换整张图
+    table = bytearray(256)
+    for code, name in enumerate(grids.terrain_names):
+        if name.lower() in terrains:
+            table[code] = 1
+    return bytearray(bytes(grids.terrain).translate(bytes(table)))
+
+
+def _clearance(passable: bytearray, width: int, height: int) -> array:
+    # 多源 BFS：障碍物和地图外为距离 0，8 邻域一步为 1，得到切比雪夫距离
+    size = width * height
+    distance = array("H", [0]) * size
+    queue = deque()
+    for index in range(size):
+        if not passable[index]:
+            continue
+        x, y = divmod(index, height)
+        if x == 0 or y == 0 or x == width - 1 or y == height - 1:
+            distance[index] = 1
+            queue.append(index)
+            continue
+        for dx, dy in _NEIGHBOURS:
+            if not passable[(x + dx) * height + y + dy]:
+                distance[index] = 1
+                queue.append(index)
+                break
+    while queue:
+        index = queue.popleft()
+        x, y = divmod(index, height)
+        next_distance = distance[index] + 1
+        for dx, dy in _NEIGHBOURS:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < width and 0 <= ny < height:
+                neighbour = nx * height + ny
+                if passable[neighbour] and distance[neighbour] == 0:
+                    distance[neighbour] = next_distance
+                    queue.append(neighbour)
+    return distance
+
+
+def _connected_regions(passable: bytearray, width: int, height: int) -> Tuple[array, List[int]]:
+    regions = array("i", [-1]) * (width * height)
+    sizes: List[int] = []
+    pos = passable.find(1)
+    while pos >= 0:
+        if regions[pos] < 0:
+            region = len(sizes)
+            regions[pos] = region
+            count = 0
+            stack = [pos]
+            while stack:
+                index = stack.pop()
+                count += 1
+                x, y = divmod(index, height)
+                for dx, dy in _NEIGHBOURS:
+                    nx, ny = x + dx, y + dy
+                    if 0 <= nx < width and 0 <= ny < height:
+                        neighbour = nx * height + ny
+                        if passable[neighbour] and regions[neighbour] < 0:
+                            regions[neighbour] = region
+                            stack.append(neighbour)
+            sizes.append(count)
+        pos = passable.find(1, pos + 1)
+    return regions, sizes
+
+
+def _chokepoints(passable: bytearray, width: int, height: int, choke_width: int) -> bytearray:
+    # 每个可通行格子在水平、竖直方向上所在连续可通行段的长度；
+    # 一个方向很窄（不超过 choke_width）而另一个方向宽的格子就是通道中的隘口
+    size = width * height
+    run_x = array("H", [0]) * size  # 沿 x 方向（同一 y、相邻列）的段长
+    run_y = array("H", [0]) * size  # 沿 y 方向（同一列）的段长
+    for x in range(width):
+        base = x * height
+        y = 0
+        while y < height:
+            if not passable[base + y]:
+                y += 1
+                continue
+            start = y
+            while y < height and passable[base + y]:
+                y += 1
+            for i in range(base + start, base + y):
+                run_y[i] = y - start
+    for y in range(height):
+        x = 0
+        while x < width:
+            if not passable[x * height + y]:
+                x += 1
+                continue
+            start = x
+            while x < width and passable[x * height + y]:
+                x += 1
+            for i in range(start, x):
+                run_x[i * height + y] = x - start
+    chokepoints = bytearray(size)
+    for index in range(size):
+        if passable[index]:
+            narrow, wide = sorted((run_x[index], run_y[index]))
+            if narrow <= choke_width < wide:
+                chokepoints[index] = 1
+    return chokepoints
+
+
+def _box_sum(values: array, width: int, height: int, radius: int) -> array:
+    # 二维前缀和，每个格子的窗口和只需要 4 次查表
+    stride = height + 1
+    prefix = array("q", [0]) * ((width + 1) * stride)
+    for x in range(width):
+        row_sum = 0
+        base = x * height
+        for y in range(height):
+            row_sum += values[base + y]
+            prefix[(x + 1) * stride + y + 1] = prefix[x * stride + y + 1] + row_sum
+    result = array("i", [0]) * (width * height)
+    for x in range(width):
+        x0, x1 = max(0, x - radius), min(width, x + radius + 1)
+        for y in range(height):
+            y0, y1 = max(0, y - radius), min(height, y + radius + 1)
+            result[x * height + y] = (prefix[x1 * stride + y1] - prefix[x0 * stride + y1]
+                                      - prefix[x1 * stride + y0] + prefix[x0 * stride + y0])
+    return result
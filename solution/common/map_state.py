@@ -0,0 +1,198 @@
+import time
+from dataclasses import dataclass, field
+from itertools import chain
+from typing import Iterable, List, Optional, Set, Tuple
+
+from game_api import GameAPI, GameAPIError
+from models import Location, MapGrids
+from common.map_layers import DEFAULT_CACHE_DIR, MapLayers
+
+
+@dataclass
+class MapDelta:
+    """一次刷新中发生变化的格子。"""
+    became_visible: List[Location] = field(default_factory=list)  # 由不可见变为可见
+    became_hidden: List[Location] = field(default_factory=list)  # 由可见变为不可见
+    newly_explored: List[Location] = field(default_factory=list)  # 第一次被探索
+    full_refresh: bool = False  # 是否通过完整的 map_query 刷新
+
+    def __bool__(self) -> bool:
+        return bool(self.became_visible or self.became_hidden or self.newly_explored)
+
+    @property
+    def changed(self) -> List[Location]:
+        """所有发生变化的格子（去重）。"""
+        seen: Set[Tuple[int, int]] = set()
+        cells = []
+        for cell in chain(self.became_visible, self.became_hidden, self.newly_explored):
+            if (cell.x, cell.y) not in seen:
+                seen.add((cell.x, cell.y))
+                cells.append(cell)
+        return cells
+
+
+class MapState:
+    """
+    增量维护的地图状态。
+
+    高度、地形、资源类型这些几乎不变的静态图层只在第一次加载时下载和解析一次；
+    之后的刷新只更新可见/已探索两个动态图层，并报告自上次刷新以来变化的格子：
+
+    - refresh_cells / refresh_around：对少量格子批量发送 fog_query（一批请求一次往返）；
+    - refresh_full：需要刷新的格子太多时退回一次 map_query，但只解析动态图层。
+    """
+
+    def __init__(self, api: GameAPI, max_fog_queries: int = 256, full_refresh_interval: Optional[float] = None):
+        """
+        Args:
+            api (GameAPI): 用于查询的 GameAPI 实例。
+            max_fog_queries (int): 一次区域刷新最多发送的 fog_query 数量，超过时改用完整刷新。
+            full_refresh_interval (float, optional): 距上次完整刷新超过这么多秒时，
+                refresh() 会做一次完整刷新以校正区域刷新没有覆盖到的格子。None 表示不定期完整刷新。
+        """
+        self.api = api
+        self.max_fog_queries = max_fog_queries
+        self.full_refresh_interval = full_refresh_interval
+        self.grids: Optional[MapGrids] = None
+        self._layers: Optional[MapLayers] = None
+        self.last_refresh = 0.0
+        self.last_full_refresh = 0.0
+
+    @property
+    def loaded(self) -> bool:
+        return self.grids is not None
+
+    @property
+    def width(self) -> int:
+        return self.load().width
+
+    @property
+    def height(self) -> int:
+        return self.load().height
+
+    def load(self) -> MapGrids:
+        """第一次调用时完整下载地图（包括静态图层），之后直接返回已有的网格。"""
+        if self.grids is None:
+            self.grids = self.api.map_query().to_grids()
+            self.last_refresh = self.last_full_refresh = time.monotonic()
+        return self.grids
+
+    def layers(self, cache_dir: Optional[str] = DEFAULT_CACHE_DIR) -> MapLayers:
+        """通行、隘口、矿石密度等派生图层，每张地图只计算一次（并缓存到 cache_dir）。"""
+        if self._layers is None:
+            self._layers = MapLayers.load_or_build(self.load(), cache_dir)
+        return self._layers
+
+    def refresh(self, cells: Optional[Iterable[Location]] = None) -> MapDelta:
+        """
+        刷新动态图层。
+
+        给出 cells 且数量不超过 max_fog_queries 时只查询这些格子，否则做一次完整刷新。
+        oneshot 模式下每个 fog_query 都要新建一条连接，总是做完整刷新。
+        """
+        self.load()
+        if cells is None or self._full_refresh_due() or self.api.transport == "oneshot":
+            return self.refresh_full()
+        return self.refresh_cells(cells)
+
+    def refresh_full(self) -> MapDelta:
+        """用一次 map_query 刷新全图的可见/已探索图层，静态图层不重新解析。"""
+        grids = self.load()
+        result = self.api.map_query()
+        if (result.MapWidth, result.MapHeight) != (grids.width, grids.height):
+            # 地图换了（例如重新开始任务），整张图重新加载
+            self.grids = result.to_grids()
+            self._layers = None
+            self.last_refresh = self.last_full_refresh = time.monotonic()
+            return MapDelta(full_refresh=True)
+
+        visible = self._flatten(result.IsVisible, grids.visible)
+        explored = self._flatten(result.IsExplored, grids.explored)
+        delta = MapDelta(full_refresh=True)
+        for index in self._diff(grids.visible, visible):
+            cell = Location(index // grids.height, index % grids.height)
+            (delta.became_visible if visible[index] else delta.became_hidden).append(cell)
+        for index in self._diff(grids.explored, explored):
+            if explored[index]:
+                delta.newly_explored.append(Location(index // grids.height, index % grids.height))
+        grids.visible = visible
+        grids.explored = explored
+        self.last_refresh = self.last_full_refresh = time.monotonic()
+        return delta
+
+    def refresh_cells(self, cells: Iterable[Location]) -> MapDelta:
+        """用批量 fog_query 只刷新指定的格子，超出地图的格子会被忽略。"""
+        grids = self.load()
+        unique = {}
+        for cell in cells:
+            if grids.in_bounds(cell.x, cell.y):
+                unique[(cell.x, cell.y)] = cell
+        if len(unique) > self.max_fog_queries:
+            return self.refresh_full()
+
+        targets = list(unique.values())
+        futures = self.api.submit_many([("fog_query", {"pos": cell.to_dict()}) for cell in targets])
+        delta = MapDelta()
+        for cell, future in zip(targets, futures):
+            try:
+                data = self.api._handle_response(future.result(), "查询战争迷雾失败")
+            except GameAPIError:
+                continue
+            index = grids.index(cell.x, cell.y)
+            visible = 1 if data.get("IsVisible") else 0
+            explored = 1 if data.get("IsExplored") else 0
+            if grids.visible[index] != visible:
+                grids.visible[index] = visible
+                (delta.became_visible if visible else delta.became_hidden).append(cell)
+            # 已探索的格子不会变回未探索，只置位不清除
+            if explored and not grids.explored[index]:
+                grids.explored[index] = 1
+                delta.newly_explored.append(cell)
+        self.last_refresh = time.monotonic()
+        return delta
+
+    def refresh_around(self, centers: Iterable[Location], radius: int) -> MapDelta:
+        """刷新若干位置（例如侦察单位）周围半径 radius 内的格子。"""
+        grids = self.load()
+        cells = {}
+        r2 = radius * radius
+        for center in centers:
+            for x in range(max(0, center.x - radius), min(grids.width, center.x + radius + 1)):
+                for y in range(max(0, center.y - radius), min(grids.height, center.y + radius + 1)):
+                    if (x - center.x) ** 2 + (y - center.y) ** 2 <= r2:
+                        cells[(x, y)] = Location(x, y)
+        return self.refresh(cells.values())
+
+    def explored_fraction(self) -> float:
+        return self.load().explored_fraction()
+
+    def is_fully_explored(self) -> bool:
+        return self.load().is_fully_explored()
+
+    def _full_refresh_due(self) -> bool:
+        return self.full_refresh_interval is not None and \
+            time.monotonic() - self.last_full_refresh >= self.full_refresh_interval
+
+    def _flatten(self, columns: List[List[bool]], current: bytearray) -> bytearray:
+        """把 [x][y] 嵌套列表展开为与 MapGrids 相同布局的位图，缺失的列沿用当前值。"""
+        grids = self.grids
+        h = grids.height
+        if len(columns) == grids.width and all(len(column) == h for column in columns):
+            return bytearray(chain.from_iterable(columns))
+        flat = bytearray(current)
+        for x, column in enumerate(columns[:grids.width]):
+            if len(column) == h:
+                flat[x * h:(x + 1) * h] = bytearray(column)
+        return flat
+
+    def _diff(self, old: bytearray, new: bytearray) -> List[int]:
+        """返回两个位图中不同的下标，先按列比较跳过没有变化的列。"""
+        if old == new:
+            return []
+        h = self.grids.height
+        changed = []
+        for base in range(0, len(new), h):
+            end = base + h
+            if old[base:end] != new[base:end]:
+                changed.extend(i for i in range(base, end) if old[i] != new[i])
+        return changed
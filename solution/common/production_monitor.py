@@ -0,0 +1,238 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from game_api import GameAPI
+from wait_scheduler import TICKS_PER_SECOND
+
+# 事件类型
+ITEM_STARTED = "item_started"    # 新项目进入队列
+ITEM_READY = "item_ready"        # 项目生产完成（建筑等待放置，或单位即将出厂）
+ITEM_FINISHED = "item_finished"  # 项目离开队列（已放置/已出厂/被取消）
+QUEUE_IDLE = "queue_idle"        # 队列中不再有未完成的项目
+QUEUE_BUSY = "queue_busy"        # 空闲的队列中出现了未完成的项目
+
+EVENT_KINDS = (ITEM_STARTED, ITEM_READY, ITEM_FINISHED, QUEUE_IDLE, QUEUE_BUSY)
+
+
+@dataclass
+class QueueItem:
+    """生产队列中的一个项目。"""
+    queue_type: str
+    name: str
+    chinese_name: str
+    progress: int  # 完成百分比
+    remaining_time: float  # 剩余时间（秒）
+    total_time: float  # 总时间（秒）
+    status: str  # completed / paused / in_progress / waiting
+    done: bool
+    paused: bool
+    owner_actor_id: Optional[int] = None
+    total_cost: int = 0  # 总花费
+    remaining_cost: int = 0  # 剩余花费
+
+    @property
+    def eta(self) -> Optional[float]:
+        """预计剩余秒数，暂停或排队等待中的项目为 None。"""
+        if self.done:
+            return 0.0
+        if self.paused or self.status == "waiting":
+            return None
+        return self.remaining_time
+
+
+@dataclass
+class ProductionEvent:
+    kind: str  # 事件类型，见 EVENT_KINDS
+    queue_type: str
+    item: Optional[QueueItem] = None  # 队列级事件（QUEUE_IDLE / QUEUE_BUSY）为 None
+
+
+class ProductionMonitor:
+    """
+    所有生产队列的统一视图。
+
+    每次 poll 用一次批量请求查询全部队列（pipelined / pooled 模式下一次往返），
+    服务器报告不存在的队列（COMMAND_EXECUTION_ERROR）会被暂时跳过：missing_ttl 秒后，
+    或者有建筑完成（可能新建了兵营、战车工厂等）之后重新查询。
+    与上一次结果比较后产生项目开始、完成、离开队列以及队列空闲/忙碌事件，
+    订阅者可以据此响应，而不必各自轮询队列。
+    """
+
+    def __init__(self, api: GameAPI, queue_types: Optional[Iterable[str]] = None,
+                 ticks_per_second: float = TICKS_PER_SECOND, missing_ttl: float = 10.0):
+        """
+        Args:
+            api (GameAPI): 用于查询的 GameAPI 实例。
+            queue_types (Iterable[str], optional): 需要监视的队列，默认为全部 6 种。
+            ticks_per_second (float): 游戏每秒帧数，用于把 remaining_time 换算为秒。
+            missing_ttl (float): 不存在的队列多久之后重新查询（秒）。
+        """
+        self.api = api
+        self.queue_types = list(queue_types or GameAPI.QUEUE_TYPES)
+        self.ticks_per_second = ticks_per_second
+        self.missing_ttl = missing_ttl
+        self.missing_queues: Set[str] = set()
+        self._missing_since: Dict[str, float] = {}
+        self.last_poll = 0.0
+        self._items: Dict[str, List[QueueItem]] = {}
+        self._handlers: Dict[Optional[str], List[Callable[[ProductionEvent], None]]] = {}
+        self._lock = threading.RLock()
+
+    # ===== 订阅 =====
+
+    def subscribe(self, kind: Optional[str], handler: Callable[[ProductionEvent], None]) -> None:
+        """订阅一种事件，kind 为 None 时订阅全部事件。"""
+        if kind is not None and kind not in EVENT_KINDS:
+            raise ValueError(f"未知的事件类型: {kind}")
+        self._handlers.setdefault(kind, []).append(handler)
+
+    def unsubscribe(self, kind: Optional[str], handler: Callable[[ProductionEvent], None]) -> None:
+        handlers = self._handlers.get(kind, [])
+        if handler in handlers:
+            handlers.remove(handler)
+
+    # ===== 轮询 =====
+
+    @property
+    def active_queues(self) -> List[str]:
+        """本次 poll 需要查询的队列：不存在的队列标记过期后重新查询。"""
+        now = time.monotonic()
+        with self._lock:
+            for queue_type in list(self.missing_queues):
+                if now - self._missing_since.get(queue_type, 0.0) >= self.missing_ttl:
+                    self.missing_queues.discard(queue_type)
+                    self._missing_since.pop(queue_type, None)
+            return [queue_type for queue_type in self.queue_types if queue_type not in self.missing_queues]
+
+    def poll(self) -> List[ProductionEvent]:
+        """批量查询所有存在的队列，分发并返回事件。"""
+        queue_types = self.active_queues
+        queues = self.api.query_production_queues(queue_types) if queue_types else {}
+        events: List[ProductionEvent] = []
+        with self._lock:
+            for queue_type, queue in queues.items():
+                if queue is None:
+                    if queue_type not in self.missing_queues:
+                        self.missing_queues.add(queue_type)
+                        self._missing_since[queue_type] = time.monotonic()
+                    self._items.pop(queue_type, None)
+                    continue
+                items = [self._parse_item(queue_type, data) for data in queue.get("queue_items", [])]
+                events.extend(self._diff(queue_type, self._items.get(queue_type), items))
+                self._items[queue_type] = items
+            self.last_poll = time.monotonic()
+        if any(event.kind == ITEM_FINISHED and event.queue_type in ("Building", "Defense") for event in events):
+            # 新建筑可能带来新的生产队列
+            self.forget_missing()
+        for event in events:
+            for handler in self._handlers.get(event.kind, ()):
+                handler(event)
+            for handler in self._handlers.get(None, ()):
+                handler(event)
+        return events
+
+    def forget_missing(self) -> None:
+        """下一次 poll 重新查询之前不存在的队列，例如新建了兵营、船坞或机场之后。"""
+        with self._lock:
+            self.missing_queues.clear()
+            self._missing_since.clear()
+
+    # ===== 查询（基于最近一次 poll 的结果） =====
+
+    def items(self, queue_type: Optional[str] = None) -> List[QueueItem]:
+        with self._lock:
+            if queue_type is not None:
+                return list(self._items.get(queue_type, []))
+            return [item for items in self._items.values() for item in items]
+
+    def ready_items(self, queue_type: Optional[str] = None) -> List[QueueItem]:
+        return [item for item in self.items(queue_type) if item.done]
+
+    def eta(self, name: str) -> Optional[float]:
+        """名称（内部名称或中文名称）为 name 的项目中最早完成的剩余秒数，没有时为 None。"""
+        etas = [item.eta for item in self.items() if name in (item.name, item.chinese_name) and item.eta is not None]
+        return min(etas) if etas else None
+
+    def is_idle(self, queue_type: Optional[str] = None) -> bool:
+        """队列（不指定时为所有队列）中没有未完成的项目。"""
+        return all(item.done for item in self.items(queue_type))
+
+    def idle_queues(self) -> List[str]:
+        with self._lock:
+            return [queue_type for queue_type in self._items if self._is_idle(self._items[queue_type])]
+
+    def wait_until_idle(self, timeout: Optional[float] = None, interval: float = 1.0,
+                        queue_types: Optional[Iterable[str]] = None) -> bool:
+        """
+        轮询直到指定队列（默认全部）中没有未完成的项目。
+
+        Returns:
+            bool: 是否在 timeout 秒内变为空闲（timeout 为 None 时一直等待）。
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        queue_types = list(queue_types) if queue_types is not None else None
+        while True:
+            self.poll()
+            if all(self.is_idle(queue_type) for queue_type in (queue_types or [None])):
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(interval)
+
+    # ===== 内部实现 =====
+
+    def _parse_item(self, queue_type: str, data: dict) -> QueueItem:
+        return QueueItem(
+            queue_type=queue_type,
+            name=data.get("name", ""),
+            chinese_name=data.get("chineseName", ""),
+            progress=data.get("progress_percent", 0),
+            remaining_time=data.get("remaining_time", 0) / self.ticks_per_second,
+            total_time=data.get("total_time", 0) / self.ticks_per_second,
+            status=data.get("status", ""),
+            done=bool(data.get("done")) or data.get("status") == "completed",
+            paused=bool(data.get("paused")),
+            owner_actor_id=data.get("owner_actor_id"),
+            total_cost=data.get("total_cost", 0),
+            remaining_cost=data.get("remaining_cost", 0),
+        )
+
+    @staticmethod
+    def _is_idle(items: List[QueueItem]) -> bool:
+        return all(item.done for item in items)
+
+    def _diff(self, queue_type: str, previous: Optional[List[QueueItem]],
+              current: List[QueueItem]) -> List[ProductionEvent]:
+        # 队列中的项目没有 ID。队列先进先出，同名项目变少时认为离开的是排在前面的，
+        # 变多时认为新增的排在后面
+        events = []
+        old = self._group(previous or [])
+        new = self._group(current)
+        for key in list(old) + [key for key in new if key not in old]:
+            before, after = old.get(key, []), new.get(key, [])
+            dropped = max(0, len(before) - len(after))
+            for item in before[:dropped]:
+                events.append(ProductionEvent(ITEM_FINISHED, queue_type, item))
+            for prev, item in zip(before[dropped:], after):
+                if item.done and not prev.done:
+                    events.append(ProductionEvent(ITEM_READY, queue_type, item))
+            for item in after[len(before) - dropped:]:
+                events.append(ProductionEvent(ITEM_STARTED, queue_type, item))
+                if item.done:
+                    events.append(ProductionEvent(ITEM_READY, queue_type, item))
+        was_idle = previous is None or self._is_idle(previous)
+        is_idle = self._is_idle(current)
+        if previous is not None and is_idle and not was_idle:
+            events.append(ProductionEvent(QUEUE_IDLE, queue_type))
+        elif not is_idle and was_idle:
+            events.append(ProductionEvent(QUEUE_BUSY, queue_type))
+        return events
+
+    @staticmethod
+    def _group(items: List[QueueItem]) -> Dict[Tuple[str, Optional[int]], List[QueueItem]]:
+        groups: Dict[Tuple[str, Optional[int]], List[QueueItem]] = {}
+        for item in items:
+            groups.setdefault((item.name, item.owner_actor_id), []).append(item)
+        return groups
@@ -0,0 +1,307 @@
+import heapq
+import math
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from models import Actor, Location
+
+Cell = Tuple[int, int]
+FactionFilter = Union[None, str, Sequence[str]]
+
+METRIC_EUCLIDEAN = "euclidean"
+METRIC_MANHATTAN = "manhattan"
+
+
+class SpatialIndex:
+    """
+    按均匀网格哈希组织的单位空间索引。
+
+    地图被划分为 cell_size × cell_size 的桶，每个阵营各有一套桶，按阵营过滤的查询只访问该阵营的桶。
+    最近邻、半径和矩形查询只检查查询点附近的桶，而不是遍历所有单位；
+    位置更新时只有跨越桶边界的单位需要移动，其余只替换桶中的 Actor 对象。
+
+    示例::
+
+        index = SpatialIndex.from_actors(api.query_actor(TargetsQueryParam()))
+        nearest = index.nearest(yak.position, k=1, faction="敌方")
+        in_range = index.within_radius(yak.position, 6, faction=("敌方", "enemy"))
+    """
+
+    def __init__(self, cell_size: int = 8):
+        """
+        Args:
+            cell_size (int): 每个桶的边长（格）。取常用查询半径附近的值效果最好。
+        """
+        if cell_size <= 0:
+            raise ValueError("cell_size 必须大于 0")
+        self.cell_size = cell_size
+        self._buckets: Dict[str, Dict[Cell, Dict[int, Actor]]] = {}  # 阵营 -> 桶 -> {id: Actor}
+        self._where: Dict[int, Tuple[str, Cell]] = {}  # id -> (阵营, 桶)
+        self._bounds: Optional[Tuple[int, int, int, int]] = None  # 出现过的桶坐标范围
+
+    @classmethod
+    def from_actors(cls, actors: Iterable[Actor], cell_size: int = 8) -> 'SpatialIndex':
+        index = cls(cell_size)
+        for actor in actors:
+            index.update(actor)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def __contains__(self, actor_id: int) -> bool:
+        return actor_id in self._where
+
+    def factions(self) -> List[str]:
+        return [faction for faction, buckets in self._buckets.items() if buckets]
+
+    # ===== 增量更新 =====
+
+    def update(self, actor: Actor) -> None:
+        """插入或更新一个单位，没有位置的单位会被移出索引。"""
+        if actor.position is None:
+            self.remove(actor.actor_id)
+            return
+        faction = actor.faction or ""
+        cell = self._cell_of(actor.position.x, actor.position.y)
+        where = self._where.get(actor.actor_id)
+        if where == (faction, cell):
+            self._buckets[faction][cell][actor.actor_id] = actor
+            return
+        if where is not None:
+            self._discard(actor.actor_id, where)
+        self._buckets.setdefault(faction, {}).setdefault(cell, {})[actor.actor_id] = actor
+        self._where[actor.actor_id] = (faction, cell)
+        self._extend_bounds(cell)
+
+    def remove(self, actor_id: int) -> bool:
+        """移除一个单位，返回它是否在索引中。"""
+        where = self._where.pop(actor_id, None)
+        if where is None:
+            return False
+        self._discard(actor_id, where)
+        return True
+
+    def sync(self, actors: Iterable[Actor]) -> None:
+        """用新的完整快照更新索引：移除消失的单位，更新移动过的单位，插入新单位。"""
+        seen = set()
+        for actor in actors:
+            seen.add(actor.actor_id)
+            self.update(actor)
+        for actor_id in [actor_id for actor_id in self._where if actor_id not in seen]:
+            self.remove(actor_id)
+
+    def track(self, stream) -> None:
+        """
+        让索引跟随 ActorEventStream 更新，每次 poll 后索引与最新快照一致。
+
+        Args:
+            stream (ActorEventStream): 单位事件流。
+        """
+        from common.actor_events import DESTROYED, LOST_FROM_SIGHT
+
+        def on_event(event):
+            if event.kind in (DESTROYED, LOST_FROM_SIGHT):
+                self.remove(event.actor.actor_id)
+            else:
+                self.update(event.actor)
+
+        stream.subscribe(None, on_event)
+
+    # ===== 查询 =====
+
+    def get(self, actor_id: int) -> Optional[Actor]:
+        where = self._where.get(actor_id)
+        if where is None:
+            return None
+        faction, cell = where
+        return self._buckets[faction][cell][actor_id]
+
+    def nearest(self, location: Location, k: int = 1, faction: FactionFilter = None,
+                predicate: Optional[Callable[[Actor], bool]] = None,
+                max_distance: Optional[float] = None, metric: str = METRIC_EUCLIDEAN) -> List[Actor]:
+        """
+        距离 location 最近的 k 个单位，按距离从近到远排列（距离相同时按 id）。
+
+        从查询点所在的桶开始逐圈向外扩展，当前圈不可能有更近的单位时停止。
+
+        Args:
+            location (Location): 查询点。
+            k (int): 返回的数量。
+            faction (str | Sequence[str], optional): 只查询这些阵营。
+            predicate (Callable[[Actor], bool], optional): 额外的过滤条件。
+            max_distance (float, optional): 只返回距离不超过该值的单位。
+            metric (str): "euclidean" 或 "manhattan"。
+        """
+        return [actor for _, actor in self._nearest(location, k, faction, predicate, max_distance, metric)]
+
+    def nearest_one(self, location: Location, faction: FactionFilter = None,
+                    predicate: Optional[Callable[[Actor], bool]] = None,
+                    max_distance: Optional[float] = None, metric: str = METRIC_EUCLIDEAN) -> Optional[Actor]:
+        found = self.nearest(location, 1, faction, predicate, max_distance, metric)
+        return found[0] if found else None
+
+    def within_radius(self, location: Location, radius: float, faction: FactionFilter = None,
+                      predicate: Optional[Callable[[Actor], bool]] = None,
+                      metric: str = METRIC_EUCLIDEAN) -> List[Actor]:
+        """距离 location 不超过 radius 的单位，按距离从近到远排列。"""
+        distance = self._distance_fn(metric)
+        x0, y0 = location.x, location.y
+        found = []
+        for actor in self._scan_box(math.floor(x0 - radius), math.floor(y0 - radius),
+                                    math.ceil(x0 + radius), math.ceil(y0 + radius), faction):
+            d = distance(x0, y0, actor.position.x, actor.position.y)
+            if d <= radius and (predicate is None or predicate(actor)):
+                found.append((d, actor.actor_id, actor))
+        found.sort(key=lambda item: (item[0], item[1]))
+        return [actor for _, _, actor in found]
+
+    def count_within_radius(self, location: Location, radius: float, faction: FactionFilter = None,
+                            metric: str = METRIC_EUCLIDEAN) -> int:
+        return len(self.within_radius(location, radius, faction, metric=metric))
+
+    def in_box(self, min_x: int, min_y: int, max_x: int, max_y: int, faction: FactionFilter = None,
+               predicate: Optional[Callable[[Actor], bool]] = None) -> List[Actor]:
+        """位于矩形 [min_x, max_x] × [min_y, max_y]（含边界）内的单位，按 id 排列。"""
+        found = [actor for actor in self._scan_box(min_x, min_y, max_x, max_y, faction)
+                 if predicate is None or predicate(actor)]
+        found.sort(key=lambda actor: actor.actor_id)
+        return found
+
+    # ===== 批量查询 =====
+
+    def nearest_many(self, locations: Iterable[Location], k: int = 1, faction: FactionFilter = None,
+                     predicate: Optional[Callable[[Actor], bool]] = None,
+                     max_distance: Optional[float] = None, metric: str = METRIC_EUCLIDEAN) -> List[List[Actor]]:
+        """对多个查询点分别求最近的 k 个单位，结果与 locations 一一对应。"""
+        factions = self._resolve_factions(faction)
+        return [[actor for _, actor in self._nearest(location, k, factions, predicate, max_distance, metric)]
+                for location in locations]
+
+    def within_radius_many(self, locations: Iterable[Location], radius: float, faction: FactionFilter = None,
+                           predicate: Optional[Callable[[Actor], bool]] = None,
+                           metric: str = METRIC_EUCLIDEAN) -> List[List[Actor]]:
+        """对多个查询点分别求半径 radius 内的单位，结果与 locations 一一对应。"""
+        factions = self._resolve_factions(faction)
+        return [self.within_radius(location, radius, factions, predicate, metric) for location in locations]
+
+    def nearest_pairs(self, actors: Iterable[Actor], faction: FactionFilter = None,
+                      predicate: Optional[Callable[[Actor], bool]] = None,
+                      max_distance: Optional[float] = None,
+                      metric: str = METRIC_EUCLIDEAN) -> Dict[int, Optional[Actor]]:
+        """为每个单位找到最近的目标（不包括它自己），返回 {单位 id: 目标}，找不到时为 None。"""
+        factions = self._resolve_factions(faction)
+        result = {}
+        for actor in actors:
+            if actor.position is None:
+                result[actor.actor_id] = None
+                continue
+            actor_id = actor.actor_id
+
+            def accept(other: Actor) -> bool:
+                return other.actor_id != actor_id and (predicate is None or predicate(other))
+
+            found = self._nearest(actor.position, 1, factions, accept, max_distance, metric)
+            result[actor_id] = found[0][1] if found else None
+        return result
+
+    # ===== 内部实现 =====
+
+    def _cell_of(self, x: int, y: int) -> Cell:
+        return x // self.cell_size, y // self.cell_size
+
+    def _discard(self, actor_id: int, where: Tuple[str, Cell]) -> None:
+        faction, cell = where
+        buckets = self._buckets[faction]
+        bucket = buckets[cell]
+        del bucket[actor_id]
+        if not bucket:
+            del buckets[cell]
+
+    def _extend_bounds(self, cell: Cell) -> None:
+        if self._bounds is None:
+            self._bounds = (cell[0], cell[1], cell[0], cell[1])
+        else:
+            min_cx, min_cy, max_cx, max_cy = self._bounds
+            self._bounds = (min(min_cx, cell[0]), min(min_cy, cell[1]), max(max_cx, cell[0]), max(max_cy, cell[1]))
+
+    def _resolve_factions(self, faction: FactionFilter) -> List[Dict[Cell, Dict[int, Actor]]]:
+        if faction is None:
+            return list(self._buckets.values())
+        if isinstance(faction, str):
+            faction = (faction,)
+        return [self._buckets[name] for name in faction if name in self._buckets]
+
+    def _scan_box(self, min_x: int, min_y: int, max_x: int, max_y: int, faction) -> Iterable[Actor]:
+        factions = faction if isinstance(faction, list) else self._resolve_factions(faction)
+        min_cx, min_cy = self._cell_of(min_x, min_y)
+        max_cx, max_cy = self._cell_of(max_x, max_y)
+        cell_count = (max_cx - min_cx + 1) * (max_cy - min_cy + 1)
+        for buckets in factions:
+            if cell_count > len(buckets):
+                # 矩形覆盖的桶比实际存在的桶还多，直接遍历存在的桶
+                cells = [cell for cell in buckets if min_cx <= cell[0] <= max_cx and min_cy <= cell[1] <= max_cy]
+            else:
+                cells = [(cx, cy) for cx in range(min_cx, max_cx + 1) for cy in range(min_cy, max_cy + 1)
+                         if (cx, cy) in buckets]
+            for cell in cells:
+                for actor in buckets[cell].values():
+                    if min_x <= actor.position.x <= max_x and min_y <= actor.position.y <= max_y:
+                        yield actor
+
+    def _nearest(self, location: Location, k: int, faction, predicate, max_distance,
+                 metric: str) -> List[Tuple[float, Actor]]:
+        if k <= 0 or self._bounds is None:
+            return []
+        factions = faction if isinstance(faction, list) else self._resolve_factions(faction)
+        if not factions:
+            return []
+        distance = self._distance_fn(metric)
+        x0, y0 = location.x, location.y
+        qx, qy = self._cell_of(x0, y0)
+        min_cx, min_cy, max_cx, max_cy = self._bounds
+        max_ring = max(abs(qx - min_cx), abs(qx - max_cx), abs(qy - min_cy), abs(qy - max_cy))
+        # 最大堆（取负距离）保存目前最近的 k 个
+        best: List[Tuple[float, int, Actor]] = []
+        for ring in range(max_ring + 1):
+            # 第 ring 圈中任意一点与查询点的距离都不小于 (ring - 1) * cell_size
+            lower_bound = (ring - 1) * self.cell_size
+            if len(best) == k and lower_bound > -best[0][0]:
+                break
+            if max_distance is not None and lower_bound > max_distance:
+                break
+            for cell in self._ring(qx, qy, ring):
+                for buckets in factions:
+                    bucket = buckets.get(cell)
+                    if not bucket:
+                        continue
+                    for actor in bucket.values():
+                        d = distance(x0, y0, actor.position.x, actor.position.y)
+                        if max_distance is not None and d > max_distance:
+                            continue
+                        if len(best) == k and (d, actor.actor_id) >= (-best[0][0], -best[0][1]):
+                            continue
+                        if predicate is not None and not predicate(actor):
+                            continue
+                        if len(best) < k:
+                            heapq.heappush(best, (-d, -actor.actor_id, actor))
+                        else:
+                            heapq.heapreplace(best, (-d, -actor.actor_id, actor))
+        return [(-neg_d, actor) for neg_d, _, actor in sorted(best, reverse=True)]
+
+    @staticmethod
+    def _ring(cx: int, cy: int, ring: int) -> List[Cell]:
+        if ring == 0:
+            return [(cx, cy)]
+        cells = [(x, cy - ring) for x in range(cx - ring, cx + ring + 1)]
+        cells += [(x, cy + ring) for x in range(cx - ring, cx + ring + 1)]
+        cells += [(cx - ring, y) for y in range(cy - ring + 1, cy + ring)]
+        cells += [(cx + ring, y) for y in range(cy - ring + 1, cy + ring)]
+        return cells
+
+    @staticmethod
+    def _distance_fn(metric: str) -> Callable[[int, int, int, int], float]:
+        if metric == METRIC_EUCLIDEAN:
+            return lambda x0, y0, x1, y1: math.hypot(x1 - x0, y1 - y0)
+        if metric == METRIC_MANHATTAN:
+            return lambda x0, y0, x1, y1: abs(x1 - x0) + abs(y1 - y0)
+        raise ValueError(f"未知的距离度量: {metric}")
@@ -0,0 +1,205 @@
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from game_api import GameAPI
+from models import Actor, MapQueryResult, PlayerBaseInfo, TargetsQueryParam
+
+# 各类查询结果默认可以容忍的陈旧时间（秒）
+DEFAULT_TTLS = {
+    "actors": 0.5,        # query_actor
+    "can_produce": 1.0,   # query_can_produce
+    "production": 0.5,    # query_production_queue
+    "base_info": 0.5,     # player_baseinfo_query
+    "map": 5.0,           # map_query
+}
+
+# 会改变游戏状态的命令，以及执行成功后需要作废的查询类别
+INVALIDATIONS = {
+    "start_production": ("production", "base_info"),
+    "manage_production": ("production", "base_info", "can_produce"),
+    "place_building": ("actors", "production", "base_info", "can_produce"),
+    "deploy": ("actors", "can_produce", "base_info"),
+    "attack": ("actors",),
+    "occupy": ("actors", "can_produce"),
+    "repair": ("actors", "base_info"),
+}
+
+# query_wait_info 返回完成时，生产出的建筑/单位已经出现
+WAIT_COMPLETED_INVALIDATES = ("actors", "production", "can_produce", "base_info")
+
+
+class CacheStats:
+    """按查询类别统计的缓存命中情况。"""
+
+    def __init__(self):
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+        self.invalidations: Dict[str, int] = {}
+
+    def hit_rate(self, query_class: Optional[str] = None) -> float:
+        """命中率，query_class 为 None 时统计全部类别。"""
+        if query_class is None:
+            hits, misses = sum(self.hits.values()), sum(self.misses.values())
+        else:
+            hits, misses = self.hits.get(query_class, 0), self.misses.get(query_class, 0)
+        return hits / (hits + misses) if hits + misses else 0.0
+
+    def to_dict(self) -> dict:
+        classes = sorted(set(self.hits) | set(self.misses) | set(self.invalidations))
+        return {query_class: {
+            "hits": self.hits.get(query_class, 0),
+            "misses": self.misses.get(query_class, 0),
+            "invalidations": self.invalidations.get(query_class, 0),
+            "hit_rate": self.hit_rate(query_class),
+        } for query_class in classes}
+
+
+class WorldState:
+    """
+    叠加在 GameAPI 之上的世界状态缓存。
+
+    同一个事实在很短时间内被重复查询时直接返回缓存结果，每类查询有各自的过期时间（TTL）。
+    WorldState 注册为 GameAPI 的命令监听器：通过同一个 GameAPI 发出生产、部署、攻击等
+    改变状态的命令后，受影响的缓存会被立即作废；通过其他 GameAPI 实例发出的命令只能等 TTL 过期。
+
+    全量单位快照（snapshot）额外按 id 和 (阵营, 类型) 建立索引，阵营和类型使用服务器返回的名称。
+    """
+
+    def __init__(self, api: GameAPI, ttls: Optional[Dict[str, float]] = None, attach: bool = True):
+        """
+        Args:
+            api (GameAPI): 被缓存的 GameAPI 实例。
+            ttls (Dict[str, float], optional): 按查询类别覆盖 DEFAULT_TTLS。
+            attach (bool): 是否把自己设为 api.world_state，让 GameAPI 内部的依赖检查也使用缓存。
+        """
+        self.api = api
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.stats = CacheStats()
+        self._entries: Dict[Tuple[str, str], Tuple[float, Any]] = {}
+        self._lock = threading.RLock()
+        # 作废计数：每个类别一个，加上清空全部缓存的计数；查询期间发生过作废时不写回结果
+        self._generations: Dict[str, int] = {}
+        self._epoch = 0
+        self._by_id: Dict[int, Actor] = {}
+        self._by_faction_type: Dict[Tuple[str, str], List[Actor]] = {}
+        self._indexed: Optional[List[Actor]] = None  # 建立索引时使用的快照
+        api.add_command_listener(self._on_command)
+        if attach:
+            api.world_state = self
+
+    def close(self) -> None:
+        """停止监听 GameAPI 的命令。"""
+        self.api.remove_command_listener(self._on_command)
+        if self.api.world_state is self:
+            self.api.world_state = None
+
+    # ===== 缓存的查询 =====
+
+    def query_actor(self, query_params: TargetsQueryParam, max_age: Optional[float] = None) -> List[Actor]:
+        """带缓存的 GameAPI.query_actor，相同查询参数在 TTL 内直接返回上次的结果。"""
+        key = json.dumps(query_params.to_dict(), sort_keys=True, ensure_ascii=False)
+        return list(self._cached("actors", key, max_age, lambda: self.api.query_actor(query_params)))
+
+    def can_produce(self, unit_type: str, max_age: Optional[float] = None) -> bool:
+        return self._cached("can_produce", unit_type, max_age, lambda: self.api.can_produce(unit_type))
+
+    def query_production_queue(self, queue_type: str, max_age: Optional[float] = None) -> dict:
+        return self._cached("production", queue_type, max_age,
+                            lambda: self.api.query_production_queue(queue_type))
+
+    def player_base_info(self, max_age: Optional[float] = None) -> PlayerBaseInfo:
+        return self._cached("base_info", "", max_age, self.api.player_base_info_query)
+
+    def map_query(self, max_age: Optional[float] = None) -> MapQueryResult:
+        return self._cached("map", "", max_age, self.api.map_query)
+
+    # ===== 全量单位快照 =====
+
+    def snapshot(self, max_age: Optional[float] = None) -> List[Actor]:
+        """所有单位的快照，过期时用一次不带条件的 query_actor 刷新并重建索引。"""
+        actors = self._cached("actors", "*", max_age, lambda: self.api.query_actor(TargetsQueryParam()))
+        with self._lock:
+            if actors is not self._indexed:
+                self._index(actors)
+        return list(actors)
+
+    def actor(self, actor_id: int, max_age: Optional[float] = None) -> Optional[Actor]:
+        """从快照中按 id 查找单位，不存在时返回 None。"""
+        self.snapshot(max_age)
+        with self._lock:
+            return self._by_id.get(actor_id)
+
+    def actors(self, faction: Optional[str] = None, type: Optional[str] = None,
+               max_age: Optional[float] = None) -> List[Actor]:
+        """从快照中按阵营和/或类型筛选单位。"""
+        actors = self.snapshot(max_age)
+        if faction is not None and type is not None:
+            with self._lock:
+                return list(self._by_faction_type.get((faction, type), []))
+        return [actor for actor in actors
+                if (faction is None or actor.faction == faction) and (type is None or actor.type == type)]
+
+    def count(self, faction: str, type: str, max_age: Optional[float] = None) -> int:
+        self.snapshot(max_age)
+        with self._lock:
+            return len(self._by_faction_type.get((faction, type), ()))
+
+    # ===== 作废 =====
+
+    def invalidate(self, *query_classes: str) -> None:
+        """作废指定类别的缓存，不给出类别时清空全部缓存。"""
+        with self._lock:
+            if not query_classes:
+                self._epoch += 1
+                query_classes = tuple({query_class for query_class, _ in self._entries})
+            for query_class in query_classes:
+                self._generations[query_class] = self._generations.get(query_class, 0) + 1
+                keys = [key for key in self._entries if key[0] == query_class]
+                for key in keys:
+                    del self._entries[key]
+                self.stats.invalidations[query_class] = self.stats.invalidations.get(query_class, 0) + 1
+
+    def _on_command(self, command: str, params: dict, response: dict) -> None:
+        """GameAPI 命令监听器：状态改变命令成功后作废受影响的缓存。"""
+        if command in INVALIDATIONS:
+            self.invalidate(*INVALIDATIONS[command])
+        elif command == "query_wait_info":
+            data = response.get("data") if isinstance(response, dict) else None
+            if isinstance(data, dict) and data.get("waitStatus") == "success":
+                self.invalidate(*WAIT_COMPLETED_INVALIDATES)
+
+    # ===== 内部实现 =====
+
+    def _cached(self, query_class: str, key: str, max_age: Optional[float], fetch: Callable[[], Any]) -> Any:
+        ttl = self.ttls.get(query_class, 0.0) if max_age is None else max_age
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get((query_class, key))
+            if entry is not None and now - entry[0] <= ttl:
+                self.stats.hits[query_class] = self.stats.hits.get(query_class, 0) + 1
+                return entry[1]
+            self.stats.misses[query_class] = self.stats.misses.get(query_class, 0) + 1
+            generation = self._generation(query_class)
+        value = fetch()
+        with self._lock:
+            # 查询期间缓存被作废时，结果可能是命令执行前的状态，只返回给调用方、不写回缓存
+            if self._generation(query_class) == generation:
+                self._entries[(query_class, key)] = (time.monotonic(), value)
+        return value
+
+    def _generation(self, query_class: str) -> Tuple[int, int]:
+        # 调用方已持有 self._lock
+        return self._epoch, self._generations.get(query_class, 0)
+
+    def _index(self, actors: List[Actor]) -> None:
+        # 调用方已持有 self._lock
+        self._by_id = {actor.actor_id: actor for actor in actors}
+        by_faction_type: Dict[Tuple[str, str], List[Actor]] = {}
+        for actor in actors:
+            by_faction_type.setdefault((actor.faction, actor.type), []).append(actor)
+        self._by_faction_type = by_faction_type
+        self._indexed = actors
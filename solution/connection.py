@@ -0,0 +1,383 @@
+import json
+import select
+import socket
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from framing import FRAMING_AUTO, MessageDecoder, encode_frame, recv_message
+
+
+class RequestNotSentError(ConnectionError):
+    '''写出请求时就发现连接已被对端重置或关闭，请求没有送达服务器，可以安全地重发'''
+
+
+class PartialResponseError(ConnectionError):
+    '''一批请求只收到了前一部分响应，连接就断开了
+
+    其余请求已经写出，服务器可能执行过，不能重发；responses 是已按顺序收到的响应。'''
+
+    def __init__(self, responses: List[Any], error: Exception):
+        super().__init__("收到 {0} 条响应后连接断开: {1}".format(len(responses), str(error) or type(error).__name__))
+        self.responses = responses
+        self.error = error
+
+
+class GameConnection:
+    '''与游戏服务器之间的一条可复用 TCP 长连接
+
+    一条连接上同一时刻只允许一个请求在途，由 ConnectionPool 负责借出和归还。'''
+
+    def __init__(self, address: Tuple[str, int], timeout: float = 10.0, framing: str = FRAMING_AUTO,
+                 loads: Callable[[bytes], Any] = json.loads):
+        self.address = address
+        self.timeout = timeout
+        self.decoder = MessageDecoder(framing, loads=loads)
+        self.sock: Optional[socket.socket] = None
+        self.last_used = 0.0
+        self.request_count = 0
+
+    @property
+    def is_open(self) -> bool:
+        return self.sock is not None
+
+    @property
+    def reused(self) -> bool:
+        '''连接上是否已经完成过请求（复用的连接可能已被服务器静默关闭）'''
+        return self.request_count > 0
+
+    def connect(self) -> None:
+        '''建立 socket 连接，已有连接会先被关闭'''
+        self.close()
+        sock = socket.create_connection(self.address, timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock = sock
+        self.decoder.reset()
+        self.request_count = 0
+        self.last_used = time.monotonic()
+
+    def close(self) -> None:
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
+
+    def peer_closed(self) -> bool:
+        '''不阻塞地检查对端是否已经关闭连接（或留下了无主的数据）'''
+        if self.sock is None:
+            return True
+        try:
+            readable, _, _ = select.select([self.sock], [], [], 0)
+            if not readable:
+                return False
+            # 空闲连接上可读，要么是 EOF，要么是不属于任何请求的残留数据，都不能再用
+            return True
+        except (OSError, ValueError):
+            return True
+
+    def request(self, payload: bytes, loads: Optional[Callable[[bytes], Any]] = None,
+                timeout: Optional[float] = None) -> Any:
+        '''发送一条请求报文，并读取、解码一条完整的响应报文
+
+        loads 不为空时，本次响应改用它解码（例如直接解码为类型化的模型）；
+        timeout 不为空时覆盖连接的默认超时时间。'''
+        return self.request_many([payload], loads, timeout)[0]
+
+    def request_many(self, payloads: List[bytes], loads: Optional[Callable[[bytes], Any]] = None,
+                     timeout: Optional[float] = None) -> List[Any]:
+        '''一次写出多条请求报文，再按顺序读取同样数量的响应报文
+
+        服务器只回复第一条就正常关闭连接时，说明它每条连接只处理一个请求，其余请求没有被执行：
+        只返回这一条响应，其余请求由调用方换一条连接重发。其它情况下连接中途断开（例如在回复
+        途中被重置），未回复的请求可能已被执行，以 PartialResponseError 报告已收到的响应。'''
+        if self.sock is None:
+            self.connect()
+        self.sock.settimeout(self.timeout if timeout is None else timeout)
+        try:
+            self.sock.sendall(b''.join(encode_frame(payload, self.decoder.framing) for payload in payloads))
+        except (BrokenPipeError, ConnectionResetError, ConnectionAbortedError) as e:
+            self.close()
+            raise RequestNotSentError(str(e) or type(e).__name__) from e
+        messages = []
+        default_loads = self.decoder.loads
+        if loads is not None:
+            self.decoder.loads = loads
+        try:
+            for _ in payloads:
+                messages.append(recv_message(self.sock, self.decoder))
+        except ConnectionError as e:
+            self.close()
+            if not messages:
+                raise
+            if type(e) is ConnectionError and len(messages) == 1:
+                # recv_message 在对端正常关闭（EOF）时抛出的就是 ConnectionError 本身
+                return messages
+            raise PartialResponseError(messages, e) from e
+        finally:
+            self.decoder.loads = default_loads
+        if self.decoder.pending:
+            # 一问一答的连接上出现了多余的数据，说明报文已经错位，不能再复用
+            self.close()
+        self.request_count += 1
+        self.last_used = time.monotonic()
+        return messages
+
+
+class ConnectionPool:
+    '''GameAPI 使用的连接池
+
+    连接在请求之间保持打开并被复用；空闲超过 health_check_interval 的连接在借出前
+    会先用 health_check（通常是 ping 命令）探活，失效的连接会被透明地重建。'''
+
+    def __init__(self, address: Tuple[str, int], size: int = 4, timeout: float = 10.0,
+                 health_check: Optional[Callable[[GameConnection], bool]] = None,
+                 health_check_interval: float = 5.0, framing: str = FRAMING_AUTO,
+                 loads: Callable[[bytes], Any] = json.loads):
+        '''初始化连接池
+
+        Args:
+            address (Tuple[str, int]): 游戏服务器地址
+            size (int): 最多同时打开的连接数
+            timeout (float): 每条连接的 socket 超时时间（秒）
+            health_check (Callable, optional): 对空闲连接探活的函数，返回 False 表示连接失效
+            health_check_interval (float): 连接空闲多久之后需要在借出前探活（秒）
+            framing (str): 每条连接的报文分帧方式，见 framing.FRAMINGS
+            loads (Callable): 响应报文的解码函数
+        '''
+        self.address = address
+        self.framing = framing
+        self.loads = loads
+        self.size = size
+        self.timeout = timeout
+        self.health_check = health_check
+        self.health_check_interval = health_check_interval
+        self._idle: List[GameConnection] = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+        self._closed = False
+
+    def acquire(self) -> GameConnection:
+        '''借出一条可用连接，必要时新建或重连'''
+        self._slots.acquire()
+        try:
+            while True:
+                with self._lock:
+                    if self._closed:
+                        raise ConnectionError("连接池已关闭")
+                    conn = self._idle.pop() if self._idle else None
+                if conn is None:
+                    conn = GameConnection(self.address, self.timeout, self.framing, self.loads)
+                    conn.connect()
+                    return conn
+                if conn.peer_closed():
+                    conn.close()
+                    continue
+                idle = time.monotonic() - conn.last_used
+                if self.health_check is not None and idle > self.health_check_interval:
+                    try:
+                        healthy = self.health_check(conn)
+                    except (OSError, ValueError):
+                        healthy = False
+                    if not healthy:
+                        conn.close()
+                        continue
+                return conn
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn: GameConnection, discard: bool = False) -> None:
+        '''归还连接，discard 为 True 或连接已关闭时直接丢弃'''
+        try:
+            if discard or not conn.is_open:
+                conn.close()
+                return
+            with self._lock:
+                if self._closed:
+                    conn.close()
+                else:
+                    self._idle.append(conn)
+        finally:
+            self._slots.release()
+
+    def request(self, payload: bytes, loads: Optional[Callable[[bytes], Any]] = None,
+                timeout: Optional[float] = None) -> Any:
+        '''借一条连接完成一次请求/响应交互
+
+        复用的连接如果在写出请求时发现已被服务器关闭，会立即重连并重发一次，不计入调用方的重试次数；
+        超时或读取响应时的错误都可能发生在服务器执行命令之后，直接抛给调用方按重试策略处理。'''
+        return self.request_many([payload], loads, timeout)[0]
+
+    def request_many(self, payloads: List[bytes], loads: Optional[Callable[[bytes], Any]] = None,
+                     timeout: Optional[float] = None) -> List[Any]:
+        '''借一条连接，把多条请求一次写出并按顺序读回全部响应
+
+        只有确定没有被服务器处理的请求才会换一条连接重发，见 GameConnection.request_many；
+        抛出的 PartialResponseError 包含这一批中之前已收到的全部响应。'''
+        results = []
+        remaining = payloads
+        while remaining:
+            conn = self.acquire()
+            try:
+                try:
+                    data = conn.request_many(remaining, loads, timeout)
+                except RequestNotSentError:
+                    if not conn.reused:
+                        raise
+                    conn.connect()
+                    data = conn.request_many(remaining, loads, timeout)
+            except PartialResponseError as e:
+                self.release(conn, discard=True)
+                e.responses[:0] = results
+                raise
+            except BaseException:
+                self.release(conn, discard=True)
+                raise
+            self.release(conn)
+            results.extend(data)
+            remaining = remaining[len(data):]
+        return results
+
+    def close(self) -> None:
+        '''关闭连接池中所有空闲连接，之后不能再借出连接'''
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+class PipelinedConnection:
+    '''流水线连接：在一条长连接上连续写出多个请求，不等待前一个响应
+
+    后台读线程持续解码响应，并按 requestId 把每个响应交给对应的 Future。
+    连接断开时所有在途请求都会以 ConnectionError 失败，下一次提交时自动重连。
+    只适用于在一条连接上处理多个请求、不会在响应后主动断开的服务器。'''
+
+    POLL_INTERVAL = 0.5
+
+    def __init__(self, address: Tuple[str, int], timeout: float = 10.0, framing: str = FRAMING_AUTO,
+                 loads: Callable[[bytes], Any] = json.loads):
+        '''初始化流水线连接
+
+        Args:
+            address (Tuple[str, int]): 游戏服务器地址
+            timeout (float): 单个请求从发出到收到响应的超时时间（秒）
+            framing (str): 报文分帧方式，见 framing.FRAMINGS
+            loads (Callable): 响应报文的解码函数
+        '''
+        self.address = address
+        self.timeout = timeout
+        self.framing = framing
+        self.loads = loads
+        self.decoder = MessageDecoder(framing, loads=loads)  # 当前连接的解码器，每条连接各有一个
+        self.sock: Optional[socket.socket] = None
+        self._pending: Dict[str, Tuple[Future, float]] = {}
+        self._lock = threading.Lock()
+        self._reader: Optional[threading.Thread] = None
+        self._closed = False
+
+    @property
+    def in_flight(self) -> int:
+        '''当前已发出但还没有收到响应的请求数'''
+        with self._lock:
+            return len(self._pending)
+
+    def submit(self, request_id: str, payload: bytes, timeout: Optional[float] = None) -> Future:
+        '''发出一个请求，返回在收到对应响应时完成的 Future'''
+        return self.submit_many([(request_id, payload)], timeout)[0]
+
+    def submit_many(self, requests: List[Tuple[str, bytes]], timeout: Optional[float] = None) -> List[Future]:
+        '''把多个请求一次性写到连接上，按顺序返回各自的 Future
+
+        Args:
+            requests (List[Tuple[str, bytes]]): (requestId, 请求报文) 列表
+            timeout (float, optional): 这批请求的超时时间（秒），默认使用连接的 timeout
+
+        Returns:
+            List[Future]: 与 requests 一一对应的 Future，结果为解码后的响应报文
+        '''
+        futures = [Future() for _ in requests]
+        if not requests:
+            return futures
+        with self._lock:
+            if self._closed:
+                raise ConnectionError("流水线连接已关闭")
+            if self.sock is None:
+                self._connect()
+            deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+            for (request_id, _), future in zip(requests, futures):
+                self._pending[request_id] = (future, deadline)
+            data = b''.join(encode_frame(payload, self.decoder.framing) for _, payload in requests)
+            sock = self.sock
+            try:
+                sock.sendall(data)
+                return futures
+            except OSError as e:
+                error = ConnectionError("发送请求失败: {0}".format(str(e)))
+        self._fail_all(sock, error)
+        raise error
+
+    def close(self) -> None:
+        '''关闭连接，所有在途请求以 ConnectionError 失败'''
+        with self._lock:
+            self._closed = True
+            sock = self.sock
+        if sock is not None:
+            self._fail_all(sock, ConnectionError("流水线连接已关闭"))
+
+    def _connect(self) -> None:
+        # 调用方已持有 self._lock
+        sock = socket.create_connection(self.address, timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.settimeout(self.POLL_INTERVAL)
+        decoder = MessageDecoder(self.framing, loads=self.loads)
+        self.sock, self.decoder = sock, decoder
+        self._reader = threading.Thread(target=self._read_loop, args=(sock, decoder),
+                                        name="GameAPI-pipeline-reader", daemon=True)
+        self._reader.start()
+
+    def _read_loop(self, sock: socket.socket, decoder: MessageDecoder) -> None:
+        while True:
+            try:
+                message = recv_message(sock, decoder)
+            except socket.timeout:
+                self._expire_overdue()
+                continue
+            except (OSError, ValueError) as e:
+                self._fail_all(sock, ConnectionError("读取响应失败: {0}".format(str(e))))
+                return
+            request_id = message.get("requestId") if isinstance(message, dict) else None
+            with self._lock:
+                entry = self._pending.pop(request_id, None)
+            if entry is not None and entry[0].set_running_or_notify_cancel():
+                # 调用方已取消的 Future 直接丢弃响应
+                entry[0].response_size = decoder.last_message_size
+                entry[0].set_result(message)
+
+    def _expire_overdue(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            overdue = [rid for rid, (_, deadline) in self._pending.items() if deadline < now]
+            expired = [self._pending.pop(rid)[0] for rid in overdue]
+        for future in expired:
+            if future.set_running_or_notify_cancel():
+                future.set_exception(socket.timeout("等待响应超时"))
+
+    def _fail_all(self, sock: socket.socket, error: Exception) -> None:
+        '''关闭出错的 socket，并让其上所有在途请求失败'''
+        with self._lock:
+            if self.sock is not sock:
+                return
+            self.sock = None
+            pending, self._pending = self._pending, {}
+        try:
+            sock.close()
+        except OSError:
+            pass
+        for future, _ in pending.values():
+            if future.set_running_or_notify_cancel():
+                future.set_exception(error)
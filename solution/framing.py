@@ -0,0 +1,210 @@
+import json
+import socket
+import struct
+from typing import Any, Callable, Optional
+
+# 报文分帧方式
+FRAMING_AUTO = "auto"      # 根据连接上收到的第一个字节协商：'{' 开头为 json，否则为 length
+FRAMING_JSON = "json"      # 裸 JSON 报文，按完整的 JSON 对象切分（服务器默认协议）
+FRAMING_LINE = "line"      # 每条报文以换行符结尾
+FRAMING_LENGTH = "length"  # 每条报文前有 4 字节大端长度头
+
+FRAMINGS = (FRAMING_AUTO, FRAMING_JSON, FRAMING_LINE, FRAMING_LENGTH)
+
+_LENGTH_HEADER = struct.Struct(">I")
+_WHITESPACE = b" \t\r\n"
+
+
+def encode_frame(payload: bytes, framing: str = FRAMING_JSON) -> bytes:
+    '''按分帧方式封装一条待发送的报文
+
+    Args:
+        payload (bytes): UTF-8 编码的 JSON 报文
+        framing (str): 分帧方式，auto 和 json 都按服务器默认协议直接发送裸 JSON
+
+    Returns:
+        bytes: 可以直接写入 socket 的字节串
+    '''
+    if framing == FRAMING_LENGTH:
+        return _LENGTH_HEADER.pack(len(payload)) + payload
+    if framing == FRAMING_LINE:
+        return payload + b"\n"
+    return payload
+
+
+class MessageDecoder:
+    '''增量报文解码器
+
+    socket 数据直接 recv_into 到预分配的缓冲区中，每收到一段数据就检查是否已经凑齐
+    一条完整报文，报文的最后一个字节到达时即可解码返回，不需要等待对端关闭连接或超时。
+    一个解码器对应一条连接，分帧方式在该连接收到第一条报文时确定。'''
+
+    def __init__(self, framing: str = FRAMING_AUTO, initial_size: int = 64 * 1024,
+                 loads: Callable[[bytes], Any] = json.loads):
+        '''初始化解码器
+
+        Args:
+            framing (str): 分帧方式，必须在 FRAMINGS 中
+            initial_size (int): 预分配的缓冲区大小（字节），不够时按倍数扩容
+            loads (Callable): 把一条完整报文的字节解码为对象的函数
+        '''
+        if framing not in FRAMINGS:
+            raise ValueError("framing必须是以下值之一: {0}".format(", ".join(FRAMINGS)))
+        self.configured_framing = framing
+        self.framing = framing
+        self.loads = loads
+        self.last_message_size = 0  # 最近解码的一条报文的字节数（不含分帧头）
+        self._buf = bytearray(max(initial_size, 16))
+        self._start = 0  # 当前报文在缓冲区中的起点
+        self._end = 0    # 已写入数据的终点
+        self._scan = 0   # json 分帧时已扫描到的位置
+        self._depth = 0  # json 分帧时 '{' 与 '}' 的差值
+
+    @property
+    def pending(self) -> int:
+        '''缓冲区中尚未组成完整报文的字节数'''
+        return self._end - self._start
+
+    def reset(self) -> None:
+        '''清空缓冲区，连接重建时调用（已协商出的分帧方式也会被重置）'''
+        self.framing = self.configured_framing
+        self._start = self._end = self._scan = self._depth = 0
+
+    def feed(self, data: bytes) -> None:
+        '''追加一段收到的数据'''
+        n = len(data)
+        self._reserve(n)
+        self._buf[self._end:self._end + n] = data
+        self._end += n
+
+    def recv_into(self, sock: socket.socket, min_free: int = 4096) -> int:
+        '''直接从 socket 读取数据到缓冲区，返回读取的字节数（0 表示对端已关闭）'''
+        self._reserve(min_free)
+        n = sock.recv_into(memoryview(self._buf)[self._end:])
+        self._end += n
+        return n
+
+    def next_message(self) -> Optional[Any]:
+        '''从缓冲区中取出下一条完整报文并解码，数据不足时返回 None'''
+        start = self._start
+        buf = self._buf
+        while start < self._end and buf[start] in _WHITESPACE:
+            start += 1
+        if start != self._start:
+            self._start = start
+            self._scan = max(self._scan, start)
+        if start >= self._end:
+            return None
+
+        if self.framing == FRAMING_AUTO:
+            self.framing = FRAMING_JSON if buf[start] == 0x7B else FRAMING_LENGTH  # '{'
+
+        if self.framing == FRAMING_LENGTH:
+            return self._next_length_message()
+        if self.framing == FRAMING_LINE:
+            return self._next_line_message()
+        return self._next_json_message()
+
+    def finish(self) -> Optional[Any]:
+        '''对端关闭连接后，把缓冲区中剩余的数据当作最后一条报文解码'''
+        if self.pending == 0 or not bytes(self._buf[self._start:self._end]).strip():
+            self.reset()
+            return None
+        data = bytes(self._buf[self._start:self._end])
+        if self.framing == FRAMING_LENGTH:
+            data = data[_LENGTH_HEADER.size:]
+        self.reset()
+        self.last_message_size = len(data)
+        return self.loads(data)
+
+    def _reserve(self, n: int) -> None:
+        '''保证缓冲区尾部至少有 n 字节空闲，优先搬移已消费的数据，其次扩容'''
+        if len(self._buf) - self._end >= n:
+            return
+        if self._start > 0:
+            pending = self._end - self._start
+            self._buf[:pending] = self._buf[self._start:self._end]
+            self._scan -= self._start
+            self._start, self._end = 0, pending
+            if len(self._buf) - self._end >= n:
+                return
+        size = len(self._buf)
+        while size - self._end < n:
+            size *= 2
+        self._buf.extend(bytes(size - len(self._buf)))
+
+    def _take(self, begin: int, end: int, next_start: int) -> Any:
+        message = self.loads(bytes(self._buf[begin:end]))
+        self.last_message_size = end - begin
+        self._start = self._scan = next_start
+        self._depth = 0
+        if self._start == self._end:
+            self._start = self._end = self._scan = 0
+        return message
+
+    def _next_length_message(self) -> Optional[Any]:
+        header_end = self._start + _LENGTH_HEADER.size
+        if self._end < header_end:
+            return None
+        (length,) = _LENGTH_HEADER.unpack_from(self._buf, self._start)
+        if self._end < header_end + length:
+            self._reserve(header_end + length - self._end)
+            return None
+        return self._take(header_end, header_end + length, header_end + length)
+
+    def _next_line_message(self) -> Optional[Any]:
+        newline = self._buf.find(b"\n", self._scan, self._end)
+        if newline < 0:
+            self._scan = self._end
+            return None
+        return self._take(self._start, newline, newline + 1)
+
+    def _next_json_message(self) -> Optional[Any]:
+        # 用 '{' 和 '}' 的计数快速找到候选结尾，再用完整解码确认；
+        # 字符串中的花括号可能让计数出现偏差，此时由解码失败/数据末尾的兜底尝试纠正
+        buf = self._buf
+        pos = self._scan
+        while True:
+            close = buf.find(b"}", pos, self._end)
+            if close < 0:
+                self._depth += buf.count(b"{", pos, self._end)
+                self._scan = self._end
+                break
+            self._depth += buf.count(b"{", pos, close) - 1
+            pos = close + 1
+            if self._depth <= 0:
+                try:
+                    return self._take(self._start, pos, pos)
+                except ValueError:
+                    continue
+        if self._depth > 0 and buf[self._end - 1] == 0x7D:  # '}'
+            try:
+                text = bytes(buf[self._start:self._end]).decode("utf-8")
+                _, index = json.JSONDecoder().raw_decode(text)
+            except ValueError:
+                return None
+            end = self._start + len(text[:index].encode("utf-8"))
+            return self._take(self._start, end, end)
+        return None
+
+
+def recv_message(sock: socket.socket, decoder: MessageDecoder) -> Any:
+    '''从 socket 读取一条完整报文
+
+    报文的最后一个字节到达后立即返回；对端在报文中途关闭连接时，
+    会把已收到的数据当作整条报文解码。
+
+    Raises:
+        ConnectionError: 对端在发送任何数据之前就关闭了连接
+        socket.timeout: 在 socket 超时时间内没有收到完整报文
+        ValueError: 收到的数据不是合法的 JSON
+    '''
+    while True:
+        message = decoder.next_message()
+        if message is not None:
+            return message
+        if decoder.recv_into(sock) == 0:
+            message = decoder.finish()
+            if message is None:
+                raise ConnectionError("连接已被服务器关闭")
+            return message
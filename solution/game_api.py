@@ -1,9 +1,20 @@
+import copy
 import socket
+import threading
 import json
 import time
 import uuid
-from typing import List, Optional, Tuple, Dict, Any
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from models import *
+from codec import get_codec
+from connection import ConnectionPool, GameConnection, PartialResponseError, PipelinedConnection
+from group_move import GroupMoveTracker
+from health import HealthMonitor
+from wait_scheduler import WaitScheduler
+from metrics import DEFAULT_METRICS, CommandMetrics, RequestSample
+from resilience import RetryPolicy, get_circuit_breaker
+from framing import FRAMING_AUTO, FRAMINGS, MessageDecoder, encode_frame, recv_message
 
 # API版本常量
 API_VERSION = "1.0"
@@ -24,6 +35,8 @@ class GameAPI:
 
     MAX_RETRIES = 3
     RETRY_DELAY = 0.5
+    TRANSPORTS = ("oneshot", "pooled", "pipelined")
+    QUEUE_TYPES = ('Building', 'Defense', 'Infantry', 'Vehicle', 'Aircraft', 'Naval')
 
     @staticmethod
     def is_server_running(host="localhost", port=7445, timeout=2.0) -> bool:
@@ -54,28 +67,14 @@ class GameAPI:
                 json_data = json.dumps(request_data)
                 sock.sendall(json_data.encode('utf-8'))
 
-                # 接收响应
-                chunks = []
-                while True:
-                    try:
-                        chunk = sock.recv(4096)
-                        if not chunk:
-                            break
-                        chunks.append(chunk)
-                    except socket.timeout:
-                        if chunks:
-                            break
-                        return False
-
-                data = b''.join(chunks).decode('utf-8')
-
+                # 接收响应，完整报文到达后立即返回
                 try:
-                    response = json.loads(data)
-                    if response.get("status", 0) > 0 and "data" in response:
-                        return True
-                    return False
-                except json.JSONDecodeError:
+                    response = recv_message(sock, MessageDecoder())
+                except ValueError:
                     return False
+                if isinstance(response, dict) and response.get("status", 0) > 0 and "data" in response:
+                    return True
+                return False
 
         except (socket.error, ConnectionRefusedError, OSError):
             return False
@@ -83,7 +82,9 @@ class GameAPI:
         except Exception:
             return False
 
-    def __init__(self, host, port=7445, language="zh"):
+    def __init__(self, host, port=7445, language="zh", transport="oneshot", pool_size=4,
+                 framing=FRAMING_AUTO, codec="json", retry_policy=None, circuit_breaker=None,
+                 metrics=None):
         self.server_address = (host, port)
         self.language = language
         '''初始化 GameAPI 类
@@ -92,18 +93,169 @@ class GameAPI:
             host (str): 游戏服务器地址，本地就填"localhost"。
             port (int): 游戏服务器端口，默认为 7445。
             language (str): 接口返回语言，默认为 "zh"，支持 "zh" 和 "en"。
+            transport (str): 传输方式，"oneshot" 每个请求新建一条连接（默认），
+                "pooled" 使用连接池复用长连接，"pipelined" 在一条长连接上流水线发送请求，
+                响应按 requestId 分发（需要服务器支持在一条连接上处理多个请求）。
+            pool_size (int): pooled 模式下最多同时打开的连接数，默认为 4。
+            framing (str): 响应报文分帧方式，默认 "auto" 按每条连接收到的第一条响应协商，
+                可选值见 framing.FRAMINGS。
+            codec (str): 报文编解码器，默认标准库 "json"，可选 "orjson"、"msgspec"（需安装对应的库），
+                "auto" 选择可用的最快实现，见 codec.get_codec。
+            retry_policy (RetryPolicy, optional): 重试策略（退避、按命令的超时时间、哪些命令可以重试），
+                默认按 MAX_RETRIES 和 RETRY_DELAY 构造。
+            circuit_breaker (CircuitBreaker, optional): 熔断器，默认使用同一服务器地址共享的熔断器。
+            metrics (CommandMetrics, optional): 按命令记录次数、错误、延迟、字节数和重试的指标，
+                默认所有实例共用 metrics.DEFAULT_METRICS。
         '''
+        if framing not in FRAMINGS:
+            raise GameAPIError("INVALID_FRAMING",
+                             "framing必须是以下值之一: {0}".format(", ".join(FRAMINGS)))
+        self.framing = framing
+        try:
+            self.codec = get_codec(codec)
+        except ValueError as e:
+            raise GameAPIError("INVALID_CODEC", str(e))
+        if transport not in self.TRANSPORTS:
+            raise GameAPIError("INVALID_TRANSPORT",
+                             "transport必须是以下值之一: {0}".format(", ".join(self.TRANSPORTS)))
+        self.transport = transport
+        self.retry_policy = retry_policy or RetryPolicy(max_attempts=self.MAX_RETRIES,
+                                                        base_delay=self.RETRY_DELAY)
+        self.circuit_breaker = circuit_breaker or get_circuit_breaker(self.server_address)
+        self.metrics: CommandMetrics = metrics or DEFAULT_METRICS
+        self._health: Optional[HealthMonitor] = None
+        self._wait_scheduler: Optional[WaitScheduler] = None
+        self._command_listeners: List[Callable[[str, dict, dict], None]] = []
+        self.world_state = None  # 可选的查询缓存（common.world_state.WorldState），见 _lookup_actors
+        self._health_lock = threading.Lock()
+        self._pool = None
+        self._pipeline = None
+        if transport == "pooled":
+            self._pool = ConnectionPool(self.server_address, pool_size,
+                                        health_check=self._ping_connection, framing=framing,
+                                        loads=self.codec.loads)
+        elif transport == "pipelined":
+            self._pipeline = PipelinedConnection(self.server_address, framing=framing,
+                                                 loads=self.codec.loads)
+
+    def close(self) -> None:
+        '''关闭 GameAPI 持有的所有长连接'''
+        with self._health_lock:
+            health, self._health = self._health, None
+        if health is not None:
+            health.stop()
+        if self._wait_scheduler is not None:
+            self._wait_scheduler.close()
+            self._wait_scheduler = None
+        if self._pool is not None:
+            self._pool.close()
+        if self._pipeline is not None:
+            self._pipeline.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def health(self) -> HealthMonitor:
+        '''健康监视器，第一次访问时创建
+
+        pooled / pipelined 模式下完成一次探测并启动后台线程，探测复用已有的长连接；oneshot 模式下
+        每次 ping 都要新建连接，不启动后台线程，只在读取 is_alive 时探测一次。'''
+        with self._health_lock:
+            if self._health is None:
+                monitor = HealthMonitor(self)
+                self._health = monitor if self.transport == "oneshot" else monitor.start()
+            return self._health
+
+    @property
+    def wait_scheduler(self) -> WaitScheduler:
+        '''集中轮询生产任务的调度器，第一次访问时创建
+
+        wait 通过它等待：多个线程同时等待的 waitId 在每一轮中一起查询。'''
+        with self._health_lock:
+            if self._wait_scheduler is None:
+                self._wait_scheduler = WaitScheduler(self)
+            return self._wait_scheduler
+
+    @property
+    def is_alive(self) -> bool:
+        '''服务器当前是否可用
+
+        pooled / pipelined 模式下由健康监视器在后台维护，读取时不产生网络交互；
+        oneshot 模式下每次读取发送一次 ping。'''
+        if self.transport == "oneshot":
+            return self.health.probe()
+        return self.health.is_alive
+
+    @property
+    def rtt(self) -> Optional[float]:
+        '''平滑后的请求往返时间（秒），可用来确定轮询间隔，见 HealthMonitor.tick_interval'''
+        return self.health.rtt
+
+    def add_command_listener(self, listener: Callable[[str, dict, dict], None]) -> None:
+        '''注册命令监听器，每个命令成功执行后以 (command, params, response) 调用
+
+        用于在发出改变游戏状态的命令后作废缓存等场景。'''
+        self._command_listeners.append(listener)
+
+    def remove_command_listener(self, listener: Callable[[str, dict, dict], None]) -> None:
+        if listener in self._command_listeners:
+            self._command_listeners.remove(listener)
+
+    def _notify_command(self, command: str, params: dict, response: dict) -> None:
+        for listener in list(self._command_listeners):
+            listener(command, params, response)
 
     def _generate_request_id(self) -> str:
         """生成唯一的请求ID"""
         return str(uuid.uuid4())
 
-    def _send_request(self, command: str, params: dict) -> dict:
+    def _build_request(self, command: str, params: dict) -> Tuple[str, bytes]:
+        '''构造请求报文，返回 (requestId, UTF-8 编码的 JSON 报文)'''
+        request_id = self._generate_request_id()
+        request_data = {
+            "apiVersion": API_VERSION,
+            "requestId": request_id,
+            "command": command,
+            "params": params,
+            "language": self.language
+        }
+        return request_id, self.codec.dumps(request_data)
+
+    def _check_response(self, response: Any, request_id: str) -> dict:
+        '''校验响应报文，服务器返回错误时抛出对应的 GameAPIError'''
+        # 验证响应格式
+        if not isinstance(response, dict):
+            raise GameAPIError("INVALID_RESPONSE",
+                             "服务器返回的响应格式无效")
+
+        # 检查请求ID匹配
+        if response.get("requestId") != request_id:
+            raise GameAPIError("REQUEST_ID_MISMATCH",
+                             "响应的请求ID不匹配")
+
+        # 处理错误响应
+        if response.get("status", 0) < 0:
+            error = response.get("error", {})
+            raise GameAPIError(
+                error.get("code", "UNKNOWN_ERROR"),
+                error.get("message", "未知错误"),
+                error.get("details")
+            )
+
+        return response
+
+    def _send_request(self, command: str, params: dict, data_type: type = None) -> dict:
         '''通过socket和Game交互，发送信息并接收响应
 
         Args:
             command (str): 要执行的命令
             params (dict): 命令相关的数据参数
+            data_type (type, optional): 期望的 data 类型（models 中的数据类），编解码器支持时
+                响应的 data 会被直接解码为该类型，否则仍是 dict
 
         Returns:
             dict: 服务器返回的JSON响应数据
@@ -112,86 +264,262 @@ class GameAPI:
             GameAPIError: 当API调用出现错误时
             ConnectionError: 当连接服务器失败时
         '''
+        request_id, json_data = self._build_request(command, params)
+        loads = self.codec.typed_loads(data_type) if data_type is not None else None
+        timeout = self.retry_policy.timeout_for(command)
+
+        with self.metrics.measure(command, len(json_data)) as sample:
+            attempt = 0
+            while True:
+                probe = self._check_circuit()
+                try:
+                    response = self._exchange(request_id, json_data, loads, timeout,
+                                              sample.add_response_bytes)
+
+                except OSError as e:
+                    # 连接失败、超时、地址无法解析等：计入熔断器，按策略决定是否重试
+                    self.circuit_breaker.record_failure()
+                    attempt += 1
+                    if not self.retry_policy.should_retry(command, e, attempt):
+                        raise GameAPIError("CONNECTION_ERROR",
+                                         "连接服务器失败: {0}".format(str(e) or type(e).__name__))
+                    sample.retries = attempt
+                    time.sleep(self.retry_policy.backoff(attempt))
+                    continue
+
+                except GameAPIError as e:
+                    if e.code == "TIMEOUT":
+                        self.circuit_breaker.record_failure()
+                    raise
+
+                except ValueError:
+                    self.circuit_breaker.record_success()
+                    raise GameAPIError("INVALID_JSON",
+                                     "服务器返回的不是有效的JSON格式")
+
+                except Exception as e:
+                    raise GameAPIError("UNEXPECTED_ERROR",
+                                     "发生未预期的错误: {0}".format(str(e)))
+
+                else:
+                    self.circuit_breaker.record_success()
+
+                finally:
+                    # 半开状态下的探测请求无论以什么方式结束都要放行下一次探测
+                    if probe:
+                        self.circuit_breaker.release_probe()
+
+                response = self._check_response(response, request_id)
+                if self._command_listeners:
+                    self._notify_command(command, params, response)
+                return response
+
+    def _check_circuit(self) -> bool:
+        '''熔断器打开时直接失败，不再向服务器发送请求；返回这个请求是否是半开状态下的探测请求'''
+        allowed, probe = self.circuit_breaker.acquire()
+        if not allowed:
+            raise GameAPIError("CIRCUIT_OPEN",
+                             "服务器连续无响应，{0:.1f} 秒内暂停发送请求".format(
+                                 self.circuit_breaker.retry_after()))
+        return probe
+
+    def submit(self, command: str, params: dict) -> Future:
+        '''提交一个请求并立即返回 Future，不等待响应
+
+        pipelined 模式下请求直接写到共享连接上，多个 submit 的请求同时在途；
+        其他模式下请求会同步执行完再返回已完成的 Future。
+
+        Args:
+            command (str): 要执行的命令
+            params (dict): 命令相关的数据参数
+
+        Returns:
+            Future: 结果为校验后的响应报文，失败时抛出 GameAPIError
+        '''
+        return self.submit_many([(command, params)])[0]
+
+    def submit_many(self, requests: List[Tuple[str, dict]]) -> List[Future]:
+        '''一次提交多个请求
+
+        pipelined 模式下所有请求在一次写操作中发出并同时在途；pooled 模式下所有请求
+        在同一条连接上一次写出、依次读回；oneshot 模式下逐个同步执行。
+
+        Args:
+            requests (List[Tuple[str, dict]]): (command, params) 列表
+
+        Returns:
+            List[Future]: 与 requests 一一对应的 Future
+        '''
+        if self._pipeline is None and (self._pool is None or len(requests) < 2):
+            futures = []
+            for command, params in requests:
+                future = Future()
+                try:
+                    future.set_result(self._send_request(command, params))
+                except GameAPIError as e:
+                    future.set_exception(e)
+                futures.append(future)
+            return futures
+
+        try:
+            probe = self._check_circuit()
+        except GameAPIError as e:
+            return self._failed_futures(len(requests), e)
+        prepared = [self._build_request(command, params) for command, params in requests]
+        samples = [self.metrics.measure(command, len(payload))
+                   for (command, _), (_, payload) in zip(requests, prepared)]
+        timeout = max(self.retry_policy.timeout_for(command) for command, _ in requests)
+        if self._pipeline is not None:
+            try:
+                raw_futures = self._pipeline.submit_many(prepared, timeout)
+            except (OSError, ConnectionError) as e:
+                raw_futures = self._failed_futures(len(prepared), e)
+        else:
+            sizes = []
+            try:
+                responses = self._pool.request_many([payload for _, payload in prepared],
+                                                    self._counting_loads(self.codec.loads, sizes.append),
+                                                    timeout)
+                raw_futures = self._response_futures(responses, sizes)
+            except PartialResponseError as e:
+                # 未回复的请求已经写出、可能已被执行，逐个失败而不重发
+                raw_futures = self._response_futures(e.responses, sizes) + \
+                    self._failed_futures(len(prepared) - len(e.responses), e)
+            except (OSError, ValueError) as e:
+                raw_futures = self._failed_futures(len(prepared), e)
+        return [self._chain_response(raw, request_id, sample, params, probe)
+                for raw, (request_id, _), sample, (_, params) in zip(raw_futures, prepared, samples, requests)]
+
+    def batch(self) -> 'CommandBatch':
+        '''创建一个批量命令收集器，退出 with 块时把收集到的命令合并成一批发送
+
+        示例::
+
+            with api.batch() as batch:
+                checks = [batch.can_attack_target(yak, target) for yak, target in pairs]
+            for future in checks:
+                print(future.result())
+
+        Returns:
+            CommandBatch: 批量命令收集器
+        '''
+        return CommandBatch(self)
+
+    @staticmethod
+    def _response_futures(responses: List[Any], sizes: List[int]) -> List[Future]:
+        futures = []
+        for response, size in zip(responses, sizes):
+            raw = Future()
+            raw.response_size = size
+            raw.set_result(response)
+            futures.append(raw)
+        return futures
+
+    @staticmethod
+    def _failed_futures(count: int, error: Exception) -> List[Future]:
+        futures = []
+        for _ in range(count):
+            failed = Future()
+            failed.set_exception(error)
+            futures.append(failed)
+        return futures
+
+    def _chain_response(self, raw: Future, request_id: str, sample: RequestSample, params: dict,
+                        probe: bool = False) -> Future:
+        '''把流水线连接返回的原始响应 Future 转换为校验后的响应 Future，完成时记录指标'''
+        future = Future()
+
+        def _done(f: Future):
+            error = f.exception()
+            if isinstance(error, OSError):
+                self.circuit_breaker.record_failure()
+            elif error is None:
+                self.circuit_breaker.record_success()
+            elif probe:
+                self.circuit_breaker.release_probe()
+            sample.add_response_bytes(getattr(f, "response_size", 0))
+            failure = self._settle(future, f, request_id)
+            if failure is not None:
+                sample.error_code = failure.code
+            sample.finish()
+            if failure is None and self._command_listeners:
+                self._notify_command(sample.command, params, future.result())
+
+        raw.add_done_callback(_done)
+        return future
+
+    def _settle(self, future: Future, raw: Future, request_id: str) -> Optional[GameAPIError]:
+        '''用校验后的原始响应完成 future，失败统一转换为 GameAPIError 并返回'''
+        try:
+            future.set_result(self._check_response(raw.result(), request_id))
+            return None
+        except GameAPIError as e:
+            error = e
+        except (socket.timeout, ConnectionError, OSError) as e:
+            error = GameAPIError("CONNECTION_ERROR", "连接服务器失败: {0}".format(str(e)))
+        except ValueError:
+            error = GameAPIError("INVALID_JSON", "服务器返回的不是有效的JSON格式")
+        except Exception as e:
+            error = GameAPIError("UNEXPECTED_ERROR", "发生未预期的错误: {0}".format(str(e)))
+        future.set_exception(error)
+        return error
+
+    def _exchange(self, request_id: str, payload: bytes, loads=None, timeout: float = 10.0,
+                  on_size: Optional[Callable[[int], None]] = None) -> Any:
+        '''发送一条请求报文并读取解码后的响应，按 transport 使用一次性连接、连接池或流水线连接
+
+        loads 为本次响应使用的解码函数；流水线连接上的响应由读线程统一解码，不使用 loads。
+        timeout 为本次请求的超时时间（秒），on_size 在收到响应后以响应报文的字节数调用。'''
+        if self._pipeline is not None:
+            future = self._pipeline.submit(request_id, payload, timeout)
+            response = future.result()
+            if on_size is not None:
+                on_size(getattr(future, "response_size", 0))
+            return response
+        if on_size is not None:
+            loads = self._counting_loads(loads or self.codec.loads, on_size)
+        if self._pool is not None:
+            return self._pool.request(payload, loads, timeout)
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)  # 设置超时时间
+            sock.connect(self.server_address)
+            sock.sendall(encode_frame(payload, self.framing))
+            return self._receive_data(sock, loads)
+
+    @staticmethod
+    def _counting_loads(loads: Callable[[bytes], Any], on_size: Callable[[int], None]) -> Callable[[bytes], Any]:
+        '''包装解码函数，每解码一条报文就以报文字节数调用 on_size'''
+        def counting_loads(data: bytes) -> Any:
+            message = loads(data)
+            on_size(len(data))
+            return message
+        return counting_loads
+
+    def _ping_connection(self, conn: GameConnection) -> bool:
+        '''在一条已有的长连接上发送 ping，用于连接池探活'''
         request_id = self._generate_request_id()
-        request_data = {
+        payload = self.codec.dumps({
             "apiVersion": API_VERSION,
             "requestId": request_id,
-            "command": command,
-            "params": params,
+            "command": "ping",
+            "params": {},
             "language": self.language
-        }
-
-        retries = 0
-        while retries < self.MAX_RETRIES:
-            try:
-                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-                    sock.settimeout(10)  # 设置超时时间
-                    sock.connect(self.server_address)
-
-                    # 发送请求
-                    json_data = json.dumps(request_data)
-                    sock.sendall(json_data.encode('utf-8'))
-
-                    # 接收响应
-                    response_data = self._receive_data(sock)
-
-                    try:
-                        response = json.loads(response_data)
-
-                        # 验证响应格式
-                        if not isinstance(response, dict):
-                            raise GameAPIError("INVALID_RESPONSE",
-                                             "服务器返回的响应格式无效")
-
-                        # 检查请求ID匹配
-                        if response.get("requestId") != request_id:
-                            raise GameAPIError("REQUEST_ID_MISMATCH",
-                                             "响应的请求ID不匹配")
-
-                        # 处理错误响应
-                        if response.get("status", 0) < 0:
-                            error = response.get("error", {})
-                            raise GameAPIError(
-                                error.get("code", "UNKNOWN_ERROR"),
-                                error.get("message", "未知错误"),
-                                error.get("details")
-                            )
-
-                        return response
-
-                    except json.JSONDecodeError:
-                        raise GameAPIError("INVALID_JSON",
-                                         "服务器返回的不是有效的JSON格式")
-
-            except (socket.timeout, ConnectionError) as e:
-                retries += 1
-                if retries >= self.MAX_RETRIES:
-                    raise GameAPIError("CONNECTION_ERROR",
-                                     "连接服务器失败: {0}".format(str(e)))
-                time.sleep(self.RETRY_DELAY)
-
-            except GameAPIError:
-                raise
-
-            except Exception as e:
-                raise GameAPIError("UNEXPECTED_ERROR",
-                                 "发生未预期的错误: {0}".format(str(e)))
-
-    def _receive_data(self, sock: socket.socket) -> str:
-        """从socket接收完整的响应数据"""
-        chunks = []
-        while True:
-            try:
-                chunk = sock.recv(4096)
-                if not chunk:
-                    break
-                chunks.append(chunk)
-            except socket.timeout:
-                if not chunks:
-                    raise GameAPIError("TIMEOUT",
-                                     "接收响应超时")
-                break
-        return b''.join(chunks).decode('utf-8')
+        })
+        response = conn.request(payload)
+        return isinstance(response, dict) and response.get("requestId") == request_id \
+            and response.get("status", 0) > 0
+
+    def _receive_data(self, sock: socket.socket, loads=None) -> Any:
+        """从socket接收一条完整的响应报文并解码，报文的最后一个字节到达时立即返回"""
+        decoder = MessageDecoder(self.framing, loads=loads or self.codec.loads)
+        try:
+            return recv_message(sock, decoder)
+        except socket.timeout:
+            message = decoder.finish()
+            if message is None:
+                raise GameAPIError("TIMEOUT",
+                                 "接收响应超时")
+            return message
 
     def _handle_response(self, response: dict, error_msg: str) -> Any:
         """处理API响应，提取所需数据或抛出异常"""
@@ -305,7 +633,7 @@ class GameAPI:
         try:
             wait_id = self.produce(unit_type, quantity, auto_place_building)
             if wait_id is not None:
-                self.wait(wait_id, 20 * quantity)
+                self.wait(wait_id, 20 * quantity, unit_type)
             else:
                 raise GameAPIError("PRODUCTION_FAILED",
                                  "生产任务创建失败")
@@ -335,12 +663,16 @@ class GameAPI:
         except Exception as e:
             raise GameAPIError("WAIT_STATUS_ERROR", "查询任务状态时发生错误: {0}".format(str(e)))
 
-    def wait(self, wait_id: int, max_wait_time: float = 20.0) -> bool:
+    def wait(self, wait_id: int, max_wait_time: float = 20.0, unit_type: Optional[str] = None) -> bool:
         '''等待生产任务完成
 
+        等待由 wait_scheduler 统一调度：同时在等待的所有任务每一轮只做一次批量查询，
+        给出 unit_type 时会根据生产队列的剩余时间调整查询间隔。
+
         Args:
             wait_id (int): 生产任务的 ID
             max_wait_time (float): 最大等待时间，默认为 20 秒
+            unit_type (str, optional): 生产的单位或建筑名称，用于估计剩余时间
 
         Returns:
             bool: 是否成功完成等待（false表示超时）
@@ -349,20 +681,7 @@ class GameAPI:
             GameAPIError: 当等待过程中发生错误时
         '''
         try:
-            wait_time = 0.0
-            step_time = 0.1
-            while True:
-                response = self._send_request('query_wait_info', {"waitId": wait_id})
-                result = self._handle_response(response, "等待任务完成失败")
-
-                if result.get("waitStatus") == "success":
-                    return True
-
-                time.sleep(step_time)
-                wait_time += step_time
-                if wait_time > max_wait_time:
-                    return False
-
+            return self.wait_scheduler.wait(wait_id, max_wait_time, unit_type)
         except GameAPIError as e:
             if e.code == "COMMAND_EXECUTION_ERROR":
                 return True  # 特殊情况：如果命令执行错误，可能是任务已完成
@@ -370,6 +689,26 @@ class GameAPI:
         except Exception as e:
             raise GameAPIError("WAIT_ERROR", "等待任务完成时发生错误: {0}".format(str(e)))
 
+    def wait_many(self, wait_ids: List[int], max_wait_time: float = 20.0) -> Dict[int, bool]:
+        '''同时等待多个生产任务完成，所有任务共用每一轮的批量查询
+
+        Args:
+            wait_ids (List[int]): 生产任务的 ID 列表
+            max_wait_time (float): 每个任务的最大等待时间，默认为 20 秒
+
+        Returns:
+            Dict[int, bool]: waitId 到是否完成的映射（false表示超时）
+
+        Raises:
+            GameAPIError: 当等待过程中发生错误时
+        '''
+        try:
+            return self.wait_scheduler.wait_all(wait_ids, max_wait_time)
+        except GameAPIError:
+            raise
+        except Exception as e:
+            raise GameAPIError("WAIT_ERROR", "等待任务完成时发生错误: {0}".format(str(e)))
+
     def move_units_by_location(self, actors: List[Actor], location: Location, attack_move: bool = False) -> None:
         '''移动单位到指定位置
 
@@ -497,34 +836,92 @@ class GameAPI:
             })
             result = self._handle_response(response, "查询Actor失败")
 
-            actors = []
-            actors_data = result.get("actors", [])
+            return self._parse_actors(result)
 
-            for data in actors_data:
-                try:
-                    actor = Actor(data["id"])
-                    position = Location(
-                        data["position"]["x"],
-                        data["position"]["y"]
-                    )
-                    hp_percent = data["hp"] * 100 // data["maxHp"] if data["maxHp"] > 0 else -1
-                    actor.update_details(
-                        data["type"],
-                        data["faction"],
-                        position,
-                        hp_percent
-                    )
-                    actors.append(actor)
-                except KeyError as e:
-                    raise GameAPIError("INVALID_ACTOR_DATA", "Actor数据格式无效: {0}".format(str(e)))
-
-            return actors
+        except GameAPIError:
+            raise
+        except Exception as e:
+            raise GameAPIError("QUERY_ACTOR_ERROR", "查询Actor时发生错误: {0}".format(str(e)))
+
+    @staticmethod
+    def _parse_actors(result: dict) -> List[Actor]:
+        '''把 query_actor 返回的数据转换为 Actor 列表'''
+        actors = []
+        intern_type = ACTOR_TYPE_CODES.intern
+        intern_faction = ACTOR_FACTION_CODES.intern
+        for data in result.get("actors", []):
+            try:
+                position = data["position"]
+                max_hp = data["maxHp"]
+                actors.append(Actor(data["id"], intern_type(data["type"]), intern_faction(data["faction"]),
+                                    Location(position["x"], position["y"]),
+                                    data["hp"] * 100 // max_hp if max_hp > 0 else -1))
+            except KeyError as e:
+                raise GameAPIError("INVALID_ACTOR_DATA", "Actor数据格式无效: {0}".format(str(e)))
+
+        return actors
+
+    def query_actor_batch(self, query_params: TargetsQueryParam) -> ActorBatch:
+        '''查询符合条件的Actor，以列式的 ActorBatch 返回
+
+        与 query_actor 查询相同，但不为每个单位创建 Actor 和 Location 对象，
+        适合高频轮询大量单位；按下标访问 ActorBatch 时才生成对应的 Actor。
+
+        Args:
+            query_params (TargetsQueryParam): 查询参数
+
+        Returns:
+            ActorBatch: 符合条件的Actor
+
+        Raises:
+            GameAPIError: 当查询Actor失败时
+        '''
+        try:
+            response = self._send_request('query_actor', {
+                "targets": query_params.to_dict()
+            })
+            result = self._handle_response(response, "查询Actor失败")
+            return self._parse_actor_batch(result)
+
+        except GameAPIError:
+            raise
+        except Exception as e:
+            raise GameAPIError("QUERY_ACTOR_ERROR", "查询Actor时发生错误: {0}".format(str(e)))
+
+    def query_actors_by_ids(self, actor_ids: List[int]) -> List[Actor]:
+        '''用一次查询获取多个指定 ID 的Actor，已死亡或不可见的Actor不会出现在结果中
+
+        Args:
+            actor_ids (List[int]): Actor ID 列表
+
+        Returns:
+            List[Actor]: 仍然存在的Actor列表
+
+        Raises:
+            GameAPIError: 当查询Actor失败时
+        '''
+        if not actor_ids:
+            return []
+        try:
+            response = self._send_request('query_actor', {
+                "targets": {"actorId": list(actor_ids)}
+            })
+            result = self._handle_response(response, "查询Actor失败")
+            return self._parse_actors(result)
 
         except GameAPIError:
             raise
         except Exception as e:
             raise GameAPIError("QUERY_ACTOR_ERROR", "查询Actor时发生错误: {0}".format(str(e)))
 
+    @staticmethod
+    def _parse_actor_batch(result: dict) -> ActorBatch:
+        '''把 query_actor 返回的数据转换为 ActorBatch'''
+        try:
+            return ActorBatch.from_actors_data(result.get("actors", []))
+        except (KeyError, TypeError) as e:
+            raise GameAPIError("INVALID_ACTOR_DATA", "Actor数据格式无效: {0}".format(str(e)))
+
     def find_path(self, actors: List[Actor], destination: Location, method: str) -> List[Location]:
         '''为Actor找到到目标的路径
 
@@ -598,28 +995,54 @@ class GameAPI:
             })
             result = self._handle_response(response, "更新Actor信息失败")
 
-            try:
-                actor_data = result["actors"][0]
-                position = Location(
-                    actor_data["position"]["x"],
-                    actor_data["position"]["y"]
-                )
-                hp_percent = actor_data["hp"] * 100 // actor_data["maxHp"] if actor_data["maxHp"] > 0 else -1
-                actor.update_details(
-                    actor_data["type"],
-                    actor_data["faction"],
-                    position,
-                    hp_percent
-                )
-                return True
-            except (IndexError, KeyError) as e:
-                return False
+            return self._apply_actor_data(actor, result)
 
         except GameAPIError:
             raise
         except Exception as e:
             raise GameAPIError("UPDATE_ACTOR_ERROR", "更新Actor信息时发生错误: {0}".format(str(e)))
 
+    def update_actors(self, actors: List[Actor]) -> List[bool]:
+        '''批量更新多个Actor的信息，pipelined 模式下所有查询在一次往返中完成
+
+        Args:
+            actors (List[Actor]): 要更新的Actor列表
+
+        Returns:
+            List[bool]: 与 actors 一一对应，Actor已死为false，否则为true
+
+        Raises:
+            GameAPIError: 当更新Actor信息失败时
+        '''
+        futures = self.submit_many([
+            ('query_actor', {"targets": {"actorId": [actor.actor_id]}}) for actor in actors
+        ])
+        results = []
+        for actor, future in zip(actors, futures):
+            result = self._handle_response(future.result(), "更新Actor信息失败")
+            results.append(self._apply_actor_data(actor, result))
+        return results
+
+    @staticmethod
+    def _apply_actor_data(actor: Actor, result: dict) -> bool:
+        '''把 query_actor 返回的第一个Actor数据写入 actor，没有数据时返回 False'''
+        try:
+            actor_data = result["actors"][0]
+            position = Location(
+                actor_data["position"]["x"],
+                actor_data["position"]["y"]
+            )
+            hp_percent = actor_data["hp"] * 100 // actor_data["maxHp"] if actor_data["maxHp"] > 0 else -1
+            actor.update_details(
+                actor_data["type"],
+                actor_data["faction"],
+                position,
+                hp_percent
+            )
+            return True
+        except (IndexError, KeyError) as e:
+            return False
+
     def deploy_units(self, actors: List[Actor]) -> None:
         '''部署/展开 Actor
 
@@ -857,7 +1280,7 @@ class GameAPI:
         Raises:
             GameAPIError: 当查询生产队列失败时
         '''
-        if queue_type not in ['Building', 'Defense', 'Infantry', 'Vehicle', 'Aircraft', 'Naval']:
+        if queue_type not in self.QUEUE_TYPES:
             raise GameAPIError(
                 "INVALID_QUEUE_TYPE",
                 "队列类型必须是以下值之一: 'Building', 'Defense', 'Infantry', 'Vehicle', 'Aircraft', 'Naval'")
@@ -872,6 +1295,39 @@ class GameAPI:
         except Exception as e:
             raise GameAPIError("PRODUCTION_QUEUE_QUERY_ERROR", "查询生产队列时发生错误: {0}".format(str(e)))
 
+    def query_production_queues(self, queue_types: Optional[List[str]] = None) -> Dict[str, Optional[dict]]:
+        '''一次查询多个生产队列，pipelined 模式下所有查询在一次往返中完成
+
+        Args:
+            queue_types (List[str], optional): 队列类型列表，默认查询全部 6 种队列
+
+        Returns:
+            Dict[str, Optional[dict]]: 队列类型到 query_production_queue 返回值的映射，
+                不存在的队列（服务器返回 COMMAND_EXECUTION_ERROR）为 None
+
+        Raises:
+            GameAPIError: 当查询生产队列失败时
+        '''
+        queue_types = list(queue_types or self.QUEUE_TYPES)
+        for queue_type in queue_types:
+            if queue_type not in self.QUEUE_TYPES:
+                raise GameAPIError(
+                    "INVALID_QUEUE_TYPE",
+                    "队列类型必须是以下值之一: 'Building', 'Defense', 'Infantry', 'Vehicle', 'Aircraft', 'Naval'")
+
+        futures = self.submit_many([
+            ('query_production_queue', {"queueType": queue_type}) for queue_type in queue_types
+        ])
+        queues = {}
+        for queue_type, future in zip(queue_types, futures):
+            try:
+                queues[queue_type] = self._handle_response(future.result(), "查询生产队列失败")
+            except GameAPIError as e:
+                if e.code != "COMMAND_EXECUTION_ERROR":
+                    raise
+                queues[queue_type] = None
+        return queues
+
     def place_building(self, queue_type: str, location: Location = None) -> None:
         '''放置建造队列顶端已就绪的建筑
 
@@ -949,6 +1405,12 @@ class GameAPI:
         "猛犸坦克": ["车间", "维修中心", "科技中心"]
     }
 
+    def _lookup_actors(self, query_params: TargetsQueryParam) -> List[Actor]:
+        '''查询Actor；设置了 world_state 时使用它的缓存，避免递归的依赖检查反复查询同一建筑'''
+        if self.world_state is not None:
+            return self.world_state.query_actor(query_params)
+        return self.query_actor(query_params)
+
     def deploy_mcv_and_wait(self, wait_time: float = 1.0) -> None:
         '''展开自己的基地车并等待一小会
         Args:
@@ -967,7 +1429,7 @@ class GameAPI:
         Returns:
             bool: 是否已经拥有该建筑或成功生产
         '''
-        building_exists = self.query_actor(
+        building_exists = self._lookup_actors(
             TargetsQueryParam(type=[building_name], faction="自己"))
         if building_exists:
             return True
@@ -984,7 +1446,7 @@ class GameAPI:
         '''
         非外部接口
         '''
-        building_exists = self.query_actor(
+        building_exists = self._lookup_actors(
             TargetsQueryParam(type=[building_name], faction="自己"))
         if building_exists:
             return True
@@ -997,7 +1459,7 @@ class GameAPI:
         if self.can_produce(building_name):
             wait_id = self.produce(building_name, 1, True)
             if wait_id:
-                self.wait(wait_id)
+                self.wait(wait_id, unit_type=building_name)
                 return True
         return False
 
@@ -1044,27 +1506,33 @@ class GameAPI:
         return neighbors
 
     def move_units_by_location_and_wait(self, actors: List[Actor], location: Location,
-                                        max_wait_time: float = 10.0, tolerance_dis: int = 1) -> bool:
+                                        max_wait_time: float = 10.0, tolerance_dis: int = 1,
+                                        stuck_ticks: int = 5,
+                                        on_arrival: Optional[Callable[[Actor], None]] = None) -> bool:
         '''移动一批Actor到指定位置，并等待(或直到超时)
+
+        每一轮用一次 query_actor 刷新全部Actor的位置（见 GroupMoveTracker），
+        所有存活Actor都在容差范围内时立即返回；所有未到达的Actor都连续 stuck_ticks 轮没有移动时提前返回False。
+
         Args:
-            actors (List[Actor]): 要移动的Actor列表
+            actors (List[Actor]): 要移动的Actor列表，位置等属性会被原地更新
             location (Location): 目标位置
             max_wait_time (float): 最大等待时间(秒)
             tolerance_dis (int): 容忍的距离误差，Actor：格子，Actor越多一般就得设得越大
+            stuck_ticks (int): 连续多少轮（约 0.3 秒一轮）位置没有变化视为卡住
+            on_arrival (Callable[[Actor], None], optional): 每个Actor第一次到达时调用
         Returns:
             bool: 是否在max_wait_time内到达(若中途卡住或超时则False)
         '''
         self.move_units_by_location(actors, location)
+        tracker = GroupMoveTracker(actors, location, tolerance_dis, stuck_ticks=stuck_ticks, on_arrival=on_arrival)
         start_time = time.time()
         while time.time() - start_time < max_wait_time:
-            all_arrived = True
-            for actor in actors:
-                self.update_actor(actor)
-                if actor.position.manhattan_distance(location) > tolerance_dis:
-                    all_arrived = False
-                    break
-            if all_arrived:
+            tracker.apply(self.query_actors_by_ids(tracker.actor_ids))
+            if tracker.formation_arrived():
                 return True
+            if tracker.blocked():
+                return False
             time.sleep(0.3)
         return False
 
@@ -1120,24 +1588,44 @@ class GameAPI:
             GameAPIError: 当查询地图信息失败时
         '''
         try:
-            response = self._send_request('map_query', {})
+            response = self._send_request('map_query', {}, MapQueryResult)
             result = self._handle_response(response, "查询地图信息失败")
-
-            return MapQueryResult(
-                MapWidth=result.get('MapWidth', 0),
-                MapHeight=result.get('MapHeight', 0),
-                Height=result.get('Height', [[]]),
-                IsVisible=result.get('IsVisible', [[]]),
-                IsExplored=result.get('IsExplored', [[]]),
-                Terrain=result.get('Terrain', [[]]),
-                ResourcesType=result.get('ResourcesType', [[]]),
-                Resources=result.get('Resources', [[]])
-            )
+            if isinstance(result, MapQueryResult):
+                return result
+            return self._parse_map_query(result)
         except GameAPIError:
             raise
         except Exception as e:
             raise GameAPIError("MAP_QUERY_ERROR", "查询地图信息时发生错误: {0}".format(str(e)))
 
+    def map_query_grids(self) -> MapGrids:
+        '''查询地图信息，以数组存储的 MapGrids 返回
+
+        与 map_query 查询相同，但各网格存放在连续的数组中，适合需要统计探索比例、
+        按半径或资源类型查找格子的调用方。
+
+        Returns:
+            MapGrids: 地图网格
+
+        Raises:
+            GameAPIError: 当查询地图信息失败时
+        '''
+        return self.map_query().to_grids()
+
+    @staticmethod
+    def _parse_map_query(result: dict) -> MapQueryResult:
+        '''把 map_query 返回的数据转换为 MapQueryResult'''
+        return MapQueryResult(
+            MapWidth=result.get('MapWidth', 0),
+            MapHeight=result.get('MapHeight', 0),
+            Height=result.get('Height', [[]]),
+            IsVisible=result.get('IsVisible', [[]]),
+            IsExplored=result.get('IsExplored', [[]]),
+            Terrain=result.get('Terrain', [[]]),
+            ResourcesType=result.get('ResourcesType', [[]]),
+            Resources=result.get('Resources', [[]])
+        )
+
     def player_base_info_query(self) -> PlayerBaseInfo:
         '''查询玩家基地信息
 
@@ -1148,21 +1636,27 @@ class GameAPI:
             GameAPIError: 当查询玩家基地信息失败时
         '''
         try:
-            response = self._send_request('player_baseinfo_query', {})
+            response = self._send_request('player_baseinfo_query', {}, PlayerBaseInfo)
             result = self._handle_response(response, "查询玩家基地信息失败")
-
-            return PlayerBaseInfo(
-                Cash=result.get('Cash', 0),
-                Resources=result.get('Resources', 0),
-                Power=result.get('Power', 0),
-                PowerDrained=result.get('PowerDrained', 0),
-                PowerProvided=result.get('PowerProvided', 0)
-            )
+            if isinstance(result, PlayerBaseInfo):
+                return result
+            return self._parse_player_base_info(result)
         except GameAPIError:
             raise
         except Exception as e:
             raise GameAPIError("BASE_INFO_QUERY_ERROR", "查询玩家基地信息时发生错误: {0}".format(str(e)))
 
+    @staticmethod
+    def _parse_player_base_info(result: dict) -> PlayerBaseInfo:
+        '''把 player_baseinfo_query 返回的数据转换为 PlayerBaseInfo'''
+        return PlayerBaseInfo(
+            Cash=result.get('Cash', 0),
+            Resources=result.get('Resources', 0),
+            Power=result.get('Power', 0),
+            PowerDrained=result.get('PowerDrained', 0),
+            PowerProvided=result.get('PowerProvided', 0)
+        )
+
     def screen_info_query(self) -> ScreenInfoResult:
         '''查询当前玩家看到的屏幕信息
 
@@ -1175,27 +1669,31 @@ class GameAPI:
         try:
             response = self._send_request('screen_info_query', {})
             result = self._handle_response(response, "查询屏幕信息失败")
-
-            return ScreenInfoResult(
-                ScreenMin=Location(
-                    result['ScreenMin']['X'],
-                    result['ScreenMin']['Y']
-                ),
-                ScreenMax=Location(
-                    result['ScreenMax']['X'],
-                    result['ScreenMax']['Y']
-                ),
-                IsMouseOnScreen=result.get('IsMouseOnScreen', False),
-                MousePosition=Location(
-                    result['MousePosition']['X'],
-                    result['MousePosition']['Y']
-                )
-            )
+            return self._parse_screen_info(result)
         except GameAPIError:
             raise
         except Exception as e:
             raise GameAPIError("SCREEN_INFO_QUERY_ERROR", "查询屏幕信息时发生错误: {0}".format(str(e)))
 
+    @staticmethod
+    def _parse_screen_info(result: dict) -> ScreenInfoResult:
+        '''把 screen_info_query 返回的数据转换为 ScreenInfoResult'''
+        return ScreenInfoResult(
+            ScreenMin=Location(
+                result['ScreenMin']['X'],
+                result['ScreenMin']['Y']
+            ),
+            ScreenMax=Location(
+                result['ScreenMax']['X'],
+                result['ScreenMax']['Y']
+            ),
+            IsMouseOnScreen=result.get('IsMouseOnScreen', False),
+            MousePosition=Location(
+                result['MousePosition']['X'],
+                result['MousePosition']['Y']
+            )
+        )
+
     def set_rally_point(self, actors: list[Actor], target_location: Location) -> None:
         '''设置建筑的集结点
 
@@ -1216,3 +1714,111 @@ class GameAPI:
             raise
         except Exception as e:
             raise GameAPIError("SET_RALLY_POINT_ERROR", "设置集结点时发生错误: {0}".format(str(e)))
+
+
+class _RequestCaptured(BaseException):
+    '''批量模式下截获接口发出的请求
+
+    继承 BaseException，才能穿过各接口内部的 except Exception 一直传到 CommandBatch。'''
+
+    def __init__(self, command: str, params: dict):
+        super().__init__(command)
+        self.command = command
+        self.params = params
+
+
+class CommandBatch:
+    '''批量命令收集器，由 GameAPI.batch() 创建
+
+    在 with 块中调用 GameAPI 的任意公开接口（如 batch.query_actor(...)、batch.attack_target(...)）
+    只会记录调用并立即返回 Future；退出 with 块（或调用 execute）时，所有命令合并成一批，
+    按 GameAPI 的 transport 一次发送：pipelined/pooled 模式下整批只需要一次往返。
+    每条命令的结果按调用顺序放在 results 中，失败的命令对应位置是它的 GameAPIError。
+
+    需要多次往返的接口（如 produce_wait、ensure_can_build_wait）只有第一个请求参与批量，
+    后续请求会在结果回放时直接发送。'''
+
+    def __init__(self, api: GameAPI):
+        self._api = api
+        self._calls: List[Tuple[str, tuple, dict, Future]] = []
+        self.results: Optional[List[Any]] = None
+
+    def __getattr__(self, name: str):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        method = getattr(self._api, name)
+        if not callable(method):
+            raise AttributeError(name)
+
+        def record(*args, **kwargs) -> Future:
+            return self._record(name, args, kwargs)
+        return record
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def __enter__(self) -> 'CommandBatch':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.execute()
+
+    def add(self, command: str, params: dict) -> Future:
+        '''直接添加一条原始命令，结果为服务器响应中的 data'''
+        return self._record('_raw_command', (command, params), {})
+
+    def execute(self) -> List[Any]:
+        '''发送收集到的全部命令，返回按调用顺序排列的结果列表（失败项为 GameAPIError）'''
+        calls, self._calls = self._calls, []
+        pending = []  # (调用序号, command, params)
+        for index, (name, args, kwargs, future) in enumerate(calls):
+            try:
+                value = self._invoke(name, args, kwargs, self._capture)
+            except _RequestCaptured as captured:
+                pending.append((index, captured.command, captured.params))
+                continue
+            except GameAPIError as e:
+                future.set_exception(e)
+                continue
+            future.set_result(value)
+
+        responses = self._api.submit_many([(command, params) for _, command, params in pending])
+        for (index, _, _), response in zip(pending, responses):
+            name, args, kwargs, future = calls[index]
+            try:
+                future.set_result(self._invoke(name, args, kwargs, self._replay(response)))
+            except GameAPIError as e:
+                future.set_exception(e)
+
+        self.results = [future.exception() or future.result() for _, _, _, future in calls]
+        return self.results
+
+    def _record(self, name: str, args: tuple, kwargs: dict) -> Future:
+        future = Future()
+        self._calls.append((name, args, kwargs, future))
+        return future
+
+    def _invoke(self, name: str, args: tuple, kwargs: dict, send_request) -> Any:
+        '''在替换了 _send_request 的 GameAPI 副本上执行一次接口调用'''
+        api = copy.copy(self._api)
+        api._send_request = send_request
+        if name == '_raw_command':
+            command, params = args
+            return api._handle_response(api._send_request(command, params), "批量命令执行失败")
+        return getattr(api, name)(*args, **kwargs)
+
+    @staticmethod
+    def _capture(command: str, params: dict, data_type: type = None) -> dict:
+        raise _RequestCaptured(command, params)
+
+    def _replay(self, response: Future):
+        '''返回一个 _send_request 替身：第一次调用回放批量结果，之后的调用照常发送'''
+        state = {"replayed": False}
+
+        def send_request(command: str, params: dict, data_type: type = None) -> dict:
+            if state["replayed"]:
+                return self._api._send_request(command, params, data_type)
+            state["replayed"] = True
+            return response.result()
+        return send_request
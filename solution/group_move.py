@@ -0,0 +1,110 @@
+from typing import Callable, Dict, List, Optional, Set
+
+from models import Actor, Location
+
+
+class GroupMoveTracker:
+    '''跟踪一组单位向同一目标的移动
+
+    每一轮用一次按 id 的 query_actor 刷新全部单位的位置（由调用方获取并交给 apply），
+    记录每个单位的到达、卡住和阵亡状态：
+
+    - 到达：与目标的曼哈顿距离不超过 tolerance；
+    - 卡住：未到达且连续 stuck_ticks 轮位置变化不超过 stuck_distance；
+    - 阵亡：查询结果中不再有该单位。
+
+    每个单位的到达状态在 apply 中逐个维护，整组是否到达直接由 arrived 集合判断。'''
+
+    def __init__(self, actors: List[Actor], destination: Location, tolerance: int = 1,
+                 stuck_ticks: int = 5, stuck_distance: int = 0,
+                 on_arrival: Optional[Callable[[Actor], None]] = None):
+        '''初始化移动跟踪器
+
+        Args:
+            actors (List[Actor]): 要跟踪的单位，apply 会原地更新它们的位置等属性
+            destination (Location): 目标位置
+            tolerance (int): 容忍的距离误差（曼哈顿距离，格）
+            stuck_ticks (int): 连续多少轮几乎没有移动视为卡住
+            stuck_distance (int): 一轮内位置变化不超过多少格视为没有移动
+            on_arrival (Callable[[Actor], None], optional): 单位第一次到达时调用
+        '''
+        self.actors = list(actors)
+        self.destination = destination
+        self.tolerance = tolerance
+        self.stuck_ticks = stuck_ticks
+        self.stuck_distance = stuck_distance
+        self.on_arrival = on_arrival
+        self.ticks = 0
+        self.arrived: Set[int] = set()
+        self.stuck: Set[int] = set()
+        self.dead: Set[int] = set()
+        self._still: Dict[int, int] = {actor.actor_id: 0 for actor in self.actors}
+
+    @property
+    def actor_ids(self) -> List[int]:
+        '''仍需查询的单位 id（不含已阵亡的单位）'''
+        return [actor.actor_id for actor in self.actors if actor.actor_id not in self.dead]
+
+    @property
+    def alive(self) -> List[Actor]:
+        return [actor for actor in self.actors if actor.actor_id not in self.dead]
+
+    def apply(self, snapshot: List[Actor]) -> None:
+        '''用一次查询得到的单位快照更新跟踪状态'''
+        by_id = {actor.actor_id: actor for actor in snapshot}
+        self.ticks += 1
+        for actor in self.actors:
+            actor_id = actor.actor_id
+            if actor_id in self.dead:
+                continue
+            latest = by_id.get(actor_id)
+            if latest is None:
+                self.dead.add(actor_id)
+                self.stuck.discard(actor_id)
+                continue
+            previous = actor.position
+            actor.update_details(latest.type, latest.faction, latest.position, latest.hppercent)
+            if latest.position.manhattan_distance(self.destination) <= self.tolerance:
+                self.stuck.discard(actor_id)
+                self._still[actor_id] = 0
+                if actor_id not in self.arrived:
+                    self.arrived.add(actor_id)
+                    if self.on_arrival is not None:
+                        self.on_arrival(actor)
+                continue
+            # 到达过又被挤出容差范围的单位重新计为未到达
+            self.arrived.discard(actor_id)
+            if previous is not None and previous.manhattan_distance(latest.position) <= self.stuck_distance:
+                self._still[actor_id] += 1
+                if self._still[actor_id] >= self.stuck_ticks:
+                    self.stuck.add(actor_id)
+            else:
+                self._still[actor_id] = 0
+                self.stuck.discard(actor_id)
+
+    def formation_arrived(self) -> bool:
+        '''所有存活单位是否都在容差范围内（没有存活单位时为 False）'''
+        actor_ids = self.actor_ids
+        return bool(actor_ids) and all(actor_id in self.arrived for actor_id in actor_ids)
+
+    def blocked(self) -> bool:
+        '''是否已不可能全部到达：没有存活单位，或所有未到达的存活单位都卡住了'''
+        pending = [actor_id for actor_id in self.actor_ids if actor_id not in self.arrived]
+        if not self.actor_ids:
+            return True
+        return bool(pending) and all(actor_id in self.stuck for actor_id in pending)
+
+    def report(self) -> Dict[int, str]:
+        '''每个单位的状态：arrived / stuck / dead / moving'''
+        status = {}
+        for actor in self.actors:
+            actor_id = actor.actor_id
+            if actor_id in self.dead:
+                status[actor_id] = "dead"
+            elif actor_id in self.arrived:
+                status[actor_id] = "arrived"
+            elif actor_id in self.stuck:
+                status[actor_id] = "stuck"
+            else:
+                status[actor_id] = "moving"
+        return status
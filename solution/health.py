@@ -0,0 +1,125 @@
+import threading
+import time
+from typing import Optional
+
+
+class HealthMonitor:
+    '''后台健康监视器：周期性地在 GameAPI 已有的连接上发送 ping，维护服务器存活状态和 RTT 估计
+
+    pooled / pipelined 模式下 ping 复用长连接，不会为每次检查新建连接；读取 is_alive、rtt
+    只是读属性，不产生任何网络交互。RTT 的平滑方式与 TCP 相同：srtt 为往返时间的指数加权
+    平均，rttvar 为偏差的指数加权平均。'''
+
+    def __init__(self, api, interval: float = 1.0, timeout: float = 2.0, failure_threshold: int = 2,
+                 alpha: float = 0.125, beta: float = 0.25):
+        '''初始化健康监视器
+
+        Args:
+            api (GameAPI): 用于发送 ping 的 GameAPI 实例
+            interval (float): 两次 ping 之间的间隔（秒）
+            timeout (float): 单次 ping 的超时时间（秒）
+            failure_threshold (int): 连续失败多少次后认为服务器不可用
+            alpha (float): srtt 的平滑系数
+            beta (float): rttvar 的平滑系数
+        '''
+        self.api = api
+        self.interval = interval
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.alpha = alpha
+        self.beta = beta
+        self.srtt: Optional[float] = None
+        self.rttvar = 0.0
+        self.last_rtt: Optional[float] = None
+        self.last_success = 0.0
+        self.consecutive_failures = 0
+        self.probe_count = 0
+        self._checked = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_alive(self) -> bool:
+        '''最近的探测是否表明服务器可用（连续失败次数未达到 failure_threshold）'''
+        return self.last_success > 0 and self.consecutive_failures < self.failure_threshold
+
+    @property
+    def rtt(self) -> Optional[float]:
+        '''平滑后的往返时间（秒），还没有成功的探测时为 None'''
+        return self.srtt
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def tick_interval(self, minimum: float = 0.1) -> float:
+        '''根据当前 RTT 估计建议的轮询间隔（秒）：srtt + 4 * rttvar，且不小于 minimum
+
+        一次查询在这个时间内通常都能返回，按它安排轮询不会让请求在服务器端堆积。'''
+        if self.srtt is None:
+            return max(minimum, self.timeout)
+        return max(minimum, self.srtt + 4 * self.rttvar)
+
+    def start(self) -> 'HealthMonitor':
+        '''同步完成第一次探测后启动后台线程，已启动时不做任何事'''
+        with self._lock:
+            if self.running:
+                return self
+            self._stop.clear()
+            self.probe()
+            self._thread = threading.Thread(target=self._run, name="GameAPI-health", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(self.timeout + self.interval)
+        self._thread = None
+
+    def wait_until_alive(self, timeout: float) -> bool:
+        '''等待服务器变为可用，最多等待 timeout 秒'''
+        deadline = time.monotonic() + timeout
+        while not self.is_alive:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self._checked.clear()
+            self._checked.wait(min(remaining, self.interval))
+        return True
+
+    def probe(self) -> bool:
+        '''立即发送一次 ping 并更新状态，返回这次探测是否成功'''
+        api = self.api
+        request_id, payload = api._build_request("ping", {})
+        start = time.perf_counter()
+        try:
+            response = api._exchange(request_id, payload, None, self.timeout)
+            api._check_response(response, request_id)
+        except Exception:
+            # 连接失败、超时、报文无效或服务器返回错误都视为这次探测失败
+            self.consecutive_failures += 1
+            ok = False
+        else:
+            self._record_rtt(time.perf_counter() - start)
+            self.consecutive_failures = 0
+            self.last_success = time.monotonic()
+            ok = True
+        self.probe_count += 1
+        self._checked.set()
+        return ok
+
+    def _record_rtt(self, sample: float) -> None:
+        self.last_rtt = sample
+        if self.srtt is None:
+            self.srtt = sample
+            self.rttvar = sample / 2
+        else:
+            self.rttvar = (1 - self.beta) * self.rttvar + self.beta * abs(self.srtt - sample)
+            self.srtt = (1 - self.alpha) * self.srtt + self.alpha * sample
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.probe()
@@ -0,0 +1,203 @@
+import json
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional
+
+# 延迟直方图的桶上界（秒）：0.5 ms 起每个桶扩大 √2 倍，最后一个桶约 46 秒，更大的值计入 +Inf
+LATENCY_BUCKETS = tuple(0.0005 * 2 ** (k / 2) for k in range(34))
+
+
+class CommandStats:
+    '''单个命令的累计统计：次数、按错误码的失败次数、延迟直方图、收发字节数和重试次数'''
+
+    __slots__ = ("count", "errors", "retries", "request_bytes", "response_bytes",
+                 "latency_sum", "latency_max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.errors: Dict[str, int] = {}
+        self.retries = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    @property
+    def error_count(self) -> int:
+        return sum(self.errors.values())
+
+    def percentile(self, q: float) -> Optional[float]:
+        '''由直方图估计延迟的 q 分位数（秒，q 取 0~1），在桶内线性插值'''
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, n in enumerate(self.buckets):
+            if n and seen + n >= rank:
+                lower = LATENCY_BUCKETS[index - 1] if index > 0 else 0.0
+                upper = LATENCY_BUCKETS[index] if index < len(LATENCY_BUCKETS) else self.latency_max
+                return min(lower + (upper - lower) * (rank - seen) / n, self.latency_max)
+            seen += n
+        return self.latency_max
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "errors": dict(self.errors),
+            "error_count": self.error_count,
+            "retries": self.retries,
+            "request_bytes": self.request_bytes,
+            "response_bytes": self.response_bytes,
+            "latency_avg": self.latency_sum / self.count if self.count else None,
+            "latency_max": self.latency_max,
+            "latency_p50": self.percentile(0.50),
+            "latency_p95": self.percentile(0.95),
+            "latency_p99": self.percentile(0.99),
+        }
+
+
+class RequestSample:
+    '''一次请求的测量上下文，由 CommandMetrics.measure 创建
+
+    with 块结束时记录耗时；块内抛出的 GameAPIError 按其 code 计为失败。'''
+
+    __slots__ = ("metrics", "command", "request_bytes", "response_bytes", "retries", "error_code", "_start")
+
+    def __init__(self, metrics: 'CommandMetrics', command: str, request_bytes: int):
+        self.metrics = metrics
+        self.command = command
+        self.request_bytes = request_bytes
+        self.response_bytes = 0
+        self.retries = 0
+        self.error_code: Optional[str] = None
+        self._start = time.perf_counter()
+
+    def add_response_bytes(self, size: int) -> None:
+        self.response_bytes += size
+
+    def __enter__(self) -> 'RequestSample':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_val is not None and self.error_code is None:
+            self.error_code = getattr(exc_val, "code", None) or exc_type.__name__
+        self.finish()
+
+    def finish(self) -> None:
+        self.metrics.record(self.command, time.perf_counter() - self._start, self.request_bytes,
+                            self.response_bytes, self.retries, self.error_code)
+
+
+class CommandMetrics:
+    '''按命令汇总的 GameAPI 传输层指标，线程安全
+
+    记录一次请求只是在锁内更新几个计数器和一个直方图桶，可以在生产环境中常开。
+    默认所有 GameAPI 实例共用 DEFAULT_METRICS。'''
+
+    def __init__(self):
+        self._stats: Dict[str, CommandStats] = {}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def measure(self, command: str, request_bytes: int = 0) -> RequestSample:
+        '''开始测量一次请求，配合 with 使用'''
+        return RequestSample(self, command, request_bytes)
+
+    def record(self, command: str, latency: float, request_bytes: int = 0, response_bytes: int = 0,
+               retries: int = 0, error_code: Optional[str] = None) -> None:
+        '''记录一次已完成的请求，error_code 为 None 表示成功'''
+        bucket = bisect_left(LATENCY_BUCKETS, latency)
+        with self._lock:
+            stats = self._stats.get(command)
+            if stats is None:
+                stats = self._stats[command] = CommandStats()
+            stats.count += 1
+            stats.retries += retries
+            stats.request_bytes += request_bytes
+            stats.response_bytes += response_bytes
+            stats.latency_sum += latency
+            if latency > stats.latency_max:
+                stats.latency_max = latency
+            stats.buckets[bucket] += 1
+            if error_code is not None:
+                stats.errors[error_code] = stats.errors.get(error_code, 0) + 1
+
+    def get(self, command: str) -> Optional[dict]:
+        '''单个命令的统计，没有记录时返回 None'''
+        with self._lock:
+            stats = self._stats.get(command)
+            return stats.to_dict() if stats is not None else None
+
+    def commands(self) -> List[str]:
+        with self._lock:
+            return sorted(self._stats)
+
+    def snapshot(self) -> Dict[str, dict]:
+        '''所有命令的统计，按命令名索引'''
+        with self._lock:
+            return {command: stats.to_dict() for command, stats in sorted(self._stats.items())}
+
+    def top(self, n: int = 5) -> List[tuple]:
+        '''按总耗时从高到低排列的前 n 个命令，返回 (命令, 总耗时秒数, 次数)'''
+        with self._lock:
+            totals = [(command, stats.latency_sum, stats.count) for command, stats in self._stats.items()]
+        return sorted(totals, key=lambda item: item[1], reverse=True)[:n]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+            self.started_at = time.time()
+
+    def to_json(self, indent: Optional[int] = None) -> str:
+        return json.dumps({"started_at": self.started_at, "commands": self.snapshot()},
+                          ensure_ascii=False, indent=indent)
+
+    def to_prometheus(self, prefix: str = "gameapi") -> str:
+        '''以 Prometheus 文本格式导出全部指标'''
+        with self._lock:
+            items = [(command, stats.count, dict(stats.errors), stats.retries, stats.request_bytes,
+                      stats.response_bytes, stats.latency_sum, list(stats.buckets))
+                     for command, stats in sorted(self._stats.items())]
+        lines = [
+            "# HELP {0}_requests_total GameAPI requests by command.".format(prefix),
+            "# TYPE {0}_requests_total counter".format(prefix),
+        ]
+        for command, count, *_ in items:
+            lines.append('{0}_requests_total{{command="{1}"}} {2}'.format(prefix, command, count))
+        lines += [
+            "# HELP {0}_errors_total Failed GameAPI requests by command and error code.".format(prefix),
+            "# TYPE {0}_errors_total counter".format(prefix),
+        ]
+        for command, _, errors, *_ in items:
+            for code, n in sorted(errors.items()):
+                lines.append('{0}_errors_total{{command="{1}",code="{2}"}} {3}'.format(prefix, command, code, n))
+        for name, index, help_text in (("retries_total", 3, "Retried attempts"),
+                                       ("request_bytes_total", 4, "Bytes sent"),
+                                       ("response_bytes_total", 5, "Bytes received")):
+            lines += [
+                "# HELP {0}_{1} {2} by command.".format(prefix, name, help_text),
+                "# TYPE {0}_{1} counter".format(prefix, name),
+            ]
+            for item in items:
+                lines.append('{0}_{1}{{command="{2}"}} {3}'.format(prefix, name, item[0], item[index]))
+        lines += [
+            "# HELP {0}_request_duration_seconds GameAPI request latency by command.".format(prefix),
+            "# TYPE {0}_request_duration_seconds histogram".format(prefix),
+        ]
+        for command, count, _, _, _, _, latency_sum, buckets in items:
+            cumulative = 0
+            for bound, n in zip(LATENCY_BUCKETS, buckets):
+                cumulative += n
+                lines.append('{0}_request_duration_seconds_bucket{{command="{1}",le="{2:.6g}"}} {3}'.format(
+                    prefix, command, bound, cumulative))
+            lines.append('{0}_request_duration_seconds_bucket{{command="{1}",le="+Inf"}} {2}'.format(
+                prefix, command, count))
+            lines.append('{0}_request_duration_seconds_sum{{command="{1}"}} {2:.6f}'.format(
+                prefix, command, latency_sum))
+            lines.append('{0}_request_duration_seconds_count{{command="{1}"}} {2}'.format(prefix, command, count))
+        return "\n".join(lines) + "\n"
+
+
+DEFAULT_METRICS = CommandMetrics()
@@ -1,10 +1,14 @@
 from game_api import GameAPI, GameAPIError
 from models import TargetsQueryParam, Actor
 from common.fog_explorer import FogExplorer
+from common.actor_events import ActorEventStream, BECAME_VISIBLE, DESTROYED, LOST_FROM_SIGHT
 import time
 
 # 定义高威胁单位类型
 HIGH_THREAT_TYPES = ["防空车", "防空导弹", "高射炮", "重坦克", "火箭车"]
+# 空闲时只用 fog_query 刷新飞机周围的格子，每隔这么多秒做一次完整刷新补上其它单位探索到的格子
+FOG_POLL_RADIUS = 4
+FOG_FULL_REFRESH_INTERVAL = 30.0
 
 def is_actor_alive(api: GameAPI, actor_id: int) -> bool:
     try:
@@ -12,68 +16,88 @@ def is_actor_alive(api: GameAPI, actor_id: int) -> bool:
     except GameAPIError:
         return False
 
-def is_map_fully_explored(api: GameAPI) -> bool:
-    # 假设有API返回地图探索状态
-    map_info = api.query_map()
-    return all(row for row in getattr(map_info, "IsExplored", []))
-
-def execute_exploration_phase(api: GameAPI, explorer_yak: Actor):
+def execute_exploration_phase(api: GameAPI, explorer_yak: Actor) -> FogExplorer:
     print("\n----- 阶段一：开始地图探索（FogExplorer） -----")
     try:
-        fog_explorer = FogExplorer()
+        fog_explorer = FogExplorer(api=api)
+        fog_explorer.map_state.full_refresh_interval = FOG_FULL_REFRESH_INTERVAL
         unit_query = TargetsQueryParam(type=[explorer_yak.type], faction="friend")
         fog_explorer.explore_map(unit_query, padding=5)
         print(f"已向侦察兵 (ID: {explorer_yak.actor_id}) 下达探索指令，探索开始！")
+        return fog_explorer
     except Exception as e:
         print(f"探索阶段发生错误: {e}")
         raise
 
+def is_ground_enemy(actor: Actor) -> bool:
+    return (actor.faction in ("enemy", "敌方")
+            and actor.type
+            and not actor.type.endswith(".husk")
+            and actor.type not in ["战斗机", "轰炸机"]
+            and (actor.hppercent is None or actor.hppercent != 0))
+
 def target_priority(actor):
     # 高威胁优先，血量低优先
     threat_score = 1 if actor.type in HIGH_THREAT_TYPES else 0
     hp_score = getattr(actor, "hppercent", 100)
     return (-threat_score, hp_score)  # 高威胁且血量低的排前面
 
-def execute_attack_phase(api: GameAPI, attack_squad: list[Actor]):
+def execute_attack_phase(api: GameAPI, attack_squad: list[Actor], stream: ActorEventStream,
+                         fog_explorer: FogExplorer):
     print("\n----- 阶段二：开始执行精确打击 -----")
-    while True:
-        # 实时刷新敌方单位
-        all_actors = api.query_actor(TargetsQueryParam())
-        ground_enemies = [
-            e for e in all_actors
-            if getattr(e, 'faction', None) in ("enemy", "敌方")
-            and e.type
-            and not e.type.endswith(".husk")
-            and e.type not in ["战斗机", "轰炸机"]
-            and getattr(e, "hppercent", 1) > 0
-        ]
-        if not ground_enemies:
-            # 只有地图完全探索后才认为敌人被消灭
-            if is_map_fully_explored(api):
-                print("所有敌方地面目标已被消灭！")
-                break
-            else:
-                print("未发现敌人，可能被战争迷雾遮挡，继续侦查...")
-                # 可选：让侦查兵继续巡逻
+
+    def report(event):
+        if is_ground_enemy(event.previous or event.actor):
+            verb = "已被摧毁" if event.kind == DESTROYED else "脱离视野"
+            print(f"目标{verb}: {event.actor.type} (ID: {event.actor.actor_id})")
+
+    stream.subscribe(DESTROYED, report)
+    stream.subscribe(LOST_FROM_SIGHT, report)
+    assigned = {}  # 飞机 ID -> 当前攻击的目标 ID
+    squad_ids = {yak.actor_id for yak in attack_squad}
+    try:
+        while True:
+            # 只处理与上一次快照相比的变化，目标没有变化时不重复下达攻击指令
+            stream.poll()
+            ground_enemies = [e for e in stream.actors if is_ground_enemy(e)]
+            if not ground_enemies:
+                # 只有地图完全探索后才认为敌人被消灭；迷雾只刷新飞机周围的格子并增量更新
+                scouts = [a for a in stream.actors if a.actor_id in squad_ids]
+                fog_explorer.poll_fog(scouts, radius=FOG_POLL_RADIUS)
+                if fog_explorer.fog.is_fully_explored():
+                    print("所有敌方地面目标已被消灭！")
+                    break
+                if assigned:
+                    print("未发现敌人，可能被战争迷雾遮挡，继续侦查...")
+                    assigned.clear()
                 time.sleep(2)
                 continue
 
-        # 优先级排序
-        ground_enemies.sort(key=target_priority)
-        # 为每架飞机分配不同目标
-        for idx, yak in enumerate(attack_squad):
-            if idx >= len(ground_enemies):
-                break
-            target = ground_enemies[idx]
-            try:
-                if api.can_attack_target(yak, target):
-                    api.attack_target(yak, target)
-                    print(f"{yak.actor_id} 攻击 {target.type} (ID: {target.actor_id}, HP: {getattr(target, 'hppercent', '?')})")
-                else:
-                    print(f"{yak.actor_id} 无法攻击 {target.type} (ID: {target.actor_id})，跳过。")
-            except GameAPIError as e:
-                print(f"攻击指令失败: {e}")
-        time.sleep(2)  # 每2秒刷新一次目标
+            # 优先级排序
+            ground_enemies.sort(key=target_priority)
+            # 为每架飞机分配不同目标，只对目标发生变化的飞机整批检查并下达攻击指令
+            assignments = [(yak, target) for yak, target in zip(attack_squad, ground_enemies)
+                           if assigned.get(yak.actor_id) != target.actor_id]
+            if assignments:
+                with api.batch() as checks:
+                    attackable = [checks.can_attack_target(yak, target) for yak, target in assignments]
+                attacks = {}
+                with api.batch() as orders:
+                    for (yak, target), check in zip(assignments, attackable):
+                        if check.result():
+                            attacks[yak.actor_id] = orders.attack_target(yak, target)
+                for (yak, target), check in zip(assignments, attackable):
+                    if not check.result():
+                        print(f"{yak.actor_id} 无法攻击 {target.type} (ID: {target.actor_id})，跳过。")
+                    elif attacks[yak.actor_id].exception():
+                        print(f"攻击指令失败: {attacks[yak.actor_id].exception()}")
+                    else:
+                        assigned[yak.actor_id] = target.actor_id
+                        print(f"{yak.actor_id} 攻击 {target.type} (ID: {target.actor_id}, HP: {getattr(target, 'hppercent', '?')})")
+            time.sleep(2)  # 每2秒刷新一次目标
+    finally:
+        stream.unsubscribe(DESTROYED, report)
+        stream.unsubscribe(LOST_FROM_SIGHT, report)
 
 def solve_mission_4(api: GameAPI):
     try:
@@ -87,29 +111,23 @@ def solve_mission_4(api: GameAPI):
         explorer_yak = all_yaks[0]
 
         # 阶段一：探索
-        execute_exploration_phase(api, explorer_yak)
+        fog_explorer = execute_exploration_phase(api, explorer_yak)
 
         # 等待侦察结果
         print("正在等待侦察结果...将每5秒检查一次是否发现敌方建筑。")
+        stream = ActorEventStream(api)
         enemy_targets = []
-        while True:
-            all_actors = api.query_actor(TargetsQueryParam())
-            # 打印所有单位信息，便于调试
-            for a in all_actors:
-                print(f"actor_id={a.actor_id}, type={a.type}, faction={getattr(a, 'faction', None)}")
-            # 只保留敌方地面目标
-            ground_enemies = [
-                e for e in all_actors
-                if getattr(e, 'faction', None) in ("enemy", "敌方")
-                and e.type
-                and not e.type.endswith(".husk")
-                and e.type not in ["战斗机", "轰炸机"]
-            ]
-            if ground_enemies:
-                print(f"侦察成功！发现 {len(ground_enemies)} 个敌方地面目标。")
-                enemy_targets = ground_enemies
-                break
-            time.sleep(5)
+
+        def on_visible(event):
+            # 只报告新看到的敌方地面目标，不再每次打印所有单位
+            if is_ground_enemy(event.actor):
+                print(f"发现敌方目标: {event.actor.type} (ID: {event.actor.actor_id}, 位置: {event.actor.position})")
+                enemy_targets.append(event.actor)
+
+        stream.subscribe(BECAME_VISIBLE, on_visible)
+        stream.run(5, until=lambda: bool(enemy_targets))
+        stream.unsubscribe(BECAME_VISIBLE, on_visible)
+        print(f"侦察成功！发现 {len(enemy_targets)} 个敌方地面目标。")
 
         print("侦察任务完成，命令侦察兵停止当前行动，准备总攻！")
         api.stop([explorer_yak])
@@ -118,7 +136,7 @@ def solve_mission_4(api: GameAPI):
         print("集结所有兵力，准备发起总攻...")
         all_yaks = api.query_actor(all_yaks_query)
         if all_yaks:
-            execute_attack_phase(api, all_yaks)
+            execute_attack_phase(api, all_yaks, stream, fog_explorer)
         else:
             print("没有存活的雅克战机，无法发起总攻。")
 
@@ -129,7 +147,8 @@ def solve_mission_4(api: GameAPI):
 
 if __name__ == '__main__':
     try:
-        game_api = GameAPI("localhost")
+        # 迷雾按区域刷新时一次发出大量 fog_query，使用连接池在同一条连接上批量发送
+        game_api = GameAPI("localhost", transport="pooled")
         print("已连接到游戏服务器，开始执行任务4：空中打击。")
         solve_mission_4(game_api)
     except ConnectionError as e:
@@ -1,7 +1,15 @@
-from typing import List, Dict, Optional
+import math
+import sys
+import threading
+from array import array
+from typing import Iterable, Iterator, List, Dict, Optional, Tuple
 from dataclasses import dataclass
 
-@dataclass
+# Python 3.10 起 dataclass 可以直接生成 __slots__：实例没有 __dict__，内存占用更小，属性访问也更快。
+# 更早的版本退回普通 dataclass，接口完全相同。
+_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+@dataclass(**_SLOTS)
 class Location:
     # 表示游戏中的二维位置坐标，左上角是原点，x 轴向右，y 轴向下
     x: int  # x 是地图中的水平偏移量。
@@ -29,7 +37,7 @@ class Location:
 
 # 查询目标的查询参数，用于查询符合条件的目标。
 # 基本上是用这个结构体来表明一个或一些Actor
-@dataclass
+@dataclass(**_SLOTS)
 class TargetsQueryParam:
     type: Optional[List[str]] = None  # 目标类型，值为 {ALL_UNITS} 列表或 None。
     faction: Optional[str] = None  # 阵营，值为 {ALL_ACTORS} 中的一个或 None。
@@ -56,7 +64,42 @@ class TargetsQueryParam:
             "range": self.range
         }
 
-@dataclass
+# 单位类型和阵营名称到整数编码的映射，所有 Actor 和 ActorBatch 共用，编码在进程内保持稳定。
+# 多个线程（流水线读线程、WaitScheduler、命令监听器和调用方）会同时编码，新名称在锁内分配编码。
+class CodeTable:
+    def __init__(self):
+        self.names: List[str] = []
+        self.codes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def encode(self, name: str) -> int:
+        # 返回名称的编码，第一次出现的名称分配新编码；已有名称不加锁。
+        code = self.codes.get(name)
+        if code is None:
+            with self._lock:
+                code = self.codes.get(name)
+                if code is None:
+                    # 先追加名称再公开编码，其它线程拿到编码时 decode 一定可用
+                    code = len(self.names)
+                    self.names.append(name)
+                    self.codes[name] = code
+        return code
+
+    def decode(self, code: int) -> str:
+        return self.names[code]
+
+    def intern(self, name: str) -> str:
+        # 返回表中与 name 相等的唯一字符串对象，所有单位共用同一份类型/阵营字符串。
+        return self.names[self.encode(name)]
+
+    def lookup(self, name: str) -> int:
+        # 返回已有名称的编码，没出现过的名称返回 -1。
+        return self.codes.get(name, -1)
+
+ACTOR_TYPE_CODES = CodeTable()
+ACTOR_FACTION_CODES = CodeTable()
+
+@dataclass(**_SLOTS)
 class Actor:
     actor_id: int  # 单位 ID。
     type: Optional[str] = None  # 单位类型，值为 {ALL_UNITS} 中的一个。
@@ -76,13 +119,228 @@ class Actor:
 
     def update_details(self, type: str, faction: str, position: Location, hppercent: int):
         # 更新单位的详细信息。
-        self.type = type
-        self.faction = faction
+        self.type = ACTOR_TYPE_CODES.intern(type) if type is not None else None
+        self.faction = ACTOR_FACTION_CODES.intern(faction) if faction is not None else None
         self.position = position
         self.hppercent = hppercent
 
+    @property
+    def type_code(self) -> int:
+        # 单位类型的整数编码，见 ACTOR_TYPE_CODES，类型未知时为 -1。
+        return ACTOR_TYPE_CODES.encode(self.type) if self.type is not None else -1
+
+    @property
+    def faction_code(self) -> int:
+        # 阵营的整数编码，见 ACTOR_FACTION_CODES，阵营未知时为 -1。
+        return ACTOR_FACTION_CODES.encode(self.faction) if self.faction is not None else -1
+
+# query_actor 结果的列式表示：每个字段一个紧凑数组，第 i 个单位的数据在各数组的第 i 项。
+# 按下标访问时才生成对应的 Actor，批量筛选和统计可以直接在数组上完成。
+class ActorBatch:
+    __slots__ = ("ids", "type_codes", "faction_codes", "xs", "ys", "hppercents")
+
+    def __init__(self):
+        self.ids = array("q")  # 单位 ID。
+        self.type_codes = array("H")  # 单位类型编码，见 ACTOR_TYPE_CODES。
+        self.faction_codes = array("B")  # 阵营编码，见 ACTOR_FACTION_CODES。
+        self.xs = array("i")  # 位置 x。
+        self.ys = array("i")  # 位置 y。
+        self.hppercents = array("h")  # 血量百分比，最大血量为 0 时为 -1。
+
+    @classmethod
+    def from_actors_data(cls, actors_data: List[dict]) -> 'ActorBatch':
+        # 把 query_actor 响应中的 actors 数组一次性解码为列，缺字段时抛出 KeyError。
+        batch = cls()
+        encode_type = ACTOR_TYPE_CODES.encode
+        encode_faction = ACTOR_FACTION_CODES.encode
+        ids, type_codes, faction_codes = batch.ids, batch.type_codes, batch.faction_codes
+        xs, ys, hppercents = batch.xs, batch.ys, batch.hppercents
+        for data in actors_data:
+            position = data["position"]
+            max_hp = data["maxHp"]
+            ids.append(data["id"])
+            type_codes.append(encode_type(data["type"]))
+            faction_codes.append(encode_faction(data["faction"]))
+            xs.append(position["x"])
+            ys.append(position["y"])
+            hppercents.append(data["hp"] * 100 // max_hp if max_hp > 0 else -1)
+        return batch
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        # 按下标生成 Actor 视图，切片返回 Actor 列表。
+        if isinstance(index, slice):
+            return [self.actor(i) for i in range(*index.indices(len(self.ids)))]
+        if index < 0:
+            index += len(self.ids)
+        if not 0 <= index < len(self.ids):
+            raise IndexError("ActorBatch 下标超出范围")
+        return self.actor(index)
+
+    def __iter__(self) -> Iterator[Actor]:
+        for i in range(len(self.ids)):
+            yield self.actor(i)
+
+    def actor(self, index: int) -> Actor:
+        # 生成第 index 个单位对应的 Actor。
+        return Actor(self.ids[index], ACTOR_TYPE_CODES.decode(self.type_codes[index]),
+                     ACTOR_FACTION_CODES.decode(self.faction_codes[index]),
+                     Location(self.xs[index], self.ys[index]), self.hppercents[index])
+
+    def to_actors(self) -> List[Actor]:
+        return list(self)
+
+    def locations(self) -> 'LocationArray':
+        # 所有单位的位置，与本批次共用坐标数组。
+        return LocationArray(self.xs, self.ys)
+
+    def index_of(self, actor_id: int) -> int:
+        # 返回指定 ID 的单位所在下标，不存在时返回 -1。
+        try:
+            return self.ids.index(actor_id)
+        except ValueError:
+            return -1
+
+    def select(self, type: Optional[List[str]] = None, faction: Optional[str] = None) -> List[int]:
+        # 返回类型在 type 中且阵营为 faction 的单位下标，参数为 None 表示不限制。
+        type_codes = None if type is None else {ACTOR_TYPE_CODES.lookup(name) for name in type}
+        faction_code = None if faction is None else ACTOR_FACTION_CODES.lookup(faction)
+        return [i for i in range(len(self.ids))
+                if (type_codes is None or self.type_codes[i] in type_codes)
+                and (faction_code is None or self.faction_codes[i] == faction_code)]
+
+# 一组位置的紧凑表示：x、y 各存放在一个 int 数组中。
+# 距离、质心、离散度等运算一次处理整个数组，不为每个点创建 Location 对象，也不逐对调用方法。
+class LocationArray:
+    __slots__ = ("xs", "ys")
+
+    def __init__(self, xs: Iterable[int] = (), ys: Iterable[int] = ()):
+        self.xs = xs if isinstance(xs, array) else array("i", xs)
+        self.ys = ys if isinstance(ys, array) else array("i", ys)
+        if len(self.xs) != len(self.ys):
+            raise ValueError("xs 与 ys 的长度不一致")
+
+    @classmethod
+    def from_locations(cls, locations: Iterable[Location]) -> 'LocationArray':
+        locations = list(locations)
+        return cls(array("i", [loc.x for loc in locations]), array("i", [loc.y for loc in locations]))
+
+    @classmethod
+    def from_actors(cls, actors: Iterable['Actor']) -> 'LocationArray':
+        # 没有位置的单位会被跳过。
+        return cls.from_locations(actor.position for actor in actors if actor.position is not None)
+
+    def to_locations(self) -> List[Location]:
+        return [Location(x, y) for x, y in zip(self.xs, self.ys)]
+
+    def __len__(self) -> int:
+        return len(self.xs)
+
+    def __getitem__(self, index):
+        # 按下标返回 Location，切片返回新的 LocationArray。
+        if isinstance(index, slice):
+            return LocationArray(self.xs[index], self.ys[index])
+        return Location(self.xs[index], self.ys[index])
+
+    def __iter__(self) -> Iterator[Location]:
+        for x, y in zip(self.xs, self.ys):
+            yield Location(x, y)
+
+    def append(self, location: Location) -> None:
+        self.xs.append(location.x)
+        self.ys.append(location.y)
+
+    def translate(self, dx: int, dy: int) -> 'LocationArray':
+        # 整体平移，返回新数组。
+        return LocationArray(array("i", [x + dx for x in self.xs]), array("i", [y + dy for y in self.ys]))
+
+    # ----- 一对多距离 -----
+
+    def manhattan_to(self, location: Location) -> List[int]:
+        # 每个点到 location 的曼哈顿距离。
+        x0, y0 = location.x, location.y
+        return [abs(x - x0) + abs(y - y0) for x, y in zip(self.xs, self.ys)]
+
+    def squared_to(self, location: Location) -> List[int]:
+        # 每个点到 location 的欧几里得距离的平方，只比较远近时可以省去开方。
+        x0, y0 = location.x, location.y
+        return [(x - x0) * (x - x0) + (y - y0) * (y - y0) for x, y in zip(self.xs, self.ys)]
+
+    def euclidean_to(self, location: Location) -> List[float]:
+        # 每个点到 location 的欧几里得距离。
+        x0, y0 = location.x, location.y
+        hypot = math.hypot
+        return [hypot(x - x0, y - y0) for x, y in zip(self.xs, self.ys)]
+
+    def within(self, location: Location, radius: float, metric: str = "euclidean") -> List[int]:
+        # 到 location 的距离不超过 radius 的点的下标，metric 为 "euclidean" 或 "manhattan"。
+        if metric == "manhattan":
+            return [i for i, d in enumerate(self.manhattan_to(location)) if d <= radius]
+        r2 = radius * radius
+        return [i for i, d in enumerate(self.squared_to(location)) if d <= r2]
+
+    def all_within(self, location: Location, tolerance: float, metric: str = "manhattan") -> bool:
+        # 所有点到 location 的距离是否都不超过 tolerance，空数组返回 True。
+        if metric == "manhattan":
+            return max(self.manhattan_to(location), default=0) <= tolerance
+        return max(self.squared_to(location), default=0) <= tolerance * tolerance
+
+    def nearest_index(self, location: Location) -> int:
+        # 离 location 最近（欧几里得）的点的下标，空数组返回 -1。
+        distances = self.squared_to(location)
+        return min(range(len(distances)), key=distances.__getitem__) if distances else -1
+
+    # ----- 两两距离 -----
+
+    def pairwise_manhattan(self, other: Optional['LocationArray'] = None) -> List[List[int]]:
+        # 曼哈顿距离矩阵，第 i 行第 j 列是 self[i] 到 other[j] 的距离；other 为 None 时与自身比较。
+        other = self if other is None else other
+        oxs, oys = other.xs, other.ys
+        return [[abs(x - ox) + abs(y - oy) for ox, oy in zip(oxs, oys)] for x, y in zip(self.xs, self.ys)]
+
+    def pairwise_euclidean(self, other: Optional['LocationArray'] = None) -> List[List[float]]:
+        # 欧几里得距离矩阵，布局与 pairwise_manhattan 相同。
+        other = self if other is None else other
+        oxs, oys = other.xs, other.ys
+        hypot = math.hypot
+        return [[hypot(x - ox, y - oy) for ox, oy in zip(oxs, oys)] for x, y in zip(self.xs, self.ys)]
+
+    # ----- 聚合 -----
+
+    def centroid(self) -> Tuple[float, float]:
+        # 质心坐标 (x, y)，空数组时抛出 ValueError。
+        n = len(self.xs)
+        if n == 0:
+            raise ValueError("空的 LocationArray 没有质心")
+        return sum(self.xs) / n, sum(self.ys) / n
+
+    def center(self) -> Location:
+        # 质心四舍五入到格子。
+        cx, cy = self.centroid()
+        return Location(round(cx), round(cy))
+
+    def spread(self) -> float:
+        # 离散度：各点到质心距离的均方根，空数组为 0。
+        n = len(self.xs)
+        if n == 0:
+            return 0.0
+        cx, cy = self.centroid()
+        return math.sqrt(sum((x - cx) ** 2 for x in self.xs) / n + sum((y - cy) ** 2 for y in self.ys) / n)
+
+    def max_distance_from(self, location: Location) -> float:
+        # 离 location 最远的点的欧几里得距离，空数组为 0。
+        return math.sqrt(max(self.squared_to(location), default=0))
+
+    def bounding_box(self) -> Tuple[int, int, int, int]:
+        # 包围盒 (min_x, min_y, max_x, max_y)，空数组时抛出 ValueError。
+        if not self.xs:
+            raise ValueError("空的 LocationArray 没有包围盒")
+        return min(self.xs), min(self.ys), max(self.xs), max(self.ys)
+
 # 地图信息查询返回结构体，IsVisible 是当前视野可见的部分为 True，IsExplored 是探索过的格子为 True。
-@dataclass
+@dataclass(**_SLOTS)
 class MapQueryResult:
     MapWidth: int  # 地图宽度。
     MapHeight: int  # 地图高度。
@@ -103,8 +361,175 @@ class MapQueryResult:
         else:
             raise ValueError("位置超出范围。")
 
+    def to_grids(self) -> 'MapGrids':
+        # 转换为数组存储的 MapGrids。
+        return MapGrids.from_lists(self.MapWidth, self.MapHeight, self.Height, self.IsVisible,
+                                   self.IsExplored, self.Terrain, self.ResourcesType, self.Resources)
+
+# 地图信息的紧凑数组表示：每个网格是一段按 [x][y] 顺序展开的连续内存，下标为 x * height + y。
+# 可见/已探索为 0/1 字节位图，地形和资源类型是类别编码（编码表见 terrain_names / resource_type_names），
+# 统计和查找通过 bytearray.count / find 在 C 层完成，不需要逐格创建 Python 对象。
+class MapGrids:
+    __slots__ = ("width", "height", "heights", "visible", "explored", "terrain", "terrain_names",
+                 "resource_types", "resource_type_names", "resources")
+
+    # MapQueryResult 字段名到 MapGrids 属性的映射，供 get_value_at_location 兼容旧的调用方式。
+    FIELDS = {"Height": "heights", "IsVisible": "visible", "IsExplored": "explored",
+              "Terrain": "terrain", "ResourcesType": "resource_types", "Resources": "resources"}
+
+    def __init__(self, width: int, height: int):
+        size = width * height
+        self.width = width
+        self.height = height
+        self.heights = array("h", bytes(2 * size))  # 每个格子的高度。
+        self.visible = bytearray(size)  # 每个格子是否可见（0/1）。
+        self.explored = bytearray(size)  # 每个格子是否已探索（0/1）。
+        self.terrain = bytearray(size)  # 地形编码，对应 terrain_names。
+        self.terrain_names: List[str] = []
+        self.resource_types = bytearray(size)  # 资源类型编码，对应 resource_type_names。
+        self.resource_type_names: List[str] = []
+        self.resources = array("i", bytes(4 * size))  # 每个格子的资源数量。
+
+    @classmethod
+    def from_lists(cls, width: int, height: int, heights: List[List[int]], visible: List[List[bool]],
+                   explored: List[List[bool]], terrain: List[List[str]], resource_types: List[List[str]],
+                   resources: List[List[int]]) -> 'MapGrids':
+        # 从 map_query 返回的 [x][y] 嵌套列表构造，缺失的网格保持为 0。
+        grids = cls(width, height)
+        grids._fill(grids.heights, heights)
+        grids._fill(grids.visible, visible)
+        grids._fill(grids.explored, explored)
+        grids._fill(grids.resources, resources)
+        grids._fill_codes(grids.terrain, grids.terrain_names, terrain)
+        grids._fill_codes(grids.resource_types, grids.resource_type_names, resource_types)
+        return grids
+
+    def _fill(self, target, columns: List[list]) -> None:
+        h = self.height
+        if isinstance(target, bytearray):
+            convert = bytearray
+        else:
+            def convert(column):
+                return array(target.typecode, column)
+        for x, column in enumerate(columns[:self.width]):
+            if len(column) == h:
+                target[x * h:(x + 1) * h] = convert(column)
+
+    def _fill_codes(self, target: bytearray, names: List[str], columns: List[List[str]]) -> None:
+        codes: Dict[str, int] = {}
+
+        def encode(name: str) -> int:
+            code = codes.get(name)
+            if code is None:
+                code = codes[name] = len(names)
+                names.append(name)
+            return code
+
+        h = self.height
+        for x, column in enumerate(columns[:self.width]):
+            if len(column) == h:
+                target[x * h:(x + 1) * h] = bytes(map(encode, column))
+
+    def in_bounds(self, x: int, y: int) -> bool:
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def index(self, x: int, y: int) -> int:
+        return x * self.height + y
+
+    def get_value_at_location(self, grid_name: str, location: 'Location'):
+        # 与 MapQueryResult.get_value_at_location 相同，grid_name 使用 MapQueryResult 的字段名。
+        attr = self.FIELDS.get(grid_name)
+        if attr is None:
+            raise AttributeError(f"网格 '{grid_name}' 不存在。")
+        if not self.in_bounds(location.x, location.y):
+            raise ValueError("位置超出范围。")
+        value = getattr(self, attr)[location.x * self.height + location.y]
+        if attr == "terrain":
+            return self.terrain_names[value]
+        if attr == "resource_types":
+            return self.resource_type_names[value]
+        if attr in ("visible", "explored"):
+            return bool(value)
+        return value
+
+    def is_explored(self, x: int, y: int) -> bool:
+        return self.explored[x * self.height + y] == 1
+
+    def is_visible(self, x: int, y: int) -> bool:
+        return self.visible[x * self.height + y] == 1
+
+    def terrain_at(self, x: int, y: int) -> str:
+        return self.terrain_names[self.terrain[x * self.height + y]]
+
+    def explored_fraction(self) -> float:
+        # 已探索格子占全图的比例。
+        return self.explored.count(1) / len(self.explored) if self.explored else 0.0
+
+    def visible_fraction(self) -> float:
+        return self.visible.count(1) / len(self.visible) if self.visible else 0.0
+
+    def is_fully_explored(self) -> bool:
+        return 0 not in self.explored
+
+    def cells_where(self, grid: bytearray, value: int) -> List[Location]:
+        # 返回字节网格中等于 value 的所有格子。
+        cells = []
+        h = self.height
+        find = grid.find
+        pos = find(value)
+        while pos >= 0:
+            cells.append(Location(pos // h, pos % h))
+            pos = find(value, pos + 1)
+        return cells
+
+    def unexplored_cells(self) -> List[Location]:
+        return self.cells_where(self.explored, 0)
+
+    def resource_cells(self, resource_type: str) -> List[Location]:
+        # 返回指定资源类型（例如 "Ore"）的所有格子，类型不存在时返回空列表。
+        if resource_type not in self.resource_type_names:
+            return []
+        return self.cells_where(self.resource_types, self.resource_type_names.index(resource_type))
+
+    def terrain_cells(self, terrain: str) -> List[Location]:
+        if terrain not in self.terrain_names:
+            return []
+        return self.cells_where(self.terrain, self.terrain_names.index(terrain))
+
+    def cells_in_radius(self, grid: bytearray, center: 'Location', radius: float, value: int = 1) -> List[Location]:
+        # 返回以 center 为圆心、欧几里得距离不超过 radius 的圆内，字节网格中等于 value 的格子。
+        cells = []
+        h = self.height
+        r = int(radius)
+        r2 = radius * radius
+        for x in range(max(0, center.x - r), min(self.width, center.x + r + 1)):
+            dx2 = (x - center.x) ** 2
+            span = int((r2 - dx2) ** 0.5)
+            y0 = max(0, center.y - span)
+            y1 = min(h, center.y + span + 1)
+            base = x * h
+            pos = grid.find(value, base + y0, base + y1)
+            while pos >= 0:
+                cells.append(Location(x, pos - base))
+                pos = grid.find(value, pos + 1, base + y1)
+        return cells
+
+    def visible_in_radius(self, center: 'Location', radius: float) -> List[Location]:
+        return self.cells_in_radius(self.visible, center, radius, 1)
+
+    def unexplored_in_radius(self, center: 'Location', radius: float) -> List[Location]:
+        return self.cells_in_radius(self.explored, center, radius, 0)
+
+    def total_resources(self, resource_type: Optional[str] = None) -> int:
+        # 全图资源总量，指定 resource_type 时只统计该类型的格子。
+        if resource_type is None:
+            return sum(self.resources)
+        cells = self.resource_cells(resource_type)
+        h = self.height
+        return sum(self.resources[cell.x * h + cell.y] for cell in cells)
+
 # 玩家基础信息查询返回结构体，Cash 和 Resources 的和是玩家持有的金钱，Power 是剩余电力。
-@dataclass
+@dataclass(**_SLOTS)
 class PlayerBaseInfo:
     Cash: int  # 玩家持有的现金。
     Resources: int  # 玩家持有的资源。
@@ -113,7 +538,7 @@ class PlayerBaseInfo:
     PowerProvided: int  # 玩家提供的电力。
 
 # 屏幕信息查询返回结果，Min 是屏幕左上角，Max 是右下角，MousePosition 是当前鼠标所在位置，Location 都是整数坐标。
-@dataclass
+@dataclass(**_SLOTS)
 class ScreenInfoResult:
     ScreenMin: Location  # 屏幕左上角的位置。
     ScreenMax: Location  # 屏幕右下角的位置。
@@ -0,0 +1,176 @@
+import random
+import socket
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from connection import RequestNotSentError
+
+# 只读取状态、或重复执行结果相同的命令：请求可能已送达时重发也是安全的
+IDEMPOTENT_COMMANDS = frozenset({
+    # 查询
+    "ping", "query_actor", "query_path", "map_query", "fog_query", "player_baseinfo_query",
+    "screen_info_query", "query_production_queue", "query_can_produce", "query_wait_info",
+    "unit_attribute_query",
+    # 重复下达结果不变的指令
+    "camera_move", "move_actor", "stop", "select_unit", "form_group", "set_rally_point",
+    "view", "attack",
+})
+
+# 默认的单命令超时时间（秒），未列出的命令使用 RetryPolicy.default_timeout
+DEFAULT_COMMAND_TIMEOUTS = {
+    "ping": 2.0,
+    "fog_query": 5.0,
+    "query_wait_info": 5.0,
+    "map_query": 30.0,
+    "query_path": 20.0,
+}
+
+
+def request_not_sent(error: BaseException) -> bool:
+    '''判断失败是否发生在请求送达服务器之前（连接被拒绝、地址无法解析、写出时连接已断开等）
+
+    这类失败可以对任何命令安全重试；其他连接错误和超时都可能发生在服务器
+    已经执行了命令之后，只能对幂等命令重试。'''
+    return isinstance(error, (ConnectionRefusedError, socket.gaierror, RequestNotSentError))
+
+
+class RetryPolicy:
+    '''GameAPI 的重试策略：指数退避 + 随机抖动、按命令的超时时间和失败分类
+
+    第 n 次重试前等待 [0, min(max_delay, base_delay * multiplier ** (n - 1))] 之间的随机时间
+    （full jitter），避免多个线程在服务器卡顿时同步地反复重试。'''
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 5.0,
+                 multiplier: float = 2.0, default_timeout: float = 10.0,
+                 timeouts: Optional[Dict[str, float]] = None,
+                 idempotent_commands: Iterable[str] = IDEMPOTENT_COMMANDS):
+        '''初始化重试策略
+
+        Args:
+            max_attempts (int): 每个请求最多尝试的次数（含第一次）
+            base_delay (float): 第一次重试前的最大等待时间（秒）
+            max_delay (float): 单次等待时间的上限（秒）
+            multiplier (float): 每次重试等待上限的增长倍数
+            default_timeout (float): 没有单独配置的命令的超时时间（秒）
+            timeouts (Dict[str, float], optional): 按命令覆盖的超时时间，与 DEFAULT_COMMAND_TIMEOUTS 合并
+            idempotent_commands (Iterable[str]): 可能已送达时仍允许重试的命令
+        '''
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.default_timeout = default_timeout
+        self.timeouts = dict(DEFAULT_COMMAND_TIMEOUTS)
+        if timeouts:
+            self.timeouts.update(timeouts)
+        self.idempotent_commands = frozenset(idempotent_commands)
+
+    def timeout_for(self, command: str) -> float:
+        '''命令的请求超时时间（秒）'''
+        return self.timeouts.get(command, self.default_timeout)
+
+    def is_idempotent(self, command: str) -> bool:
+        return command in self.idempotent_commands
+
+    def should_retry(self, command: str, error: BaseException, attempt: int) -> bool:
+        '''第 attempt 次尝试以 error 失败后是否应该重试'''
+        if attempt >= self.max_attempts:
+            return False
+        return request_not_sent(error) or self.is_idempotent(command)
+
+    def backoff(self, attempt: int) -> float:
+        '''第 attempt 次失败后、下一次重试前的等待时间（秒）'''
+        ceiling = min(self.max_delay, self.base_delay * self.multiplier ** (attempt - 1))
+        return random.uniform(0, ceiling)
+
+
+class CircuitBreaker:
+    '''熔断器：服务器连续失败 failure_threshold 次后进入打开状态，reset_timeout 秒内的请求直接失败
+
+    打开状态结束后进入半开状态，只放行一个探测请求：成功则恢复，失败则再次打开。
+    同一服务器地址的所有 GameAPI 实例和线程共用一个熔断器，见 get_circuit_breaker。'''
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 5.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def retry_after(self) -> float:
+        '''距离熔断器允许下一次探测还有多少秒，未打开时为 0'''
+        with self._lock:
+            if self._state != self.OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def allow(self) -> bool:
+        '''当前是否允许发出请求'''
+        return self.acquire()[0]
+
+    def acquire(self) -> Tuple[bool, bool]:
+        '''当前是否允许发出请求，以及这个请求是否占用了半开状态下唯一的探测名额
+
+        占用了探测名额的请求结束时（record_success / record_failure 之外的方式）
+        需要调用 release_probe；其它请求不能调用，否则会放行第二个探测请求。'''
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True, False
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False, False
+                self._state = self.HALF_OPEN
+                self._probing = False
+            if self._probing:
+                return False, False
+            self._probing = True
+            return True, True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def release_probe(self) -> None:
+        '''结束半开状态下的探测而不改变状态，用于探测请求以未计入成败的方式结束时'''
+        with self._lock:
+            self._probing = False
+
+    def reset(self) -> None:
+        self.record_success()
+
+
+_breakers: Dict[Tuple[str, int], CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(address: Tuple[str, int]) -> CircuitBreaker:
+    '''返回服务器地址对应的共享熔断器，不存在时创建'''
+    with _breakers_lock:
+        breaker = _breakers.get(address)
+        if breaker is None:
+            breaker = _breakers[address] = CircuitBreaker()
+        return breaker
@@ -0,0 +1,100 @@
+import json
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeServer:
+    '''在后台线程中运行的最小游戏服务器：一条连接上可以处理多个请求，记录收到的命令
+
+    delays 中的命令会在回复前等待指定的秒数，用于模拟超时。replies_per_connection 给出时，
+    每条连接回复这么多条后关闭：reset 为 False 时正常关闭、不处理其余请求（每条连接只处理
+    一个请求的服务器），为 True 时先执行已收到的其余请求再重置连接（回复途中崩溃的服务器）。'''
+
+    def __init__(self, delays=None, replies_per_connection=None, reset=False):
+        self.delays = dict(delays or {})
+        self.replies_per_connection = replies_per_connection
+        self.reset = reset
+        self.commands = []
+        self._sock = socket.socket()
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind(("127.0.0.1", 0))
+        self._sock.listen(16)
+        self.address = self._sock.getsockname()
+        self._closed = False
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def count(self, command):
+        return self.commands.count(command)
+
+    def close(self):
+        self._closed = True
+        self._sock.close()
+
+    def _accept(self):
+        while not self._closed:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        decoder = json.JSONDecoder()
+        buf = ""
+        replies = 0
+        with conn:
+            while True:
+                try:
+                    chunk = conn.recv(65536)
+                except OSError:
+                    return
+                if not chunk:
+                    return
+                buf += chunk.decode()
+                while buf.strip():
+                    buf = buf.lstrip()
+                    try:
+                        request, end = decoder.raw_decode(buf)
+                    except ValueError:
+                        break
+                    buf = buf[end:]
+                    command = request["command"]
+                    if replies == self.replies_per_connection:
+                        if not self.reset:
+                            return
+                        self.commands.append(command)
+                        continue
+                    self.commands.append(command)
+                    time.sleep(self.delays.get(command, 0))
+                    response = {"status": 1, "requestId": request["requestId"], "response": "ok",
+                                "data": {"waitId": 1} if command == "start_production" else {}}
+                    try:
+                        conn.sendall(json.dumps(response).encode())
+                    except OSError:
+                        return
+                    replies += 1
+                if self.reset and replies == self.replies_per_connection:
+                    conn.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+                    return
+
+
+@pytest.fixture
+def fake_server():
+    servers = []
+
+    def start(**kwargs):
+        server = FakeServer(**kwargs)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
@@ -0,0 +1,33 @@
+import asyncio
+import json
+
+from async_game_api import _AsyncPipeline
+
+
+def _payload(request_id):
+    return json.dumps({"apiVersion": "1.0", "requestId": request_id, "command": "ping", "params": {}}).encode()
+
+
+def test_stale_read_loop_does_not_close_new_connection(fake_server):
+    server = fake_server()
+
+    async def scenario():
+        pipeline = _AsyncPipeline(server.address)
+        await pipeline.request("a", _payload("a"))
+        old_writer, old_task, old_decoder = pipeline._writer, pipeline._read_task, pipeline.decoder
+        await pipeline.close()
+        await asyncio.sleep(0)
+        assert old_task.cancelled()
+
+        await pipeline.request("b", _payload("b"))
+        assert pipeline.decoder is not old_decoder
+        # 旧连接上迟到的错误不能关闭新连接
+        pipeline._fail_all(old_writer, ConnectionError("stale"))
+        assert pipeline._writer is not None
+        message = await pipeline.request("c", _payload("c"))
+        await pipeline.close()
+        return message
+
+    message = asyncio.run(scenario())
+    assert message["requestId"] == "c"
+    assert server.count("ping") == 3
@@ -0,0 +1,96 @@
+import json
+import socket
+import time
+import uuid
+
+import pytest
+
+from connection import ConnectionPool, PartialResponseError
+from game_api import GameAPI, GameAPIError
+from resilience import CircuitBreaker, RetryPolicy
+
+
+def _payload(command):
+    return json.dumps({"apiVersion": "1.0", "requestId": str(uuid.uuid4()), "command": command,
+                       "params": {}, "language": "zh"}).encode()
+
+
+def test_pool_does_not_resend_on_timeout(fake_server):
+    server = fake_server(delays={"start_production": 1.5})
+    pool = ConnectionPool(server.address, size=1, timeout=5.0)
+    pool.request(_payload("ping"))  # 让连接成为复用的连接
+
+    start = time.monotonic()
+    with pytest.raises(socket.timeout):
+        pool.request(_payload("start_production"), timeout=0.5)
+    assert time.monotonic() - start < 1.0
+    time.sleep(1.5)
+    assert server.count("start_production") == 1
+    pool.close()
+
+
+def test_timed_out_command_is_not_retried_unless_idempotent(fake_server):
+    server = fake_server(delays={"start_production": 1.5})
+    api = GameAPI(*server.address, transport="pooled", pool_size=1, circuit_breaker=CircuitBreaker(),
+                  retry_policy=RetryPolicy(max_attempts=3, base_delay=0.01,
+                                           timeouts={"start_production": 0.5}))
+    api._send_request('ping', {})
+
+    with pytest.raises(GameAPIError) as info:
+        api._send_request('start_production', {"units": [{"unit_type": "步兵", "quantity": 1}]})
+    assert info.value.code == "CONNECTION_ERROR"
+    time.sleep(1.5)
+    assert server.count("start_production") == 1
+    api.close()
+
+
+def test_pool_resends_once_when_reused_connection_was_reset(fake_server):
+    server = fake_server()
+    pool = ConnectionPool(server.address, size=1, timeout=2.0)
+    pool.request(_payload("ping"))
+    conn = pool.acquire()
+    # 模拟服务器重置了空闲连接：写出时立即失败，请求没有送达
+    conn.sock.close()
+    conn.sock = socket.socket()
+    pool.release(conn)
+    conn.peer_closed = lambda: False
+
+    response = pool.request(_payload("start_production"))
+    assert response["status"] == 1
+    assert server.count("start_production") == 1
+    pool.close()
+
+
+def test_pool_resends_tail_when_server_closes_after_each_request(fake_server):
+    server = fake_server(replies_per_connection=1)
+    pool = ConnectionPool(server.address, size=1, timeout=2.0)
+    responses = pool.request_many([_payload("ping"), _payload("attack"), _payload("stop")])
+    assert [r["status"] for r in responses] == [1, 1, 1]
+    assert server.commands == ["ping", "attack", "stop"]
+    pool.close()
+
+
+def test_pool_does_not_resend_tail_after_reset_mid_reply(fake_server):
+    server = fake_server(replies_per_connection=1, reset=True)
+    pool = ConnectionPool(server.address, size=1, timeout=2.0)
+    with pytest.raises(PartialResponseError) as info:
+        pool.request_many([_payload("ping"), _payload("attack"), _payload("stop")])
+    assert len(info.value.responses) == 1
+    time.sleep(0.2)
+    assert server.count("attack") == 1
+    assert server.count("stop") == 1
+    pool.close()
+
+
+def test_submit_many_fails_unanswered_tail_per_item(fake_server):
+    server = fake_server(replies_per_connection=1, reset=True)
+    api = GameAPI(*server.address, transport="pooled", pool_size=1, circuit_breaker=CircuitBreaker(),
+                  retry_policy=RetryPolicy(max_attempts=3, base_delay=0.01))
+    futures = api.submit_many([("ping", {}), ("attack", {}), ("stop", {})])
+    assert futures[0].result()["status"] == 1
+    for future in futures[1:]:
+        with pytest.raises(GameAPIError):
+            future.result()
+    time.sleep(0.2)
+    assert server.count("attack") == 1
+    api.close()
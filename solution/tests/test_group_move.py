@@ -0,0 +1,19 @@
+from group_move import GroupMoveTracker
+from models import Actor, Location
+
+
+def _actor(actor_id, x, y):
+    return Actor(actor_id, "步兵", "己方", Location(x, y))
+
+
+def test_formation_arrived_follows_arrived_set():
+    tracker = GroupMoveTracker([_actor(1, 0, 0), _actor(2, 5, 5)], Location(10, 10), tolerance=1)
+    tracker.apply([_actor(1, 10, 10), _actor(2, 3, 3)])
+    assert not tracker.formation_arrived()
+
+    # 未到达的单位阵亡后，剩下的单位都已到达
+    tracker.apply([_actor(1, 10, 11)])
+    assert tracker.formation_arrived()
+
+    tracker.apply([])
+    assert not tracker.formation_arrived()
@@ -0,0 +1,22 @@
+from game_api import GameAPI
+
+
+def test_oneshot_is_alive_probes_once_without_background_thread(fake_server):
+    server = fake_server()
+    api = GameAPI(*server.address)
+    assert api.is_alive
+    assert not api.health.running
+    assert server.count("ping") == 1
+    api.close()
+    assert api._health is None
+
+
+def test_pooled_health_monitor_runs_in_background(fake_server):
+    server = fake_server()
+    api = GameAPI(*server.address, transport="pooled")
+    assert api.is_alive
+    monitor = api.health
+    assert monitor.running
+    api.close()
+    assert not monitor.running
+    assert api._health is None
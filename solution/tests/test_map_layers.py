@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+from common.map_layers import MapLayers
+from models import MapGrids
+
+
+def _grids(width=24, height=16):
+    terrain = [["Clear" if (x + y) % 7 else "Rock" for y in range(height)] for x in range(width)]
+    zeros = [[0] * height for _ in range(width)]
+    flags = [[False] * height for _ in range(width)]
+    resource_types = [["Ore" if x > 16 else "" for y in range(height)] for x in range(width)]
+    resources = [[x % 5 if x > 16 else 0 for y in range(height)] for x in range(width)]
+    return MapGrids.from_lists(width, height, zeros, flags, flags, terrain, resource_types, resources)
+
+
+def test_cache_round_trip(tmp_path):
+    grids = _grids()
+    built = MapLayers.load_or_build(grids, str(tmp_path))
+    (cached,) = os.listdir(tmp_path)
+    loaded = MapLayers.load(os.path.join(tmp_path, cached))
+    assert loaded.key == built.key
+    assert list(loaded.ore_density) == list(built.ore_density)
+    for name, layer in built.movement.items():
+        other = loaded.movement[name]
+        assert other.passable == layer.passable
+        assert list(other.clearance) == list(layer.clearance)
+        assert list(other.regions) == list(layer.regions)
+        assert other.region_sizes == layer.region_sizes
+        assert other.chokepoints == layer.chokepoints
+
+
+@pytest.mark.parametrize("corrupt", [
+    lambda data: data[:len(data) // 2],                     # 被截断
+    lambda data: b"\x80\x04garbage" + data,                   # 不是本格式（例如旧的 pickle 文件）
+    lambda data: data[:10] + b"{\"width\": 1}" + data[22:],  # JSON 描述被破坏
+    lambda data: data + b"\0",                                # 末尾有多余数据
+])
+def test_corrupt_cache_is_rebuilt(tmp_path, corrupt):
+    grids = _grids()
+    built = MapLayers.load_or_build(grids, str(tmp_path))
+    (cached,) = os.listdir(tmp_path)
+    path = os.path.join(tmp_path, cached)
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path, "wb") as f:
+        f.write(corrupt(data))
+
+    layers = MapLayers.load_or_build(grids, str(tmp_path))
+    assert list(layers.movement["ground"].regions) == list(built.movement["ground"].regions)
+
+
+def test_build_parameters_are_part_of_cache_key(tmp_path):
+    grids = _grids()
+    MapLayers.load_or_build(grids, str(tmp_path))
+    layers = MapLayers.load_or_build(grids, str(tmp_path), choke_width=1, ore_radius=0)
+    fresh = MapLayers.build(grids, choke_width=1, ore_radius=0)
+    assert layers.ore_radius == 0
+    assert list(layers.ore_density) == list(fresh.ore_density)
+    assert layers.movement["ground"].chokepoints == fresh.movement["ground"].chokepoints
+    assert len(os.listdir(tmp_path)) == 2
@@ -0,0 +1,47 @@
+from common.map_state import MapState
+from models import Location, MapGrids
+
+
+class _FogAPI:
+    '''fog_query 对所有格子都回答"未探索"的假 API'''
+
+    def submit_many(self, requests):
+        return [_Done({"IsVisible": False, "IsExplored": False}) for _ in requests]
+
+    def _handle_response(self, response, error_msg):
+        return response
+
+
+class _Done:
+    def __init__(self, value):
+        self.value = value
+
+    def result(self):
+        return self.value
+
+
+def test_refresh_cells_never_clears_explored():
+    state = MapState(_FogAPI())
+    grids = MapGrids(4, 4)
+    state.grids = grids
+    grids.explored[grids.index(1, 1)] = 1
+
+    delta = state.refresh_cells([Location(1, 1), Location(2, 2)])
+
+    assert grids.explored[grids.index(1, 1)] == 1
+    assert not delta.newly_explored
+
+
+def test_oneshot_refresh_uses_full_refresh():
+    api = _FogAPI()
+    api.transport = "oneshot"
+    state = MapState(api)
+    state.grids = MapGrids(4, 4)
+    calls = []
+    state.refresh_full = lambda: calls.append("full")
+    state.refresh_cells = lambda cells: calls.append("cells")
+
+    state.refresh_around([Location(1, 1)], 1)
+    api.transport = "pooled"
+    state.refresh_around([Location(1, 1)], 1)
+    assert calls == ["full", "cells"]
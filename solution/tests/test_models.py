@@ -0,0 +1,29 @@
+import sys
+import threading
+
+from models import CodeTable
+
+
+def test_code_table_assigns_unique_codes_across_threads():
+    table = CodeTable()
+    names = [f"unit-{i}" for i in range(200)]
+    barrier = threading.Barrier(8)
+
+    def worker():
+        barrier.wait()
+        for name in names:
+            table.encode(name)
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+    assert len(table.names) == len(names)
+    assert all(table.decode(table.encode(name)) == name for name in names)
@@ -0,0 +1,47 @@
+import json
+import socket
+import uuid
+
+import pytest
+
+from connection import PipelinedConnection
+
+
+def _request(command):
+    request_id = str(uuid.uuid4())
+    return request_id, json.dumps({"apiVersion": "1.0", "requestId": request_id, "command": command,
+                                   "params": {}, "language": "zh"}).encode()
+
+
+def test_cancelled_future_does_not_kill_reader(fake_server):
+    server = fake_server(delays={"start_production": 0.3})
+    conn = PipelinedConnection(server.address, timeout=2.0)
+    conn.submit(*_request("start_production")).cancel()
+
+    future = conn.submit(*_request("ping"))
+    assert future.result(timeout=2.0)["status"] == 1
+    assert conn._reader.is_alive()
+    conn.close()
+
+
+def test_cancelled_future_is_skipped_on_expiry(fake_server):
+    server = fake_server(delays={"start_production": 1.5})
+    conn = PipelinedConnection(server.address, timeout=2.0)
+    conn.submit(*_request("start_production"), timeout=0.1).cancel()
+    overdue = conn.submit(*_request("ping"), timeout=0.1)
+    with pytest.raises(socket.timeout):
+        overdue.result(timeout=2.0)
+    assert conn._reader.is_alive()
+    conn.close()
+
+
+def test_each_connection_has_its_own_decoder(fake_server):
+    server = fake_server()
+    conn = PipelinedConnection(server.address, timeout=2.0)
+    conn.submit(*_request("ping")).result(timeout=2.0)
+    first = conn.decoder
+    conn._fail_all(conn.sock, ConnectionError("reset"))
+
+    assert conn.submit(*_request("ping")).result(timeout=2.0)["status"] == 1
+    assert conn.decoder is not first
+    conn.close()
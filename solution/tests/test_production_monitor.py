@@ -0,0 +1,43 @@
+from common.production_monitor import ITEM_FINISHED, ProductionMonitor
+
+
+class FakeAPI:
+    '''按 queues 返回生产队列，值为 None 表示服务器报告队列不存在'''
+
+    def __init__(self, queues):
+        self.queues = queues
+
+    def query_production_queues(self, queue_types=None):
+        return {queue_type: self.queues.get(queue_type) for queue_type in queue_types}
+
+
+def _item(name, done=False):
+    return {"name": name, "chineseName": name, "status": "completed" if done else "in_progress",
+            "done": done, "remaining_time": 0 if done else 50, "total_time": 100,
+            "total_cost": 100, "remaining_cost": 0 if done else 50}
+
+
+def test_missing_queue_is_requeried_after_building_finishes():
+    api = FakeAPI({"Building": {"queue_items": [_item("兵营")]}, "Infantry": None})
+    monitor = ProductionMonitor(api, queue_types=["Building", "Infantry"])
+    monitor.poll()
+    assert monitor.missing_queues == {"Infantry"}
+
+    # 兵营完成并放置后出现了步兵队列
+    api.queues = {"Building": {"queue_items": []}, "Infantry": {"queue_items": [_item("步兵")]}}
+    events = monitor.poll()
+    assert any(event.kind == ITEM_FINISHED for event in events)
+    monitor.poll()
+    assert [item.name for item in monitor.items("Infantry")] == ["步兵"]
+    assert not monitor.is_idle()
+
+
+def test_missing_queue_mark_expires():
+    api = FakeAPI({"Infantry": None})
+    monitor = ProductionMonitor(api, queue_types=["Infantry"], missing_ttl=0.0)
+    monitor.poll()
+    assert monitor.missing_queues == {"Infantry"}
+
+    api.queues = {"Infantry": {"queue_items": [_item("步兵")]}}
+    assert not monitor.wait_until_idle(timeout=0.0)
+    assert [item.name for item in monitor.items("Infantry")] == ["步兵"]
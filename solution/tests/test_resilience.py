@@ -0,0 +1,72 @@
+import socket
+import threading
+import time
+
+import pytest
+
+from game_api import GameAPI, GameAPIError
+from resilience import CircuitBreaker, RetryPolicy
+
+
+def _api(exchange, failure_threshold=1):
+    api = GameAPI("localhost", 7445,
+                  circuit_breaker=CircuitBreaker(failure_threshold=failure_threshold, reset_timeout=0.05),
+                  retry_policy=RetryPolicy(max_attempts=2, base_delay=0.001))
+    api._exchange = exchange
+    return api
+
+
+def _raise(error):
+    def exchange(*args, **kwargs):
+        raise error
+    return exchange
+
+
+def test_any_oserror_is_recorded_and_retried():
+    calls = []
+
+    def exchange(*args, **kwargs):
+        calls.append(1)
+        raise socket.gaierror("name resolution failed")
+
+    api = _api(exchange, failure_threshold=2)
+    with pytest.raises(GameAPIError) as info:
+        api._send_request('start_production', {})
+    assert info.value.code == "CONNECTION_ERROR"
+    assert len(calls) == 2  # 请求没有送达，非幂等命令也可以重试
+    assert api.circuit_breaker.state == CircuitBreaker.OPEN
+
+
+@pytest.mark.parametrize("error", [socket.gaierror("no host"), OSError(113, "No route to host"),
+                                   RuntimeError("boom")])
+def test_failed_probe_does_not_wedge_breaker(error):
+    api = _api(_raise(error))
+    for _ in range(3):
+        with pytest.raises(GameAPIError):
+            api._send_request('ping', {})
+        time.sleep(0.06)
+        # 每次 reset_timeout 之后都应该允许新的探测请求
+        assert api.circuit_breaker.allow()
+        api.circuit_breaker.release_probe()
+
+
+def test_ordinary_request_does_not_release_probe():
+    started, finish = threading.Event(), threading.Event()
+
+    def exchange(*args, **kwargs):
+        started.set()
+        finish.wait(2.0)
+        raise RuntimeError("boom")
+
+    api = _api(exchange)
+    ordinary = threading.Thread(target=lambda: pytest.raises(GameAPIError, api._send_request, 'ping', {}))
+    ordinary.start()
+    started.wait(2.0)
+    # 这个普通请求在途时熔断器打开，随后进入半开状态并放行一个探测请求
+    api.circuit_breaker.record_failure()
+    time.sleep(0.06)
+    assert api.circuit_breaker.acquire() == (True, True)
+
+    finish.set()
+    ordinary.join()
+    assert api.circuit_breaker.acquire() == (False, False)
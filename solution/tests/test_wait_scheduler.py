@@ -0,0 +1,51 @@
+from concurrent.futures import Future
+
+from common.production_monitor import ProductionMonitor
+from wait_scheduler import WaitScheduler, _PendingWait
+
+
+class FakeAPI:
+    '''生产任务一直未完成；记录生产队列被查询的次数'''
+
+    def __init__(self):
+        self.queue_queries = 0
+
+    def query_production_queues(self, queue_types=None):
+        self.queue_queries += 1
+        item = {"name": "powr", "chineseName": "发电厂", "status": "in_progress", "done": False,
+                "remaining_time": 250, "total_time": 500}
+        return {queue_type: {"queue_items": [item]} for queue_type in (queue_types or ["Building"])}
+
+    def submit_many(self, requests):
+        futures = []
+        for _ in requests:
+            future = Future()
+            future.set_result({"waitStatus": "in_progress"})
+            futures.append(future)
+        return futures
+
+    def _handle_response(self, response, error_msg):
+        return response
+
+
+def test_etas_come_from_shared_production_monitor():
+    api = FakeAPI()
+    monitor = ProductionMonitor(api, queue_types=["Building"])
+    monitor.poll()
+    scheduler = WaitScheduler(api, eta_refresh=0.0)
+    scheduler.production = monitor
+    # 直接放入任务，不启动后台线程
+    scheduler._pending[1] = entry = _PendingWait(1, Future(), float("inf"), "发电厂")
+
+    scheduler.poll_once()
+    scheduler.poll_once()
+    assert api.queue_queries == 1
+    assert entry.eta == monitor.last_poll + 10.0
+
+
+def test_without_monitor_queues_are_queried():
+    api = FakeAPI()
+    scheduler = WaitScheduler(api, eta_refresh=0.0)
+    scheduler._pending[1] = _PendingWait(1, Future(), float("inf"), "发电厂")
+    scheduler.poll_once()
+    assert api.queue_queries == 1
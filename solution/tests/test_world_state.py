@@ -0,0 +1,42 @@
+from common.world_state import WorldState
+
+
+class _API:
+    world_state = None
+
+    def add_command_listener(self, listener):
+        pass
+
+    def remove_command_listener(self, listener):
+        pass
+
+
+def test_invalidate_during_fetch_is_not_overwritten():
+    state = WorldState(_API(), ttls={"base_info": 60.0})
+    values = iter(["before", "after"])
+
+    def fetch():
+        value = next(values)
+        if value == "before":
+            # 查询进行中，另一个线程的命令监听器作废了缓存
+            state.invalidate("base_info")
+        return value
+
+    assert state._cached("base_info", "*", None, fetch) == "before"
+    assert state._cached("base_info", "*", None, fetch) == "after"
+    assert state._cached("base_info", "*", None, fetch) == "after"
+
+
+def test_invalidate_all_during_fetch_is_not_overwritten():
+    state = WorldState(_API(), ttls={"actors": 60.0})
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        if len(calls) == 1:
+            state.invalidate()
+        return len(calls)
+
+    assert state._cached("actors", "*", None, fetch) == 1
+    assert state._cached("actors", "*", None, fetch) == 2
+    assert state._cached("actors", "*", None, fetch) == 2
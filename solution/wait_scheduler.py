@@ -0,0 +1,223 @@
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterable, List, Optional
+
+# 生产队列的 remaining_time 以游戏帧为单位，正常速度下每秒 25 帧
+TICKS_PER_SECOND = 25.0
+
+
+class _PendingWait:
+    __slots__ = ("wait_id", "future", "deadline", "unit_type", "eta")
+
+    def __init__(self, wait_id: int, future: Future, deadline: float, unit_type: Optional[str]):
+        self.wait_id = wait_id
+        self.future = future
+        self.deadline = deadline
+        self.unit_type = unit_type
+        self.eta: Optional[float] = None  # 预计完成的 time.monotonic() 时间，未知时为 None
+
+
+class WaitScheduler:
+    '''集中轮询生产任务 waitId 的调度器
+
+    所有未完成的 waitId 在每一轮中用一次 submit_many 批量查询 query_wait_info（pipelined / pooled
+    模式下只需一次往返），完成或超时的任务通过 Future 通知等待方。提供了单位类型的任务会参考
+    生产队列的剩余时间估计完成时间，离完成还远时拉长轮询间隔：设置了 production（已在被轮询的
+    ProductionMonitor）时直接读取它最近一次 poll 的结果，否则每 eta_refresh 秒自己查询一次全部队列。
+
+    后台线程在有未完成任务时才运行，所有任务结束后自动退出。'''
+
+    def __init__(self, api, min_interval: float = 0.1, max_interval: float = 1.0, eta_refresh: float = 1.0,
+                 ticks_per_second: float = TICKS_PER_SECOND):
+        '''初始化等待调度器
+
+        Args:
+            api (GameAPI): 用于查询的 GameAPI 实例
+            min_interval (float): 两轮查询之间的最短间隔（秒）
+            max_interval (float): 两轮查询之间的最长间隔（秒）
+            eta_refresh (float): 重新查询生产队列估计剩余时间的间隔（秒）
+            ticks_per_second (float): 游戏每秒的帧数，用于把 remaining_time 换算为秒
+        '''
+        self.api = api
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.eta_refresh = eta_refresh
+        self.ticks_per_second = ticks_per_second
+        self.sweeps = 0  # 已完成的查询轮数
+        self.production = None  # 共享的 ProductionMonitor，设置后不再单独查询生产队列
+        self._pending: Dict[int, _PendingWait] = {}
+        self._last_eta_refresh = 0.0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    @property
+    def pending(self) -> List[int]:
+        with self._lock:
+            return list(self._pending)
+
+    def add(self, wait_id: int, timeout: float = 20.0, unit_type: Optional[str] = None,
+            callback: Optional[Callable[[int, bool], None]] = None) -> Future:
+        '''开始跟踪一个生产任务
+
+        同一个 waitId 重复添加时返回同一个 Future，超时时间取两者中较晚的一个。
+
+        Args:
+            wait_id (int): produce 返回的 waitId
+            timeout (float): 最长等待时间（秒）
+            unit_type (str, optional): 生产的单位或建筑名称，用于从生产队列估计剩余时间
+            callback (Callable[[int, bool], None], optional): 任务结束时以 (waitId, 是否完成) 调用
+
+        Returns:
+            Future: 完成时结果为 True，超时为 False，查询失败时为对应的 GameAPIError
+        '''
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("WaitScheduler 已关闭")
+            deadline = time.monotonic() + timeout
+            entry = self._pending.get(wait_id)
+            if entry is None:
+                entry = self._pending[wait_id] = _PendingWait(wait_id, Future(), deadline, unit_type)
+            else:
+                entry.deadline = max(entry.deadline, deadline)
+                entry.unit_type = entry.unit_type or unit_type
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="GameAPI-wait", daemon=True)
+                self._thread.start()
+            else:
+                self._wakeup.notify()
+        if callback is not None:
+            entry.future.add_done_callback(
+                lambda future: callback(wait_id, future.exception() is None and future.result()))
+        return entry.future
+
+    def wait(self, wait_id: int, timeout: float = 20.0, unit_type: Optional[str] = None) -> bool:
+        '''等待一个生产任务完成，返回是否完成（False 表示超时）'''
+        return self.add(wait_id, timeout, unit_type).result()
+
+    def wait_all(self, wait_ids: Iterable[int], timeout: float = 20.0) -> Dict[int, bool]:
+        '''同时等待多个生产任务，返回 {waitId: 是否完成}'''
+        futures = {wait_id: self.add(wait_id, timeout) for wait_id in wait_ids}
+        return {wait_id: future.result() for wait_id, future in futures.items()}
+
+    def close(self) -> None:
+        '''停止调度，未完成的任务按超时处理'''
+        with self._lock:
+            self._closed = True
+            entries = list(self._pending.values())
+            self._pending.clear()
+            self._wakeup.notify()
+        for entry in entries:
+            if not entry.future.done():
+                entry.future.set_result(False)
+
+    def poll_once(self) -> None:
+        '''执行一轮查询，通常由后台线程调用'''
+        with self._lock:
+            entries = list(self._pending.values())
+        if not entries:
+            return
+        now = time.monotonic()
+        production = self.production
+        if any(entry.unit_type for entry in entries):
+            if production is not None:
+                self._read_etas(production, entries)
+            elif now - self._last_eta_refresh >= self.eta_refresh:
+                self._refresh_etas(entries)
+                self._last_eta_refresh = now
+
+        futures = self.api.submit_many([('query_wait_info', {"waitId": entry.wait_id}) for entry in entries])
+        finished = []
+        for entry, future in zip(entries, futures):
+            try:
+                result = self.api._handle_response(future.result(), "等待任务完成失败")
+            except Exception as e:
+                if getattr(e, "code", None) == "COMMAND_EXECUTION_ERROR":
+                    # 与 GameAPI.wait 相同：命令执行错误通常意味着任务已经结束
+                    finished.append((entry, True, None))
+                else:
+                    finished.append((entry, None, e))
+                continue
+            if result.get("waitStatus") == "success":
+                finished.append((entry, True, None))
+            elif time.monotonic() >= entry.deadline:
+                finished.append((entry, False, None))
+        self.sweeps += 1
+
+        with self._lock:
+            # 期间被 close 移除的任务已经有了结果
+            finished = [item for item in finished if self._pending.get(item[0].wait_id) is item[0]]
+            for entry, _, _ in finished:
+                del self._pending[entry.wait_id]
+        for entry, ok, error in finished:
+            if error is not None:
+                entry.future.set_exception(error)
+            else:
+                entry.future.set_result(ok)
+
+    def next_interval(self) -> float:
+        '''下一轮查询前应等待的时间：离最近的预计完成时间或超时时间越远，间隔越长'''
+        with self._lock:
+            entries = list(self._pending.values())
+        if not entries:
+            return self.max_interval
+        now = time.monotonic()
+        soonest = min(entry.deadline for entry in entries)
+        if all(entry.eta is not None for entry in entries):
+            soonest = min(soonest, min(entry.eta for entry in entries))
+        else:
+            # 有任务没有剩余时间估计，按最短间隔轮询
+            return self.min_interval
+        return min(self.max_interval, max(self.min_interval, (soonest - now) / 2))
+
+    @staticmethod
+    def _read_etas(production, entries: List[_PendingWait]) -> None:
+        # 剩余时间是 production 最近一次 poll 时的值，从那一刻起算；还没有 poll 过时没有估计
+        polled_at = production.last_poll
+        for entry in entries:
+            seconds = production.eta(entry.unit_type) if entry.unit_type and polled_at else None
+            entry.eta = None if seconds is None else polled_at + seconds
+
+    def _refresh_etas(self, entries: List[_PendingWait]) -> None:
+        try:
+            queues = self.api.query_production_queues()
+        except Exception:
+            # 估计剩余时间只是为了减少轮询，失败时按最短间隔继续
+            return
+        now = time.monotonic()
+        remaining: Dict[str, float] = {}
+        for queue in queues.values():
+            for item in (queue or {}).get("queue_items", []):
+                if item.get("done") or item.get("paused"):
+                    continue
+                seconds = item.get("remaining_time", 0) / self.ticks_per_second
+                for name in (item.get("name"), item.get("chineseName")):
+                    if name:
+                        remaining[name] = min(remaining.get(name, seconds), seconds)
+        for entry in entries:
+            seconds = remaining.get(entry.unit_type) if entry.unit_type else None
+            entry.eta = None if seconds is None else now + seconds
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                if self._closed or not self._pending:
+                    self._thread = None
+                    return
+            try:
+                self.poll_once()
+            except Exception as e:
+                # submit_many 本身失败（例如连接被关闭），本轮所有任务都以该错误结束
+                with self._lock:
+                    entries = list(self._pending.values())
+                    self._pending.clear()
+                for entry in entries:
+                    if not entry.future.done():
+                        entry.future.set_exception(e)
+                continue
+            interval = self.next_interval()
+            with self._lock:
+                if self._pending and not self._closed:
+                    self._wakeup.wait(interval)